@@ -0,0 +1,48 @@
+"""Benchmark do sorteio: tempo para sortear sobre milhões de números vendidos.
+
+Mede a contagem, o select sobre o bitmap e o digest publicado, do mesmo jeito
+que POST /raffles/{id}/draw faz depois de carregar o índice. Não precisa de MongoDB.
+
+Uso: python benchmarks/bench_draw.py [--sold 1000000 5000000] [--draws 50]
+"""
+import argparse
+import random
+import time
+
+from common import BACKEND_DIR  # noqa: F401 (ajusta o sys.path)
+
+from draw import draw_number
+from ticket_index import SoldBitmap
+
+
+def random_bitmap(total: int, sold: int, rng: random.Random) -> SoldBitmap:
+    """Bitmap com `sold` números aleatórios de 1..total"""
+    bits = bytearray((total >> 3) + 1)
+    for n in rng.sample(range(1, total + 1), sold):
+        bits[n >> 3] |= 1 << (n & 7)
+    return SoldBitmap(bits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sold", type=int, nargs="+", default=[100000, 1000000, 5000000])
+    parser.add_argument("--draws", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    print(f"{'vendidos':>10} {'p50 (ms)':>9} {'máx (ms)':>9}")
+    for sold in args.sold:
+        bitmap = random_bitmap(sold * 2, sold, rng)
+        timings = []
+        for i in range(args.draws):
+            # Um bitmap novo por sorteio, como em cada requisição
+            fresh = SoldBitmap(bitmap.bits, bitmap.version)
+            start = time.perf_counter()
+            draw_number(fresh, f"semente-{i}", "rifa", "premio")
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{sold:>10} {timings[len(timings) // 2]:>9.2f} {timings[-1]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
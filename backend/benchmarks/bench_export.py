@@ -0,0 +1,90 @@
+"""Exportação em streaming: vazão, memória e atraso do event loop.
+
+Grava --rows compras numa rifa do banco de benchmark (ou usa uma rifa já
+carregada com --raffle, por exemplo do generate_data.py), exporta em cada
+formato consumindo o stream sem guardar os bytes e mostra linhas/s, tamanho
+do arquivo, pico de memória do processo e o maior atraso de uma tarefa que
+acorda a cada 10 ms durante a exportação (o que outras requisições sentiriam).
+
+Uso: python benchmarks/bench_export.py [--rows 1000000] [--raffle RAFFLE_ID]
+"""
+import argparse
+import asyncio
+import resource
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import import_server
+
+PROBE_INTERVAL = 0.01
+
+
+async def seed(db, raffle_id: str, rows: int):
+    start = datetime.utcnow() - timedelta(days=7)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "id": str(uuid.uuid4()), "user_id": f"user-{i % 50000}", "raffle_id": raffle_id,
+            "tickets": [i * 3 + 1, i * 3 + 2, i * 3 + 3], "quantity": 3, "total_amount": 3.0, "payment_status": "paid",
+            "bonus_boxes": 0, "created_at": start + timedelta(milliseconds=i * 50), "expires_at": None,
+        })
+        if len(batch) == 10000:
+            await db.purchases.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.purchases.insert_many(batch, ordered=False)
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--raffle", help="rifa já carregada no banco de benchmark (não grava compras)")
+    args = parser.parse_args()
+
+    server = import_server()
+    from export import stream_export
+
+    raffle_id = args.raffle or "bench-export"
+    if not args.raffle:
+        await server.db.purchases.delete_many({"raffle_id": raffle_id})
+        await seed(server.db, raffle_id, args.rows)
+    rows = await server.db.purchases.count_documents({"raffle_id": raffle_id})
+    print(f"📤 {rows:,} compras na rifa {raffle_id} · RSS inicial {peak_rss_mb():.0f} MB\n")
+
+    cases = [("csv", "none"), ("csv", "gzip"), ("parquet", "zstd"), ("parquet", "gzip"), ("arrow", "zstd")]
+    print(f"{'formato':<14} {'linhas/s':>10} {'arquivo MB':>11} {'pico RSS MB':>12} {'atraso máx ms':>14}")
+    try:
+        for fmt, compression in cases:
+            lags: list = []
+            stop = asyncio.Event()
+            prober = asyncio.create_task(probe(lags, stop))
+            size = 0
+            start = time.perf_counter()
+            async for chunk in stream_export(server.db, "purchases", fmt, compression, raffle_id):
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await prober
+            label = f"{fmt} {compression}"
+            print(f"{label:<14} {rows / elapsed:>10,.0f} {size / (1 << 20):>11.1f} {peak_rss_mb():>12.0f} "
+                  f"{max(lags, default=0) * 1000:>14.1f}")
+    finally:
+        if not args.raffle:
+            await server.db.purchases.delete_many({"raffle_id": raffle_id})
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""Benchmark da difusão do feed ao vivo para milhares de assinantes SSE.
+
+Sem MongoDB: assinantes em processo consomem `LiveFeed.stream` como faria a
+StreamingResponse, metade acompanhando todas as rifas e metade uma rifa só, e
+cada quadro sintético traz vendidos e faixas novas de todas as rifas. Mede o
+tempo do broadcast (codificação + enfileiramento) e a latência de entrega, do
+início do broadcast até cada assinante ter os bytes do quadro.
+
+Uso: python benchmarks/bench_live_feed.py [--subscribers 1000 10000] [--raffles 20] [--frames 20]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from common import BACKEND_DIR, percentile  # noqa: F401 (ajusta o sys.path)
+
+from live import LiveFeed
+
+
+def synthetic_frames(raffle_ids, rng: random.Random, ranges_per_frame: int):
+    """Um quadro por rifa com o que um intervalo de flash sale costuma trazer"""
+    frames = {}
+    for raffle_id in raffle_ids:
+        starts = sorted(rng.sample(range(1, 1_000_000), ranges_per_frame))
+        frames[raffle_id] = {
+            "raffle_id": raffle_id, "sold_tickets": rng.randint(0, 1_000_000), "status": "active",
+            "version": 0, "previous_version": 0,
+            "new_ranges": [[s, s + rng.randint(0, 10)] for s in starts], "winners": [],
+        }
+    return frames
+
+
+async def run(subscribers: int, raffle_ids, frames: int, ranges_per_frame: int):
+    feed = LiveFeed(db=None, max_queued=frames + 1)
+    rng = random.Random(16)
+    latencies = []
+    sent_at = 0.0
+    received = 0
+    all_received = asyncio.Event()
+
+    async def consume(stream):
+        nonlocal received
+        await stream.__anext__()  # retry
+        async for _ in stream:
+            latencies.append(time.perf_counter() - sent_at)
+            received += 1
+            if received == subscribers:
+                all_received.set()
+
+    streams = [feed.stream() if i % 2 == 0 else feed.stream([raffle_ids[i % len(raffle_ids)]])
+               for i in range(subscribers)]
+    tasks = [asyncio.create_task(consume(s)) for s in streams]
+    await asyncio.sleep(0)  # todos assinados antes do primeiro quadro
+
+    broadcast_times = []
+    for _ in range(frames):
+        payload = synthetic_frames(raffle_ids, rng, ranges_per_frame)
+        received = 0
+        all_received.clear()
+        sent_at = time.perf_counter()
+        feed.broadcast(payload)
+        broadcast_times.append(time.perf_counter() - sent_at)
+        await all_received.wait()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    latencies.sort()
+    broadcast_times.sort()
+    return {
+        "broadcast_p50": percentile(broadcast_times, 50),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "max": latencies[-1],
+        "dropped": feed.dropped,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--raffles", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=20, help="quadros difundidos por rodada")
+    parser.add_argument("--ranges", type=int, default=50, help="faixas novas por rifa em cada quadro")
+    args = parser.parse_args()
+
+    raffle_ids = [f"rifa-{i}" for i in range(args.raffles)]
+    print(f"{args.raffles} rifas, {args.ranges} faixas novas por rifa e quadro\n")
+    print(f"{'assinantes':>10} {'broadcast p50':>14} {'entrega p50':>12} {'entrega p99':>12} {'máx':>9} {'descartados':>12}  (ms)")
+    for subscribers in args.subscribers:
+        r = await run(subscribers, raffle_ids, args.frames, args.ranges)
+        print(f"{subscribers:>10} {r['broadcast_p50'] * 1000:>14.2f} {r['p50'] * 1000:>12.2f} "
+              f"{r['p99'] * 1000:>12.2f} {r['max'] * 1000:>9.2f} {r['dropped']:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
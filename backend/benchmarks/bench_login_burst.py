@@ -0,0 +1,121 @@
+"""Rajada de logins (POST /users) a uma taxa fixa, com e sem o cache de usuários.
+
+Simula o pico de uma campanha: --rate logins por segundo durante --seconds,
+disparados em carga aberta (a cada 10 ms sai o lote do intervalo, sem esperar
+as respostas anteriores). Os telefones seguem uma lei de potência sobre
+--phones números: o primeiro login de cada telefone cria o usuário e os
+seguintes o encontram. Antes da rajada, --racers logins simultâneos de um mesmo
+telefone novo conferem que o upsert não cria usuários duplicados.
+
+Mostra a taxa alcançada, p50/p95/p99, a taxa de acerto do cache e as
+operações que chegaram ao MongoDB.
+
+Uso: python benchmarks/bench_login_burst.py [--rate 10000] [--seconds 5] [--phones 50000]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Iterator
+
+from common import ASGIClient, LatencyRecorder, import_server, print_summary
+
+TICK = 0.01
+
+
+def phone(i: int) -> str:
+    digits = f"{i:08d}"
+    return f"(11) 9{digits[:4]}-{digits[4:]}"
+
+
+def campaign_phones(count: int, alpha: float) -> Iterator[str]:
+    """Telefones em lei de potência: o de posição k aparece com peso 1/k^alpha"""
+    rng = random.Random(21)
+    weights = list(itertools.accumulate(1.0 / (k + 1) ** alpha for k in range(count)))
+    while True:
+        for i in rng.choices(range(count), cum_weights=weights, k=1000):
+            yield phone(i)
+
+
+async def burst(client, recorder: LatencyRecorder, phones, rate: int, seconds: float) -> float:
+    """Dispara `rate` logins por segundo; devolve a taxa efetivamente enviada"""
+    per_tick = rate * TICK
+    pending = set()
+    sent = 0
+    start = time.perf_counter()
+    for tick in itertools.count(1):
+        due = int(per_tick * tick) - sent
+        for _ in range(due):
+            task = asyncio.create_task(recorder.timed("POST /users", client, "POST", "/api/users",
+                                                      {"phone": next(phones)}))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        sent += due
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        await asyncio.sleep(max(0.0, tick * TICK - elapsed))
+    sending = time.perf_counter() - start
+    await asyncio.gather(*pending)
+    return sent / sending
+
+
+async def run(server, client, args, cache: bool) -> dict:
+    await server.db.users.delete_many({})
+    server.user_cache.max_entries = args.cache_entries if cache else 0
+    server.user_cache.invalidate_local(None)
+    server.user_cache.hits = server.user_cache.misses = 0
+
+    # Corrida: o mesmo telefone novo em vários logins simultâneos
+    racers = [client.request("POST", "/api/users", {"phone": "(99) 90000-0000"}) for _ in range(args.racers)]
+    ids = {json.loads(body)["id"] for _, body in await asyncio.gather(*racers)}
+    duplicates = await server.db.users.count_documents({"phone": "(99) 90000-0000"})
+
+    phones = campaign_phones(args.phones, args.alpha)
+    opcounters = (await server.db.command("serverStatus"))["opcounters"]
+    recorder = LatencyRecorder()
+    achieved = await burst(client, recorder, phones, args.rate, args.seconds)
+    recorder.stop()
+    after = (await server.db.command("serverStatus"))["opcounters"]
+    return {
+        "summary": recorder.summary(),
+        "achieved": achieved,
+        "cache": server.user_cache.stats(),
+        "mongo_ops": sum(after[k] - opcounters[k] for k in ("query", "insert", "update", "command")),
+        "users": await server.db.users.count_documents({}),
+        "race": (len(ids), duplicates),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=10000, help="logins por segundo")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--phones", type=int, default=50000, help="telefones distintos na campanha")
+    parser.add_argument("--alpha", type=float, default=1.0, help="expoente da lei de potência dos telefones")
+    parser.add_argument("--racers", type=int, default=50, help="logins simultâneos do mesmo telefone novo")
+    parser.add_argument("--cache-entries", type=int, default=100000)
+    args = parser.parse_args()
+
+    server = import_server()
+    await server.client.drop_database(server.db.name)
+    client = ASGIClient(server.app)
+    await client.startup()
+    try:
+        for cache in (False, True):
+            result = await run(server, client, args, cache)
+            title = f"{'com' if cache else 'sem'} cache: {args.rate} logins/s por {args.seconds:.0f}s"
+            print_summary(title, result["summary"])
+            ids, duplicates = result["race"]
+            print(f"   enviados {result['achieved']:,.0f}/s · acerto do cache {result['cache']['hit_ratio']:.0%} · "
+                  f"{result['mongo_ops']:,} operações no MongoDB · {result['users']:,} usuários")
+            print(f"   {'✅' if duplicates == 1 else '❌'} corrida de {args.racers} logins do mesmo telefone: "
+                  f"{duplicates} usuário(s), {ids} id(s) nas respostas")
+    finally:
+        await client.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""Mede o custo das métricas: middleware por requisição e listener por comando do MongoDB.
+
+Não precisa de MongoDB. Para o efeito ponta a ponta, compare a suíte de carga
+com e sem métricas:
+
+    METRICS_ENABLED=0 python benchmarks/load_test.py --save sem_metricas.json
+    python benchmarks/load_test.py --compare sem_metricas.json
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from common import ASGIClient, BACKEND_DIR  # noqa: F401 (ajusta o sys.path)
+
+from metrics import MetricsMiddleware, MongoCommandListener, REGISTRY
+
+
+async def tiny_app(scope, receive, send):
+    scope["route"] = SimpleNamespace(path="/api/raffles/{raffle_id}")
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def time_requests(app, n: int) -> float:
+    client = ASGIClient(app)
+    start = time.perf_counter()
+    for _ in range(n):
+        await client.request("GET", "/api/raffles/x")
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def time_listener(n: int) -> float:
+    listener = MongoCommandListener()
+    started = SimpleNamespace(command_name="find", command={"find": "purchases", "filter": {}},
+                              connection_id=("localhost", 27017), request_id=0)
+    succeeded = SimpleNamespace(command_name="find", connection_id=("localhost", 27017),
+                                request_id=0, duration_micros=850)
+    start = time.perf_counter()
+    for i in range(n):
+        started.request_id = succeeded.request_id = i
+        listener.started(started)
+        listener.succeeded(succeeded)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    bare = await time_requests(tiny_app, args.requests)
+    measured = await time_requests(MetricsMiddleware(tiny_app), args.requests)
+    listener = time_listener(args.requests)
+    start = time.perf_counter()
+    REGISTRY.render()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(f"🌐 Requisição sem métricas:  {bare:.2f} µs")
+    print(f"📏 Requisição com métricas:  {measured:.2f} µs (+{measured - bare:.2f} µs)")
+    print(f"🍃 Listener por comando:      {listener:.2f} µs")
+    print(f"🧾 Renderizar /api/metrics:   {render_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
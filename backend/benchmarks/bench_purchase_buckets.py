@@ -0,0 +1,124 @@
+"""Compara compras em documentos e em buckets para uma rifa de alto volume.
+
+Grava N compras pequenas de uma rifa num banco de benchmark do MongoDB local,
+mede quantidade de documentos, tamanho dos dados e dos índices e o tempo das
+leituras por rifa (listagem completa, montagem do índice de vendidos e
+rankings), migra a rifa para buckets e mede de novo.
+
+Uso: python benchmarks/bench_purchase_buckets.py [--purchases 300000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from common import BENCH_DB, BACKEND_DIR  # noqa: F401 (ajusta o sys.path)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import ensure_indexes
+from leaderboards import rebuild_leaderboards
+from purchase_buckets import migrate_raffle, raffle_purchases
+from ticket_index import _scan_sold_words
+
+RAFFLE_ID = "bench-buckets"
+FIELDS = ("id", "user_id", "raffle_id", "tickets", "quantity", "total_amount", "payment_status",
+          "bonus_boxes", "created_at", "expires_at")
+
+
+async def seed(db, purchases: int, users: int):
+    """Compras de 1 a 5 números ao longo de uma semana, como num flash sale longo"""
+    rng = random.Random(19)
+    start = datetime.utcnow() - timedelta(days=7)
+    number = 1
+    batch = []
+    for i in range(purchases):
+        quantity = rng.randint(1, 5)
+        batch.append({
+            "id": str(uuid.uuid4()), "user_id": f"user-{rng.randrange(users)}", "raffle_id": RAFFLE_ID,
+            "tickets": list(range(number, number + quantity)), "quantity": quantity, "total_amount": float(quantity),
+            "payment_status": "paid", "bonus_boxes": 0, "created_at": start + timedelta(seconds=i * 2), "expires_at": None,
+        })
+        number += quantity
+        if len(batch) == 10000:
+            await db.purchases.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.purchases.insert_many(batch, ordered=False)
+
+
+async def storage(db, collection: str) -> dict:
+    stats = await db.command("collStats", collection)
+    return {"docs": stats.get("count", 0), "data": stats.get("size", 0), "indexes": stats.get("totalIndexSize", 0)}
+
+
+async def timed(coro_factory) -> float:
+    start = time.perf_counter()
+    await coro_factory()
+    return time.perf_counter() - start
+
+
+async def measure(db, bucketed: bool) -> dict:
+    async def listing():
+        if bucketed:
+            async for _ in raffle_purchases(db, RAFFLE_ID, FIELDS):
+                pass
+        else:
+            find = db.purchases.find({"raffle_id": RAFFLE_ID, "payment_status": "paid"}, {"_id": 0})
+            async for _ in find.sort([("created_at", -1), ("id", -1)]):
+                pass
+
+    async def rankings():
+        await db.leaderboards.delete_many({})
+        await rebuild_leaderboards(db)
+
+    return {
+        "listagem da rifa": await timed(listing),
+        "índice de vendidos": await timed(lambda: _scan_sold_words(db, RAFFLE_ID)),
+        "rankings": await timed(rankings),
+    }
+
+
+def mib(n: int) -> str:
+    return f"{n / (1 << 20):.1f} MiB"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=20000)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    await client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    try:
+        await ensure_indexes(db)
+        await seed(db, args.purchases, args.users)
+        # A primeira montagem grava as reservas em `tickets`; fora da medição
+        await _scan_sold_words(db, RAFFLE_ID)
+
+        before_storage = await storage(db, "purchases")
+        before = await measure(db, bucketed=False)
+        start = time.perf_counter()
+        moved = await migrate_raffle(db, RAFFLE_ID)
+        migration = time.perf_counter() - start
+        after_storage = await storage(db, "purchase_buckets")
+        after = await measure(db, bucketed=True)
+
+        print(f"📦 {moved} compras migradas em {migration:.1f}s\n")
+        print(f"{'':<22} {'documentos':>14} {'buckets':>14}")
+        print(f"{'documentos':<22} {before_storage['docs']:>14} {after_storage['docs']:>14}")
+        print(f"{'dados':<22} {mib(before_storage['data']):>14} {mib(after_storage['data']):>14}")
+        print(f"{'índices':<22} {mib(before_storage['indexes']):>14} {mib(after_storage['indexes']):>14}")
+        for name in before:
+            print(f"{name:<22} {before[name] * 1000:>11.0f} ms {after[name] * 1000:>11.0f} ms")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
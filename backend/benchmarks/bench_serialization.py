@@ -0,0 +1,109 @@
+"""Benchmark antes/depois da serialização das rotas de leitura.
+
+Sem MongoDB: gera documentos como o driver os devolve e mede, por rota, o custo
+de CPU de transformá-los no corpo da resposta.
+
+- antes: Modelo(**doc) para cada documento, revalidação pelo `response_model`
+  (serialize_response do FastAPI) e JSONResponse com o json da biblioteca padrão;
+- depois: dicts da projeção direto para FastJSONResponse (orjson, se instalado);
+- cache: acerto no cache de respostas, que já guarda o JSON codificado.
+
+Uso: python benchmarks/bench_serialization.py [--repeat 200]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from common import import_server
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+
+def raffle_doc(i: int) -> dict:
+    return {
+        "_id": ObjectId(), "id": str(uuid.uuid4()), "title": f"Rifa {i}", "description": "Descrição " * 20,
+        "image_url": "https://images.unsplash.com/photo?w=500&h=300&fit=crop", "price_per_ticket": 1.5,
+        "total_tickets": 100000, "sold_tickets": 4321, "draw_date": datetime.utcnow() + timedelta(days=3),
+        "status": "active",
+        "prizes": [{"id": str(uuid.uuid4()), "name": f"Prêmio {p}", "value": 100.0 * p, "type": "money",
+                    "image_url": None, "is_available": True} for p in range(5)],
+        "bonus_boxes": [{"quantity": 50, "boxes": 1}, {"quantity": 100, "boxes": 3}],
+        "created_at": datetime.utcnow(),
+    }
+
+
+def winner_doc(i: int) -> dict:
+    return {"_id": ObjectId(), "id": str(uuid.uuid4()), "user_id": str(uuid.uuid4()), "user_phone": "(11) 99999-1234",
+            "raffle_id": str(uuid.uuid4()), "raffle_title": "iPhone 14 Pro", "prize_name": "iPhone 14 Pro 128GB",
+            "winning_number": i, "date": datetime.utcnow()}
+
+
+def purchase_doc(i: int) -> dict:
+    return {"_id": ObjectId(), "id": str(uuid.uuid4()), "user_id": "u", "raffle_id": "r",
+            "tickets": list(range(i, i + 10)), "quantity": 10, "total_amount": 10.0, "payment_status": "paid",
+            "bonus_boxes": 1, "created_at": datetime.utcnow(), "expires_at": None}
+
+
+def strip_id(docs):
+    """O que a projeção traz: os mesmos campos, sem o _id"""
+    return [{k: v for k, v in d.items() if k != "_id"} for d in docs]
+
+
+async def timed(repeat: int, render) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await render()
+    return (time.perf_counter() - start) / repeat
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    server = import_server()
+    from serialization import FastJSONResponse, dumps, orjson
+
+    cases = [
+        ("GET /raffles (100)", List[server.Raffle], server.Raffle, [raffle_doc(i) for i in range(100)]),
+        ("GET /raffles/{id}", server.Raffle, server.Raffle, raffle_doc(0)),
+        ("GET /winners (50)", List[server.Winner], server.Winner, [winner_doc(i) for i in range(50)]),
+        ("GET /users/{id}", server.User, server.User,
+         {"_id": ObjectId(), "id": "u", "phone": "999", "name": "Ana", "created_at": datetime.utcnow(), "total_spent": 0.0}),
+        ("GET /purchases/user (1000)", List[server.Purchase], server.Purchase, [purchase_doc(i) for i in range(1000)]),
+    ]
+
+    print(f"JSON: {'orjson' if orjson else 'json (orjson não instalado)'}\n")
+    print(f"{'rota':<28} {'antes µs':>10} {'depois µs':>10} {'cache µs':>10} {'ganho':>7}")
+    for label, response_type, model, docs in cases:
+        field = create_response_field(name=label, type_=response_type)
+        many = isinstance(docs, list)
+        projected = strip_id(docs) if many else strip_id([docs])[0]
+        cached = dumps(projected)
+
+        async def before():
+            content = [model(**d) for d in docs] if many else model(**docs)
+            body = await serialize_response(field=field, response_content=content)
+            return JSONResponse(body).body
+
+        async def after():
+            return FastJSONResponse(projected).body
+
+        async def cache_hit():
+            return FastJSONResponse(cached).body
+
+        t_before = await timed(args.repeat, before)
+        t_after = await timed(args.repeat, after)
+        t_cache = await timed(args.repeat, cache_hit)
+        print(f"{label:<28} {t_before * 1e6:>10.1f} {t_after * 1e6:>10.1f} {t_cache * 1e6:>10.1f} "
+              f"{t_before / t_after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
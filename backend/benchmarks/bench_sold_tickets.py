@@ -0,0 +1,80 @@
+"""Vazão de escrita de sold_tickets numa rifa quente: $inc por compra x write-behind.
+
+Contra o MongoDB local, --clients corrotinas registram --purchases compras na
+mesma rifa, como o register_paid_purchases faz, com o write concern do caminho
+das compras (mongo.py). Compara o $inc por compra com o SoldTicketsBuffer
+(uma gravação por janela) e confere que o total gravado é o mesmo.
+
+Uso: python benchmarks/bench_sold_tickets.py [--purchases 20000] [--clients 200] [--flush-ms 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from common import BENCH_DB, percentile  # noqa: F401 (ajusta o sys.path)
+
+from mongo import create_client, purchase_write_concern
+from sold_tickets import SoldTicketsBuffer
+
+RAFFLE_ID = "bench-sold-tickets"
+
+
+async def run(db, args, enabled: bool) -> dict:
+    await db.raffles.delete_many({"id": RAFFLE_ID})
+    await db.raffles.insert_one({"id": RAFFLE_ID, "status": "active", "sold_tickets": 0})
+    buffer = SoldTicketsBuffer(db, enabled=enabled, flush_interval=args.flush_ms / 1000,
+                               max_purchases=args.flush_purchases)
+    await buffer.start()
+    rng = random.Random(23)
+    quantities = [rng.choice([1, 5, 10, 50]) for _ in range(args.purchases)]
+    latencies = []
+    remaining = iter(quantities)
+
+    async def client():
+        for quantity in remaining:
+            start = time.perf_counter()
+            await buffer.increment(RAFFLE_ID, quantity)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    await buffer.close()
+    elapsed = time.perf_counter() - start
+
+    raffle = await db.raffles.find_one({"id": RAFFLE_ID})
+    latencies.sort()
+    return {
+        "rate": args.purchases / elapsed,
+        "writes": buffer.flushes if enabled else args.purchases,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "ok": raffle["sold_tickets"] == sum(quantities),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--flush-ms", type=float, default=5)
+    parser.add_argument("--flush-purchases", type=int, default=200)
+    args = parser.parse_args()
+
+    client = create_client(os.environ['MONGO_URL'])
+    db = client.get_database(BENCH_DB, write_concern=purchase_write_concern())
+    try:
+        print(f"write concern {purchase_write_concern().document}, {args.clients} clientes\n")
+        print(f"{'modo':<24} {'compras/s':>10} {'escritas':>9} {'p50 ms':>8} {'p99 ms':>8} {'total':>6}")
+        for label, enabled in (("$inc por compra", False), (f"write-behind {args.flush_ms:g} ms", True)):
+            r = await run(db, args, enabled)
+            print(f"{label:<24} {r['rate']:>10,.0f} {r['writes']:>9,} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                  f"{'✅' if r['ok'] else '❌':>6}")
+        await db.raffles.delete_many({"id": RAFFLE_ID})
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""Microbenchmark do TicketAllocator: latência por compra enquanto a rifa enche até 99%.
+
+Uso: python benchmarks/bench_ticket_allocator.py [--total 100000] [--quantity 10]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ticket_allocator import TicketAllocator
+
+
+def legacy_generate(quantity, existing_tickets, total):
+    """Implementação antiga (lista de 1..N com `in` sobre lista), só para comparação"""
+    available = [i for i in range(1, total + 1) if i not in existing_tickets]
+    return random.sample(available, quantity)
+
+
+def run(total: int, quantity: int, checkpoints, samples: int, legacy: bool):
+    rng = random.Random(42)
+    allocator = TicketAllocator(total)
+    target_sold = [int(total * pct / 100) for pct in checkpoints]
+
+    print(f"🎟️  Rifa com {total} números, compras de {quantity} números")
+    print(f"{'ocupação':>10} {'p50 (µs)':>10} {'p99 (µs)':>10} {'máx (µs)':>10}")
+    for pct, target in zip(checkpoints, target_sold):
+        # Enche a rifa até o próximo ponto de medição
+        while allocator.sold_count + quantity <= target:
+            allocator.draw(quantity, rng)
+
+        timings = []
+        for _ in range(samples):
+            if allocator.free_count < quantity:
+                break
+            start = time.perf_counter()
+            tickets = allocator.draw(quantity, rng)
+            timings.append((time.perf_counter() - start) * 1e6)
+            # Devolve os números para medir sempre na mesma ocupação
+            for number in tickets:
+                allocator.release(number)
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{pct:>9}% {p50:>10.1f} {p99:>10.1f} {timings[-1]:>10.1f}")
+
+    if legacy:
+        existing = list(range(1, total // 100 + 1))
+        start = time.perf_counter()
+        legacy_generate(quantity, existing, total)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"\n🐢 Implementação antiga com 1% vendido: {elapsed:.0f} µs por compra")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--total", type=int, default=100000)
+    parser.add_argument("--quantity", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--legacy", action="store_true", help="mede também a implementação antiga")
+    args = parser.parse_args()
+    run(args.total, args.quantity, [0, 25, 50, 75, 90, 95, 99], args.samples, args.legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark da busca número → dono enquanto a rifa cresce até 1M de números vendidos.
+
+Grava reservas em `tickets` num banco de benchmark do MongoDB local e mede a
+busca unitária (find_one pelo índice único) e em lote ($in) em cada tamanho.
+
+Uso: python benchmarks/bench_ticket_owner.py [--sizes 10000 100000 1000000] [--lookups 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from common import BENCH_DB, percentile
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import ensure_indexes
+from reservations import find_ticket_owner, find_ticket_owners
+
+RAFFLE_ID = "bench-owner"
+BATCH = 10000
+
+
+async def grow(db, start: int, end: int):
+    """Vende os números start+1..end da rifa, em lotes"""
+    for first in range(start + 1, end + 1, BATCH):
+        await db.tickets.insert_many([
+            {"raffle_id": RAFFLE_ID, "number": n, "purchase_id": f"p{n // 10}", "user_id": f"u{n % 5000}"}
+            for n in range(first, min(first + BATCH, end + 1))
+        ], ordered=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--bulk", type=int, default=100, help="números por busca em lote")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    await client.drop_database(BENCH_DB)
+    db = client[BENCH_DB]
+    await ensure_indexes(db)
+    rng = random.Random(11)
+
+    print(f"{'vendidos':>10} {'unit p50':>9} {'unit p99':>9} {f'lote {args.bulk} p50':>14} {f'lote {args.bulk} p99':>14}  (ms)")
+    sold = 0
+    try:
+        for size in args.sizes:
+            await grow(db, sold, size)
+            sold = size
+
+            single = []
+            for _ in range(args.lookups):
+                start = time.perf_counter()
+                await find_ticket_owner(db, RAFFLE_ID, rng.randint(1, sold))
+                single.append(time.perf_counter() - start)
+
+            bulk = []
+            for _ in range(max(1, args.lookups // 10)):
+                numbers = [rng.randint(1, sold) for _ in range(args.bulk)]
+                start = time.perf_counter()
+                await find_ticket_owners(db, RAFFLE_ID, numbers)
+                bulk.append(time.perf_counter() - start)
+
+            single.sort()
+            bulk.sort()
+            print(f"{sold:>10} {percentile(single, 50) * 1000:>9.3f} {percentile(single, 99) * 1000:>9.3f} "
+                  f"{percentile(bulk, 50) * 1000:>14.3f} {percentile(bulk, 99) * 1000:>14.3f}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
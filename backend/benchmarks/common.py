@@ -0,0 +1,129 @@
+"""Utilitários dos benchmarks: cliente ASGI em processo e estatísticas de latência."""
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).parent.parent
+sys.path.append(str(BACKEND_DIR))
+
+from dotenv import load_dotenv
+
+load_dotenv(BACKEND_DIR / '.env')
+BENCH_DB = os.environ.get('BENCH_DB_NAME', os.environ['DB_NAME'] + '_bench')
+
+
+def import_server(db_name: str = BENCH_DB):
+    """Importa o app apontando para o banco de benchmark, já com o cliente do MongoDB criado"""
+    os.environ['DB_NAME'] = db_name
+    import server
+    server.connect_mongo()
+    return server
+
+
+class ASGIClient:
+    """Cliente HTTP mínimo que chama o app ASGI direto, sem rede nem dependências"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def startup(self):
+        await self.app.router.startup()
+
+    async def shutdown(self):
+        await self.app.router.shutdown()
+
+    async def request(self, method: str, path: str, body: Optional[object] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        path, _, query = path.partition("?")
+        payload = json.dumps(body).encode() if body is not None else b""
+        raw_headers = [(b"host", b"bench"), (b"content-length", str(len(payload)).encode())]
+        if body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "headers": raw_headers,
+            "client": ("127.0.0.1", 0), "server": ("bench", 80), "root_path": "",
+        }
+        sent = False
+        status = 0
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class LatencyRecorder:
+    """Latências e status por endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    async def timed(self, label: str, client: ASGIClient, method: str, path: str, body=None, headers=None):
+        start = time.perf_counter()
+        status, content = await client.request(method, path, body, headers)
+        self.latencies[label].append(time.perf_counter() - start)
+        if status >= 400:
+            self.errors[label] += 1
+        return status, content
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, dict]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        result = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            result[label] = {
+                "requests": len(values),
+                "errors": self.errors[label],
+                "rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        return result
+
+
+def print_summary(title: str, summary: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    print(f"\n📊 {title}")
+    print(f"{'endpoint':<34} {'req':>7} {'erros':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, s in summary.items():
+        line = (f"{label:<34} {s['requests']:>7} {s['errors']:>6} {s['rps']:>9.1f} "
+                f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+        base = (baseline or {}).get(label)
+        if base and base["p95_ms"]:
+            delta = (s["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+            line += f"  p95 {delta:+.0f}%"
+        print(line)
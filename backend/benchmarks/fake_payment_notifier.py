@@ -0,0 +1,107 @@
+"""Notificador de pagamentos falso para testar a carga do fluxo de reservas pendentes.
+
+Roda o app em processo com PAYMENT_CONFIRMATION=async contra um MongoDB local:
+compradores concorrentes criam compras pendentes e o notificador confirma uma
+fração delas em lotes (POST /purchases/confirm), como faria o webhook do PIX.
+As demais vencem e a varredura devolve seus números ao pool. No fim confere
+que vendidos, reservas e pool batem.
+
+Uso: python benchmarks/fake_payment_notifier.py [--paid-ratio 0.7] [--ttl 2] [--requests 5000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from common import ASGIClient, LatencyRecorder, import_server, print_summary
+from load_test import run_clients, seed
+
+
+async def notifier(client, recorder, queue: asyncio.Queue, args, rng: random.Random, done: asyncio.Event):
+    """Junta as compras pendentes e confirma as "pagas" a cada intervalo, em lotes"""
+    while not (done.is_set() and queue.empty()):
+        await asyncio.sleep(args.notify_interval)
+        pending = []
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        paid = [purchase_id for purchase_id in pending if rng.random() < args.paid_ratio]
+        for start in range(0, len(paid), args.batch):
+            await recorder.timed("POST /purchases/confirm", client, "POST", "/api/purchases/confirm",
+                                 {"purchase_ids": paid[start:start + args.batch]})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=5000, help="compras criadas")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--total-tickets", type=int, default=100000)
+    parser.add_argument("--paid-ratio", type=float, default=0.7, help="fração das compras que o notificador paga")
+    parser.add_argument("--batch", type=int, default=500, help="compras por confirmação")
+    parser.add_argument("--notify-interval", type=float, default=0.05, help="segundos entre notificações")
+    parser.add_argument("--ttl", type=float, default=2.0, help="validade das reservas pendentes (s)")
+    parser.add_argument("--sweep-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # A configuração é lida na importação do servidor
+    os.environ['PAYMENT_CONFIRMATION'] = 'async'
+    os.environ['RESERVATION_TTL_SECONDS'] = str(args.ttl)
+    os.environ['RESERVATION_SWEEP_INTERVAL_SECONDS'] = str(args.sweep_interval)
+
+    server = import_server()
+    await server.client.drop_database(server.db.name)
+    client = ASGIClient(server.app)
+    await client.startup()
+    try:
+        ctx = await seed(server.db, args.users, args.total_tickets)
+        recorder = LatencyRecorder()
+        rng = random.Random(15)
+        queue: asyncio.Queue = asyncio.Queue()
+        done = asyncio.Event()
+
+        async def buy():
+            status, content = await recorder.timed("POST /purchases (pendente)", client, "POST", "/api/purchases", {
+                "user_id": rng.choice(ctx["user_ids"]), "raffle_id": ctx["raffle_id"], "quantity": rng.choice([1, 5, 10, 50]),
+            })
+            if status == 200:
+                queue.put_nowait(json.loads(content)["id"])
+
+        notifying = asyncio.create_task(notifier(client, recorder, queue, args, rng, done))
+        await run_clients(args.clients, args.requests, buy)
+        done.set()
+        await notifying
+        recorder.stop()
+        print_summary(f"reservas pendentes ({args.clients} clientes, {args.paid_ratio:.0%} pagas)", recorder.summary())
+
+        # Espera as não pagas vencerem e a varredura liberar tudo
+        db = server.db
+        start = time.perf_counter()
+        while await db.purchases.count_documents({"payment_status": "pending"}):
+            await asyncio.sleep(0.1)
+        print(f"\n⏳ Reservas vencidas liberadas {time.perf_counter() - start:.1f}s após o fim das compras")
+
+        paid = [p async for p in db.purchases.find({"payment_status": "paid"}, {"quantity": 1})]
+        sold = sum(p["quantity"] for p in paid)
+        raffle = await db.raffles.find_one({"id": ctx["raffle_id"]})
+        claims = await db.tickets.count_documents({"raffle_id": ctx["raffle_id"]})
+        allocator = server.ticket_allocators[ctx["raffle_id"]]
+        expired = await db.purchases.count_documents({"payment_status": "expired"})
+        print(f"💳 {len(paid)} compras pagas, {expired} expiradas")
+        checks = {
+            "sold_tickets da rifa": raffle["sold_tickets"],
+            "reservas em tickets": claims,
+            "números fora do pool": allocator.sold_count,
+        }
+        ok = all(value == sold for value in checks.values())
+        for name, value in checks.items():
+            print(f"{'✅' if value == sold else '❌'} {name}: {value} (esperado {sold})")
+        if not ok:
+            raise SystemExit(1)
+    finally:
+        await client.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
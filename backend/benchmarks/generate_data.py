@@ -0,0 +1,345 @@
+"""Gerador determinístico de dados sintéticos em grande volume para benchmarks.
+
+Gera usuários, rifas, compras pagas e ganhadores no formato dos modelos do
+servidor e grava tudo no banco de benchmark com insert_many em lotes, por
+vários escritores concorrentes, informando a vazão de cada coleção.
+
+Distribuições (todas configuráveis):
+
+- compradores em lei de potência: o usuário de posição k compra com peso
+  1/k^--buyer-alpha, então poucos usuários fazem muitas compras;
+- rifas em lei de potência: a rifa de posição k recebe compras com peso
+  1/k^--raffle-alpha (algumas rifas concentram o volume);
+- picos de venda: --burst-share das compras de cada rifa caem em --bursts
+  janelas de --burst-minutes (flash sales); o resto se espalha pela vida da rifa;
+- pacotes de 1 a 1000 números e faixas de `bonus_boxes` variadas por rifa.
+
+O mesmo --seed gera exatamente os mesmos documentos (ids, números, datas), com
+qualquer número de escritores: cada rifa tem o próprio gerador aleatório e as
+datas partem de --start, não do relógio. --dry-run só gera e imprime uma
+impressão digital dos dados, para conferir que duas execuções são iguais.
+
+Depois da carga cria os índices e recalcula os contadores do /stats. O índice
+de vendidos e os rankings se recalculam à parte (DB_NAME=<banco>):
+
+    python ticket_index.py rebuild
+    python leaderboards.py rebuild
+    python leaderboards.py rebuild-rollups
+
+Uso: python benchmarks/generate_data.py [--users 1000000] [--raffles 2000] [--purchases 20000000]
+     [--seed 12] [--writers 8] [--batch 5000] [--drop]
+"""
+import argparse
+import asyncio
+import functools
+import hashlib
+import itertools
+import math
+import random
+import time
+import uuid
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from common import BENCH_DB, import_server
+
+# Pacote de números: peso
+PACKAGES = ((1, 30), (2, 10), (5, 18), (10, 16), (20, 10), (50, 7), (100, 5), (200, 2), (500, 1.5), (1000, 0.5))
+PRICES = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+TICKET_TIERS = (1000, 10000, 100000, 1000000)
+BONUS_TIERS = (
+    [],
+    [{"quantity": 50, "boxes": 1}, {"quantity": 100, "boxes": 2}],
+    [{"quantity": 100, "boxes": 1}, {"quantity": 200, "boxes": 2}, {"quantity": 500, "boxes": 5}],
+    [{"quantity": 50, "boxes": 1}, {"quantity": 100, "boxes": 2}, {"quantity": 300, "boxes": 5},
+     {"quantity": 1000, "boxes": 10}],
+    [{"quantity": 10, "boxes": 1}, {"quantity": 20, "boxes": 3}, {"quantity": 50, "boxes": 7},
+     {"quantity": 100, "boxes": 15}, {"quantity": 500, "boxes": 80}],
+)
+PRIZES = (
+    ("iPhone 15 Pro Max 256GB", "product", 8999.0),
+    ("R$ 10.000,00", "money", 10000.0),
+    ("Honda CG 160 0km", "product", 15990.0),
+    ("PlayStation 5 + 2 controles", "product", 4299.0),
+    ("R$ 1.000,00 no PIX", "money", 1000.0),
+    ("Smart TV 65\" 4K", "product", 3999.0),
+)
+IMAGE_URL = "https://images.unsplash.com/photo-1695048133142-1a20484d2569?w=500&h=300&fit=crop"
+USER_NAMESPACE = uuid.UUID("6d656761-3132-4000-8000-000000000000")
+
+
+def power_law_cum_weights(n: int, alpha: float) -> List[float]:
+    return list(itertools.accumulate(1.0 / (k + 1) ** alpha for k in range(n)))
+
+
+def random_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class Permutation:
+    """Permutação de 0..n-1 por i -> (a*i + b) mod n: espalha posições sem guardar uma tabela"""
+
+    def __init__(self, n: int, rng: random.Random):
+        self.n = n
+        self.b = rng.randrange(n)
+        self.a = rng.randrange(1, n) | 1 if n > 2 else 1
+        while math.gcd(self.a, n) != 1:
+            self.a += 2
+
+    def __call__(self, i: int) -> int:
+        return (self.a * i + self.b) % self.n
+
+    def run(self, start: int, count: int) -> List[int]:
+        """Posições start..start+count-1 somadas de 1 (números da rifa começam em 1)"""
+        a, n = self.a, self.n
+        first = a * start + self.b
+        return [v % n + 1 for v in range(first, first + a * count, a)]
+
+
+class Generator:
+    def __init__(self, args, calculate_bonus_boxes):
+        self.args = args
+        self.calculate_bonus_boxes = calculate_bonus_boxes
+        self.start = datetime.fromisoformat(args.start)
+        self.end = self.start + timedelta(days=args.days)
+        rng = random.Random(f"{args.seed}:global")
+        self.user_rank = Permutation(args.users, rng)
+        self.buyer_weights = power_law_cum_weights(args.users, args.buyer_alpha)
+        self.package_sizes = [size for size, _ in PACKAGES]
+        self.package_weights = list(itertools.accumulate(weight for _, weight in PACKAGES))
+        self.spent = array('d', [0.0]) * args.users
+        # Poucos usuários fazem a maioria das compras: vale guardar os ids dos mais ativos
+        self.user_id = functools.lru_cache(maxsize=1 << 16)(self._user_id)
+
+    def _user_id(self, i: int) -> str:
+        return str(uuid.uuid5(USER_NAMESPACE, f"{self.args.seed}:{i}"))
+
+    @staticmethod
+    def phone(i: int) -> str:
+        digits = f"{i:08d}"
+        return f"(11) 9{digits[:4]}-{digits[4:]}"
+
+    def purchase_counts(self) -> List[int]:
+        """Compras por rifa: divisão proporcional aos pesos, sem sorteio"""
+        raffles = self.args.raffles
+        rank = Permutation(raffles, random.Random(f"{self.args.seed}:raffles"))
+        weights = [1.0 / (rank(r) + 1) ** self.args.raffle_alpha for r in range(raffles)]
+        total = sum(weights)
+        counts = [int(self.args.purchases * w / total) for w in weights]
+        for r in sorted(range(raffles), key=lambda r: rank(r))[:self.args.purchases - sum(counts)]:
+            counts[r] += 1
+        return counts
+
+    def timestamps(self, rng: random.Random, count: int, opened: datetime, closed: datetime) -> List[int]:
+        """Milissegundos desde a abertura da rifa, em ordem; parte concentrada nos picos"""
+        lifetime = max(int((closed - opened).total_seconds() * 1000), 1)
+        burst = min(self.args.burst_minutes * 60000, lifetime)
+        bursts = [rng.randrange(lifetime - burst + 1) for _ in range(self.args.bursts)]
+        times = []
+        for _ in range(count):
+            if bursts and rng.random() < self.args.burst_share:
+                # Pico: a maioria das compras nos primeiros minutos da janela
+                offset = min(int(rng.expovariate(3.0 / burst)), burst - 1)
+                times.append(rng.choice(bursts) + offset)
+            else:
+                times.append(rng.randrange(lifetime))
+        times.sort()
+        return times
+
+    def raffle(self, r: int, count: int) -> Iterator[Tuple[str, dict]]:
+        """A rifa, suas compras em ordem de criação e o ganhador, se já sorteada"""
+        rng = random.Random(f"{self.args.seed}:raffle:{r}")
+        raffle_id = random_uuid(rng)
+        opened = self.start + timedelta(seconds=rng.randrange(max(self.args.days - 3, 1) * 86400))
+        draw_date = opened + timedelta(days=rng.uniform(3, 30))
+        closed = min(draw_date, self.end)
+        price = rng.choice(PRICES)
+        bonus_rules = rng.choice(BONUS_TIERS)
+        prize_name, prize_type, prize_value = rng.choice(PRIZES)
+
+        quantities = rng.choices(self.package_sizes, cum_weights=self.package_weights, k=count)
+        sold = sum(quantities)
+        needed = math.ceil(sold / rng.uniform(0.35, 1.0))
+        total_tickets = next((t for t in TICKET_TIERS if t >= needed), max(needed, 1))
+        completed = draw_date <= self.end and count > 0
+        winner_at = rng.randrange(count) if completed else None
+
+        yield "raffles", {
+            "id": raffle_id, "title": f"{prize_name} #{r + 1}",
+            "description": f"Concorra a {prize_name} pagando R$ {price:.2f} por número.",
+            "image_url": IMAGE_URL, "price_per_ticket": price, "total_tickets": total_tickets,
+            "sold_tickets": sold, "draw_date": draw_date, "status": "completed" if completed else "active",
+            "prizes": [{"id": random_uuid(rng), "name": prize_name, "value": prize_value, "type": prize_type,
+                        "image_url": IMAGE_URL, "is_available": not completed}],
+            "bonus_boxes": bonus_rules, "created_at": opened,
+        }
+
+        numbers = Permutation(total_tickets, rng)
+        buyers = rng.choices(range(self.args.users), cum_weights=self.buyer_weights, k=count)
+        bonus = {size: self.calculate_bonus_boxes(size, bonus_rules) for size in self.package_sizes}
+        next_number = 0
+        for j, (quantity, rank, ms) in enumerate(zip(quantities, buyers, self.timestamps(rng, count, opened, closed))):
+            user = self.user_rank(rank)
+            amount = quantity * price
+            self.spent[user] += amount
+            tickets = numbers.run(next_number, quantity)
+            next_number += quantity
+            yield "purchases", {
+                "id": random_uuid(rng), "user_id": self.user_id(user), "raffle_id": raffle_id,
+                "tickets": tickets, "quantity": quantity, "total_amount": amount, "payment_status": "paid",
+                "bonus_boxes": bonus[quantity], "created_at": opened + timedelta(milliseconds=ms), "expires_at": None,
+            }
+            if j == winner_at:
+                yield "winners", {
+                    "id": random_uuid(rng), "user_id": self.user_id(user), "user_phone": self.phone(user),
+                    "raffle_id": raffle_id, "raffle_title": f"{prize_name} #{r + 1}", "prize_name": prize_name,
+                    "winning_number": rng.choice(tickets), "date": draw_date,
+                }
+
+    def users(self) -> Iterator[Tuple[str, dict]]:
+        """Usuários por último, com o total gasto somado das compras geradas"""
+        rng = random.Random(f"{self.args.seed}:users")
+        for i in range(self.args.users):
+            yield "users", {
+                "id": self.user_id(i), "phone": self.phone(i), "name": f"Usuário {i + 1}",
+                "created_at": self.start - timedelta(seconds=rng.randrange(365 * 86400)),
+                "total_spent": round(self.spent[i], 2),
+            }
+
+    def documents(self) -> Iterator[Tuple[str, dict]]:
+        for r, count in enumerate(self.purchase_counts()):
+            yield from self.raffle(r, count)
+        yield from self.users()
+
+
+def batches(documents: Iterator[Tuple[str, dict]], size: int) -> Iterator[Tuple[str, List[dict]]]:
+    pending = {}
+    for collection, doc in documents:
+        batch = pending.setdefault(collection, [])
+        batch.append(doc)
+        if len(batch) >= size:
+            yield collection, batch
+            pending[collection] = []
+    for collection, batch in pending.items():
+        if batch:
+            yield collection, batch
+
+
+class Throughput:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.docs = Counter()
+        self.busy = Counter()
+        self._reported = self.started
+
+    def add(self, collection: str, docs: int, seconds: float):
+        self.docs[collection] += docs
+        self.busy[collection] += seconds
+        now = time.perf_counter()
+        if now - self._reported >= 5:
+            self._reported = now
+            total = sum(self.docs.values())
+            print(f"⏳ {total:,} documentos em {now - self.started:.0f}s ({total / (now - self.started):,.0f}/s)")
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"\n{'coleção':<12} {'documentos':>14} {'docs/s':>12}")
+        for collection, docs in self.docs.items():
+            print(f"{collection:<12} {docs:>14,} {docs / elapsed:>12,.0f}")
+        total = sum(self.docs.values())
+        print(f"{'total':<12} {total:>14,} {total / elapsed:>12,.0f}   ({elapsed:.1f}s)")
+
+
+async def writer(db, queue: asyncio.Queue, throughput: Throughput):
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        collection, docs = item
+        start = time.perf_counter()
+        await db[collection].insert_many(docs, ordered=False)
+        throughput.add(collection, len(docs), time.perf_counter() - start)
+
+
+def fingerprint(documents: Iterator[Tuple[str, dict]]) -> Tuple[Counter, str]:
+    digest = hashlib.sha256()
+    counts = Counter()
+    for collection, doc in documents:
+        counts[collection] += 1
+        digest.update(repr(sorted(doc.items())).encode())
+    return counts, digest.hexdigest()
+
+
+async def load(server, generator: Generator, writers: int, batch_size: int, drop: bool):
+    db = server.db
+    if drop:
+        for collection in ("raffles", "purchases", "users", "winners", "tickets", "ticket_index",
+                           "purchase_buckets", "purchase_rollups", "leaderboards", "draws", "counters"):
+            await db.drop_collection(collection)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    throughput = Throughput()
+    tasks = [asyncio.create_task(writer(db, queue, throughput)) for _ in range(writers)]
+    try:
+        for item in batches(generator.documents(), batch_size):
+            await queue.put(item)
+            # Gerar é CPU; cede o loop para os escritores despacharem os lotes prontos
+            await asyncio.sleep(0)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    throughput.report()
+
+    start = time.perf_counter()
+    await server.create_indexes()
+    print(f"\n🗂️  Índices criados em {time.perf_counter() - start:.1f}s")
+    from counters import reconcile_stats
+    stats = await reconcile_stats(db)
+    print(f"📊 Contadores: {stats}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=BENCH_DB, help=f"banco de destino (padrão: {BENCH_DB})")
+    parser.add_argument("--seed", type=int, default=12)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--raffles", type=int, default=2000)
+    parser.add_argument("--purchases", type=int, default=20000000)
+    parser.add_argument("--start", default="2025-01-01", help="data inicial dos dados (ISO 8601)")
+    parser.add_argument("--days", type=int, default=180, help="período coberto pelas rifas")
+    parser.add_argument("--buyer-alpha", type=float, default=1.1)
+    parser.add_argument("--raffle-alpha", type=float, default=1.0)
+    parser.add_argument("--bursts", type=int, default=3, help="picos de venda por rifa")
+    parser.add_argument("--burst-share", type=float, default=0.6, help="fração das compras nos picos")
+    parser.add_argument("--burst-minutes", type=int, default=15)
+    parser.add_argument("--writers", type=int, default=8, help="escritores concorrentes")
+    parser.add_argument("--batch", type=int, default=5000, help="documentos por insert_many")
+    parser.add_argument("--drop", action="store_true", help="apaga as coleções do banco de destino antes")
+    parser.add_argument("--dry-run", action="store_true", help="só gera e imprime a impressão digital")
+    args = parser.parse_args()
+
+    server = import_server(args.db)
+    generator = Generator(args, server.calculate_bonus_boxes)
+    if args.dry_run:
+        start = time.perf_counter()
+        counts, digest = fingerprint(generator.documents())
+        elapsed = time.perf_counter() - start
+        print(f"🧬 seed {args.seed}: {dict(counts)}")
+        print(f"   sha256 {digest} ({sum(counts.values()) / elapsed:,.0f} docs/s gerados)")
+        return
+
+    print(f"🌱 seed {args.seed}: {args.users:,} usuários, {args.raffles:,} rifas, {args.purchases:,} compras "
+          f"→ {args.db} ({args.writers} escritores, lotes de {args.batch})")
+    try:
+        await load(server, generator, args.writers, args.batch, args.drop)
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""Suíte de carga da API rodando o app em processo contra um MongoDB local.
+
+Cenários (clientes asyncio concorrentes):
+- flash_sale: tempestade de compras numa única rifa;
+- polling: listagem de rifas, rankings, ganhadores e grade de números;
+- login_burst: rajada de logins (POST /users) com telefones repetidos.
+
+Mostra p50/p95/p99 e req/s por endpoint e pode salvar um baseline JSON para
+comparar execuções:
+
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from common import ASGIClient, LatencyRecorder, import_server, print_summary
+
+SCENARIOS = ["flash_sale", "polling", "login_burst"]
+
+
+async def seed(db, users: int, total_tickets: int) -> dict:
+    """Cria a rifa do flash sale, usuários e ganhadores no banco de benchmark"""
+    raffle_id = f"bench-{uuid.uuid4()}"
+    await db.raffles.insert_one({
+        "id": raffle_id, "title": "Flash sale", "description": "Benchmark", "image_url": "",
+        "price_per_ticket": 1.0, "total_tickets": total_tickets, "sold_tickets": 0,
+        "draw_date": datetime.utcnow() + timedelta(days=1), "status": "active",
+        "prizes": [{"id": "p", "name": "Prêmio", "value": 100.0, "type": "money", "image_url": None, "is_available": True}],
+        "bonus_boxes": [{"quantity": 10, "boxes": 1}, {"quantity": 50, "boxes": 3}],
+        "created_at": datetime.utcnow(),
+    })
+    user_docs = [
+        {"id": str(uuid.uuid4()), "phone": f"(11) 9{i:08d}", "name": f"Usuário {i}",
+         "created_at": datetime.utcnow(), "total_spent": 0.0}
+        for i in range(users)
+    ]
+    await db.users.insert_many(user_docs)
+    await db.winners.insert_many([
+        {"id": str(uuid.uuid4()), "user_id": u["id"], "user_phone": u["phone"], "raffle_id": raffle_id,
+         "raffle_title": "Flash sale", "prize_name": "Prêmio", "winning_number": i + 1,
+         "date": datetime.utcnow() - timedelta(days=i)}
+        for i, u in enumerate(user_docs[:50])
+    ])
+    return {"raffle_id": raffle_id, "user_ids": [u["id"] for u in user_docs], "phones": [u["phone"] for u in user_docs]}
+
+
+async def run_clients(clients: int, requests: int, make_request):
+    """Divide `requests` chamadas entre `clients` corrotinas concorrentes"""
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await make_request()
+
+    await asyncio.gather(*(worker() for _ in range(clients)))
+
+
+async def flash_sale(client, recorder, ctx, args):
+    rng = random.Random(1)
+
+    async def buy():
+        await recorder.timed("POST /purchases", client, "POST", "/api/purchases", {
+            "user_id": rng.choice(ctx["user_ids"]), "raffle_id": ctx["raffle_id"], "quantity": rng.choice([1, 5, 10, 50]),
+        })
+
+    await run_clients(args.clients, args.requests, buy)
+
+
+async def polling(client, recorder, ctx, args):
+    rng = random.Random(2)
+    raffle_id = ctx["raffle_id"]
+    targets = [
+        ("GET /raffles", "/api/raffles"),
+        ("GET /raffles/{id}", f"/api/raffles/{raffle_id}"),
+        ("GET /raffles/{id}/tickets", f"/api/raffles/{raffle_id}/tickets?format=ranges"),
+        ("GET /rankings/top-buyers", "/api/rankings/top-buyers"),
+        ("GET /rankings/daily-buyers", "/api/rankings/daily-buyers"),
+        ("GET /winners", "/api/winners"),
+        ("GET /stats", "/api/stats"),
+    ]
+
+    async def poll():
+        label, path = rng.choice(targets)
+        await recorder.timed(label, client, "GET", path)
+
+    await run_clients(args.clients, args.requests, poll)
+
+
+async def login_burst(client, recorder, ctx, args):
+    rng = random.Random(3)
+    # Metade dos logins é de usuários existentes, metade de telefones novos
+    phones = ctx["phones"] + [f"(21) 9{i:08d}" for i in range(len(ctx["phones"]))]
+
+    async def login():
+        await recorder.timed("POST /users", client, "POST", "/api/users", {"phone": rng.choice(phones)})
+
+    await run_clients(args.clients, args.requests, login)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Suíte de carga da API (app em processo, MongoDB local)")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="padrão: todos")
+    parser.add_argument("--clients", type=int, default=100, help="clientes concorrentes por cenário")
+    parser.add_argument("--requests", type=int, default=5000, help="requisições por cenário")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--total-tickets", type=int, default=100000)
+    parser.add_argument("--save", help="salva o resultado como baseline JSON")
+    parser.add_argument("--compare", help="compara com um baseline JSON salvo")
+    args = parser.parse_args()
+
+    server = import_server()
+    await server.client.drop_database(server.db.name)
+    client = ASGIClient(server.app)
+    await client.startup()
+    baseline = json.load(open(args.compare)) if args.compare else {}
+    results = {}
+    try:
+        ctx = await seed(server.db, args.users, args.total_tickets)
+        for name in args.scenario or SCENARIOS:
+            recorder = LatencyRecorder()
+            await globals()[name](client, recorder, ctx, args)
+            recorder.stop()
+            results[name] = recorder.summary()
+            print_summary(f"{name} ({args.clients} clientes)", results[name], baseline.get(name))
+    finally:
+        await client.shutdown()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Baseline salvo em {args.save}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
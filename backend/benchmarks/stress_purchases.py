@@ -0,0 +1,134 @@
+"""Teste de estresse de compras concorrentes numa única rifa (MongoDB local).
+
+Sobe vários processos, cada um simulando um worker do uvicorn com seu próprio
+pool de números, e dispara milhares de compras em paralelo contra a mesma rifa.
+Ao final verifica que nenhum número foi vendido duas vezes, que a rifa não
+vendeu mais do que `total_tickets` e, quando a procura passa do total, que a
+rifa esgotou: números liberados num worker não podem ficar presos porque os
+pools dos outros não os veem.
+
+Uso: python benchmarks/stress_purchases.py [--workers 4] [--purchases 4000] [--quantity 3] [--total 10000]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv(Path(__file__).parent.parent / '.env')
+STRESS_DB = os.environ.get('STRESS_DB_NAME', os.environ['DB_NAME'] + '_stress')
+
+
+def worker(raffle_id: str, purchases: int, quantity: int, concurrency: int, results):
+    os.environ['DB_NAME'] = STRESS_DB
+    import server
+    from fastapi import HTTPException
+
+    async def run():
+        server.connect_mongo()
+        await server.create_indexes()
+        semaphore = asyncio.Semaphore(concurrency)
+        outcome = Counter()
+
+        async def buy(i):
+            async with semaphore:
+                try:
+                    await server.create_purchase(server.PurchaseCreate(
+                        user_id=f"stress-user-{i % 500}", raffle_id=raffle_id, quantity=quantity
+                    ))
+                    outcome["ok"] += 1
+                except HTTPException as e:
+                    outcome[e.status_code] += 1
+
+        await asyncio.gather(*(buy(i) for i in range(purchases)))
+        server.client.close()
+        return outcome
+
+    results.put(dict(asyncio.run(run())))
+
+
+async def setup(total: int) -> str:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    await client.drop_database(STRESS_DB)
+    raffle_id = f"stress-{uuid.uuid4()}"
+    await client[STRESS_DB].raffles.insert_one({
+        "id": raffle_id, "title": "Stress", "description": "Teste de estresse", "image_url": "",
+        "price_per_ticket": 1.0, "total_tickets": total, "sold_tickets": 0, "status": "active",
+        "prizes": [], "bonus_boxes": [],
+    })
+    client.close()
+    return raffle_id
+
+
+async def verify(raffle_id: str, total: int, quantity: int, demand: int) -> bool:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[STRESS_DB]
+    numbers = Counter()
+    sold = 0
+    async for p in db.purchases.find({"raffle_id": raffle_id}, {"tickets": 1, "quantity": 1}):
+        numbers.update(p["tickets"])
+        sold += p["quantity"]
+    raffle = await db.raffles.find_one({"id": raffle_id})
+    claims = await db.tickets.count_documents({"raffle_id": raffle_id})
+    client.close()
+
+    duplicates = [n for n, c in numbers.items() if c > 1]
+    out_of_range = [n for n in numbers if n < 1 or n > total]
+    print(f"🎟️  Vendidos: {sold} / {total} (contador da rifa: {raffle['sold_tickets']}, reservas: {claims})")
+    checks = {
+        "sem números duplicados": not duplicates,
+        "números dentro da faixa": not out_of_range,
+        "sem overselling": sold <= total and raffle["sold_tickets"] <= total,
+        "contador consistente": raffle["sold_tickets"] == sold == claims,
+    }
+    if demand > total:
+        # Com compras de `quantity` números podem sobrar menos de `quantity`
+        checks["rifa esgotada"] = total - sold < quantity
+    for name, ok in checks.items():
+        print(f"{'✅' if ok else '❌'} {name}")
+    return all(checks.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--purchases", type=int, default=4000, help="compras por worker")
+    parser.add_argument("--quantity", type=int, default=3)
+    parser.add_argument("--total", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=200, help="compras simultâneas por worker")
+    args = parser.parse_args()
+
+    raffle_id = asyncio.run(setup(args.total))
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(raffle_id, args.purchases, args.quantity, args.concurrency, results))
+        for _ in range(args.workers)
+    ]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    outcome = Counter()
+    for _ in procs:
+        outcome.update(results.get())
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    demand = args.workers * args.purchases * args.quantity
+    print(f"⚡ {args.workers * args.purchases} compras ({demand} números) em {elapsed:.2f}s: {dict(outcome)}")
+    sys.exit(0 if asyncio.run(verify(raffle_id, args.total, args.quantity, demand)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Cache em processo das respostas de leitura mais acessadas.
+
+As entradas têm TTL e são descartadas por LRU quando o cache enche. Cada entrada
+leva tags (por exemplo "raffles", "stats"); as rotas de escrita invalidam as
+tags que afetam e a invalidação é repassada aos outros workers por um canal:
+
+- LocalChannel: um único processo, nada a repassar;
+- FileChannel: vários workers na mesma máquina, via arquivo de log compartilhado.
+
+Configuração: CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS e
+CACHE_INVALIDATION_CHANNEL ("local" ou "file:/caminho/do/arquivo").
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, FrozenSet, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LocalChannel:
+    """Canal de invalidação para um único processo"""
+
+    async def start(self, on_tags: Callable[[Iterable[str]], None]):
+        pass
+
+    async def publish(self, tags: Iterable[str]):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FileChannel:
+    """Canal de invalidação entre workers por um arquivo de log compartilhado.
+
+    Cada publicação acrescenta uma linha JSON ao arquivo (append é atômico para
+    linhas pequenas) e cada worker lê as linhas novas a cada `poll_interval`,
+    ignorando as próprias. Quando o arquivo passa de `max_bytes` quem publicou
+    põe um arquivo vazio no lugar (rename atômico). Os leitores mantêm o
+    arquivo aberto e percebem a troca pelo inode: terminam de ler o antigo e,
+    como uma linha gravada nele depois disso se perderia, limpam o cache
+    inteiro. Linhas ilegíveis também limpam o cache, em vez de parar o leitor.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1, max_bytes: int = 1 << 20):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        self.origin = uuid.uuid4().hex
+        self._file = None
+        self._partial = b""
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_tags: Callable[[Iterable[str]], None]):
+        open(self.path, "a").close()
+        self._file = open(self.path, "rb")
+        self._file.seek(0, os.SEEK_END)
+        self._task = asyncio.create_task(self._poll(on_tags))
+
+    async def publish(self, tags: Iterable[str]):
+        line = json.dumps({"origin": self.origin, "tags": sorted(tags)}) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str):
+        with open(self.path, "a") as f:
+            f.write(line)
+            if f.tell() <= self.max_bytes:
+                return
+        fresh = f"{self.path}.{self.origin}"
+        open(fresh, "w").close()
+        os.replace(fresh, self.path)
+
+    async def _poll(self, on_tags: Callable[[Iterable[str]], None]):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self._read_new(on_tags)
+            except Exception:
+                logger.exception("Falha ao ler o canal de invalidação %s", self.path)
+
+    def _read_new(self, on_tags: Callable[[Iterable[str]], None]):
+        rotated = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        if os.fstat(self._file.fileno()).st_size < self._file.tell():
+            # Truncado no lugar: recomeça do início
+            self._file.seek(0)
+            self._partial = b""
+            on_tags(None)
+        self._consume(self._file.read(), on_tags)
+        if rotated:
+            self._file.close()
+            self._file = open(self.path, "rb")
+            self._partial = b""
+            on_tags(None)
+            self._consume(self._file.read(), on_tags)
+
+    def _consume(self, data: bytes, on_tags: Callable[[Iterable[str]], None]):
+        # Só consome linhas completas; o resto fica para a próxima leitura
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            try:
+                message = json.loads(line)
+                origin, tags = message["origin"], message["tags"]
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Linha inválida no canal de invalidação %s; limpando o cache", self.path)
+                on_tags(None)
+                continue
+            if origin != self.origin:
+                on_tags(tags)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+        if self._file:
+            self._file.close()
+
+
+class ResponseCache:
+    """Cache TTL + LRU com invalidação por tags e contadores de acerto"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 30.0, channel=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.channel = channel or LocalChannel()
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[str], Any]]" = OrderedDict()
+        # Muda a cada invalidação; cargas que começaram antes não são guardadas
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = ()):
+        self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], tags: Iterable[str] = ()) -> Any:
+        value = self.get(key)
+        if value is MISSING:
+            generation = self._generation
+            value = await loader()
+            if generation == self._generation:
+                self.set(key, value, tags)
+        return value
+
+    def invalidate_local(self, tags: Optional[Iterable[str]]):
+        """Remove as entradas com alguma das tags (todas, se tags for None)"""
+        self._generation += 1
+        self.invalidations += 1
+        if tags is None:
+            self._entries.clear()
+            return
+        tags = frozenset(tags)
+        for key in [k for k, (_, entry_tags, _) in self._entries.items() if entry_tags & tags]:
+            del self._entries[key]
+
+    async def invalidate(self, *tags: str):
+        """Invalida as tags neste processo e avisa os demais workers"""
+        self.invalidate_local(tags)
+        await self.channel.publish(tags)
+
+    async def start(self):
+        await self.channel.start(self.invalidate_local)
+
+    async def close(self):
+        await self.channel.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def cache_from_env() -> ResponseCache:
+    channel_url = os.environ.get('CACHE_INVALIDATION_CHANNEL', 'local')
+    if channel_url.startswith('file:'):
+        channel = FileChannel(channel_url[len('file:'):])
+    elif channel_url == 'local':
+        channel = LocalChannel()
+    else:
+        raise ValueError(f"Canal de invalidação desconhecido: {channel_url}")
+    return ResponseCache(
+        max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', '256')),
+        ttl=float(os.environ.get('CACHE_TTL_SECONDS', '30')),
+        channel=channel,
+    )
@@ -0,0 +1,170 @@
+"""Verifica os planos de execução de todas as consultas que a API faz.
+
+Aplica os índices de indexes.py e roda `explain` para cada formato de consulta
+listado em QUERY_SHAPES. Falha (exit 1) se algum plano vencedor tiver COLLSCAN
+ou SORT em memória. Rode contra um mongod local:
+
+    python check_query_plans.py [--db NOME_DO_BANCO]
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from indexes import ensure_indexes
+
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+# (rota, coleção, comando) para cada consulta emitida pela API
+QUERY_SHAPES = [
+    ("POST /users", "users", {"findAndModify": "users", "query": {"phone": "11999999999"},
+                              "update": {"$setOnInsert": {"id": "x"}}, "upsert": True}),
+    ("POST /users (corrida)", "users", {"find": "users", "filter": {"phone": "11999999999"}, "limit": 1}),
+    ("GET /users/{id}", "users", {"find": "users", "filter": {"id": "x"}, "limit": 1}),
+    ("GET /rankings/*", "users", {"find": "users", "filter": {"id": {"$in": ["x", "y"]}}}),
+    ("GET /raffles", "raffles", {"find": "raffles", "filter": {"status": "active"}, "limit": 100}),
+    ("GET /raffles/{id}", "raffles", {"find": "raffles", "filter": {"id": "x"}, "limit": 1}),
+    ("POST /purchases/bulk", "raffles", {"find": "raffles", "filter": {"id": {"$in": ["x", "y"]}}}),
+    ("POST /purchases", "raffles", {"update": "raffles", "updates": [
+        {"q": {"id": "x"}, "u": {"$inc": {"sold_tickets": 1}}},
+    ]}),
+    ("GET /raffles/{id}/tickets", "ticket_index", {"find": "ticket_index", "filter": {"raffle_id": "x"}, "limit": 1}),
+    ("GET /raffles/{id}/tickets (montagem)", "purchases", {"find": "purchases", "filter": {
+        "raffle_id": "x", "payment_status": "paid"}}),
+    ("GET /raffles/{id}/tickets/{n}/owner", "tickets", {"find": "tickets", "filter": {
+        "raffle_id": "x", "number": 42}, "limit": 1}),
+    ("POST /raffles/{id}/tickets/owners", "tickets", {"find": "tickets", "filter": {
+        "raffle_id": "x", "number": {"$in": [1, 2, 3]}}}),
+    ("POST /purchases (ressincronização)", "tickets", {"count": "tickets", "query": {"raffle_id": "x"}}),
+    ("POST /purchases (ressincronização)", "tickets", {"find": "tickets", "filter": {"raffle_id": "x"},
+                                                       "projection": {"_id": 0, "number": 1}}),
+    ("GET /live", "raffles", {"find": "raffles", "filter": {"$or": [{"id": {"$in": ["x"]}}, {"status": "active"}]}}),
+    ("GET /live", "ticket_index", {"find": "ticket_index", "filter": {"raffle_id": {"$in": ["x", "y"]}}}),
+    ("GET /live", "winners", {"find": "winners", "filter": {"date": {"$gte": datetime(2024, 1, 1)}},
+                              "sort": {"date": 1}}),
+    ("GET /purchases/user/{id}", "purchases", {"find": "purchases", "filter": {"user_id": "x"},
+                                               "sort": {"created_at": -1, "id": -1}, "limit": 100}),
+    ("GET /purchases/user/{id}?cursor", "purchases", {"find": "purchases", "filter": {"user_id": "x", "$or": [
+        {"created_at": {"$lt": datetime(2024, 1, 1)}},
+        {"created_at": datetime(2024, 1, 1), "id": {"$lt": "x"}},
+    ]}, "sort": {"created_at": -1, "id": -1}, "limit": 100}),
+    ("GET /purchases/raffle/{id}", "purchases", {"find": "purchases", "filter": {
+        "raffle_id": "x", "payment_status": "paid"}, "sort": {"created_at": -1, "id": -1}, "limit": 1000}),
+    ("POST /purchases/confirm", "purchases", {"update": "purchases", "updates": [
+        {"q": {"id": {"$in": ["x", "y"]}, "payment_status": "pending"}, "u": {"$set": {"payment_status": "paid"}},
+         "multi": True},
+    ]}),
+    ("POST /purchases/confirm (lote)", "purchases", {"find": "purchases", "filter": {
+        "id": {"$in": ["x", "y"]}, "status_batch": "b"}}),
+    ("reservas vencidas", "purchases", {"find": "purchases", "filter": {
+        "payment_status": "pending", "expires_at": {"$lte": datetime(2024, 1, 1)}},
+        "sort": {"expires_at": 1}, "limit": 1000}),
+    ("reservas vencidas (liberação)", "tickets", {"delete": "tickets", "deletes": [
+        {"q": {"raffle_id": "x", "number": {"$in": [1, 2]}, "purchase_id": {"$in": ["x"]}}, "limit": 0},
+    ]}),
+    ("GET /purchases/raffle/{id} (buckets)", "purchase_buckets", {"find": "purchase_buckets", "filter": {
+        "raffle_id": "x", "window_start": {"$lte": datetime(2024, 1, 1)}}, "sort": {"window_start": -1}}),
+    ("GET /purchases/user/{id} (buckets)", "purchase_buckets", {"aggregate": "purchase_buckets", "cursor": {}, "pipeline": [
+        {"$match": {"purchases.user_id": "x"}},
+        {"$sort": {"window_start": -1}},
+    ]}),
+    ("GET /purchases/user/{id}?cursor (buckets)", "purchase_buckets", {"aggregate": "purchase_buckets", "cursor": {},
+                                                                       "pipeline": [
+        {"$match": {"purchases.user_id": "x", "window_start": {"$lte": datetime(2024, 1, 1)}}},
+        {"$sort": {"window_start": -1}},
+    ]}),
+    ("POST /purchases (buckets)", "purchase_buckets", {"update": "purchase_buckets", "updates": [
+        {"q": {"raffle_id": "x", "window_start": datetime(2024, 1, 1), "count": {"$lte": 999},
+               "tickets": {"$lte": 199990}},
+         "u": {"$inc": {"count": 1}}, "upsert": True},
+    ]}),
+    ("GET /rankings/top-buyers", "leaderboards", {"find": "leaderboards", "filter": {"board": "all"},
+                                                  "sort": {"total_tickets": -1}, "limit": 10}),
+    ("GET /rankings/daily-buyers", "leaderboards", {"find": "leaderboards", "filter": {"board": "daily:2024-01-01"},
+                                                    "sort": {"total_tickets": -1}, "limit": 10}),
+    ("GET /rankings/weekly-buyers", "purchase_rollups", {"aggregate": "purchase_rollups", "cursor": {}, "pipeline": [
+        {"$match": {"hour": {"$gte": datetime(2024, 1, 1)}}},
+        {"$group": {"_id": "$user_id", "total_tickets": {"$sum": "$total_tickets"}}},
+    ]}),
+    ("GET /raffles/{id}/rankings", "purchase_rollups", {"aggregate": "purchase_rollups", "cursor": {}, "pipeline": [
+        {"$match": {"raffle_id": "x", "hour": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}},
+        {"$group": {"_id": "$user_id", "total_tickets": {"$sum": "$total_tickets"}}},
+    ]}),
+    ("POST /purchases (rankings por hora)", "purchase_rollups", {"update": "purchase_rollups", "updates": [
+        {"q": {"hour": datetime(2024, 1, 1), "raffle_id": "x", "user_id": "y"}, "u": {"$inc": {"purchases": 1}},
+         "upsert": True},
+    ]}),
+    ("POST /raffles/{id}/draw (desfaz)", "draws", {"delete": "draws", "deletes": [
+        {"q": {"raffle_id": "x", "prize_id": "p", "id": "d"}, "limit": 1},
+    ]}),
+    ("POST /raffles/{id}/draw (desfaz)", "raffles", {"update": "raffles", "updates": [
+        {"q": {"id": "x", "prizes.id": "p"}, "u": {"$set": {"prizes.$.is_available": True}}},
+    ]}),
+    ("GET /raffles/{id}/draws", "draws", {"find": "draws", "filter": {"raffle_id": "x"}, "limit": 100}),
+    ("GET /winners", "winners", {"find": "winners", "filter": {}, "sort": {"date": -1}, "limit": 50}),
+    ("GET /exports/purchases", "purchases", {"find": "purchases", "filter": {
+        "raffle_id": "x", "created_at": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}}),
+    ("GET /exports/purchases (buckets)", "purchase_buckets", {"find": "purchase_buckets", "filter": {
+        "raffle_id": "x", "window_start": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}}),
+    ("GET /exports/winners", "winners", {"find": "winners", "filter": {
+        "raffle_id": "x", "date": {"$gte": datetime(2024, 1, 1)}}}),
+    ("GET /exports/users", "users", {"find": "users", "filter": {"created_at": {"$gte": datetime(2024, 1, 1)}}}),
+    ("GET /exports/users?raffle_id", "purchase_rollups", {"aggregate": "purchase_rollups", "cursor": {}, "pipeline": [
+        {"$match": {"raffle_id": "x"}}, {"$group": {"_id": "$user_id"}},
+    ]}),
+    ("GET /stats", "counters", {"find": "counters", "filter": {"_id": "stats"}, "limit": 1}),
+    ("leaderboards rebuild", "purchases", {"aggregate": "purchases", "cursor": {}, "pipeline": [
+        {"$match": {"payment_status": "paid", "created_at": {"$gte": datetime(2024, 1, 1)}}},
+        {"$group": {"_id": "$user_id", "total_tickets": {"$sum": "$quantity"}}},
+    ]}),
+]
+
+
+def plan_stages(plan) -> set:
+    """Todos os estágios de um plano do explain (clássico ou SBE)"""
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for key, value in plan.items():
+            if key in ("inputStage", "inputStages", "queryPlan", "winningPlan", "shards", "stages", "$cursor", "queryPlanner"):
+                stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            stages |= plan_stages(item)
+    return stages
+
+
+async def check(db) -> bool:
+    await ensure_indexes(db)
+    ok = True
+    for route, collection, command in QUERY_SHAPES:
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = plan_stages(explain)
+        bad = stages & FORBIDDEN_STAGES
+        ok &= not bad
+        print(f"{'❌' if bad else '✅'} {route:<38} {collection:<13} {', '.join(sorted(stages))}")
+    return ok
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Verifica os planos de execução das consultas da API")
+    parser.add_argument("--db", default=os.environ['DB_NAME'])
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        ok = await check(client[args.db])
+    finally:
+        client.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
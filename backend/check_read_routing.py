@@ -0,0 +1,120 @@
+"""Confere o roteamento de leituras e o write concern contra um replica set local.
+
+Roda as leituras pesadas pela visão de analytics e uma escrita pela visão das
+compras, exatamente como o servidor as cria (mongo.py), e confere nos comandos
+enviados ao driver o `$readPreference` e o `writeConcern` configurados e em
+qual servidor cada um foi executado. Falha (exit 1) se algo divergir.
+
+Replica set de um nó para testar localmente:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" \\
+    MONGO_ANALYTICS_READ_PREFERENCE=secondaryPreferred python check_read_routing.py
+
+Com um nó só não há secundário: secondaryPreferred e nearest caem no primário
+e secondary não encontra servidor, o que o script também mostra.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+from pymongo.errors import PyMongoError
+
+from mongo import analytics_read_preference, client_options_from_env, create_client, purchase_write_concern
+
+CHECK_COLLECTION = "_routing_check"
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands: List[dict] = []
+
+    def started(self, event):
+        self.commands.append({
+            "name": event.command_name,
+            "collection": event.command.get(event.command_name),
+            "read_preference": event.command.get("$readPreference"),
+            "write_concern": event.command.get("writeConcern"),
+            "server": "%s:%s" % event.connection_id,
+        })
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def take(self) -> List[dict]:
+        commands, self.commands = self.commands, []
+        return commands
+
+
+async def check(url: str, db_name: str) -> bool:
+    recorder = CommandRecorder()
+    options = client_options_from_env()
+    client = create_client(url, [recorder], options)
+    ok = True
+    try:
+        hello = await client.admin.command("hello")
+        if not hello.get("setName"):
+            print("❌ O servidor não faz parte de um replica set (inicie o mongod com --replSet e rode rs.initiate())")
+            return False
+        print(f"🔗 Replica set {hello['setName']}: {', '.join(hello.get('hosts', []))} (primário {hello.get('primary')})")
+
+        read_preference = analytics_read_preference()
+        write_concern = purchase_write_concern()
+        analytics = client.get_database(db_name, read_preference=read_preference)
+        purchases = client.get_database(db_name, write_concern=write_concern)
+        recorder.take()
+
+        # Leituras pesadas: rankings, /stats e ganhadores
+        expected_mode = read_preference.mongos_mode
+        for collection, query in (("leaderboards", {"board": "all"}), ("counters", {"_id": "stats"}), ("winners", {})):
+            try:
+                await analytics[collection].find_one(query)
+            except PyMongoError as e:
+                print(f"❌ leitura em {collection} com {read_preference.name}: {type(e).__name__}")
+                ok = False
+                continue
+            command = next(c for c in recorder.take() if c["name"] == "find")
+            sent = (command["read_preference"] or {}).get("mode", "primary")
+            good = sent == expected_mode
+            ok &= good
+            print(f"{'✅' if good else '❌'} find {collection}: $readPreference {sent} "
+                  f"(esperado {expected_mode}) no servidor {command['server']}")
+
+        # Escrita do caminho das compras
+        await purchases[CHECK_COLLECTION].insert_one({"check": True})
+        command = next(c for c in recorder.take() if c["name"] == "insert")
+        expected = write_concern.document
+        good = command["write_concern"] == expected
+        ok &= good
+        print(f"{'✅' if good else '❌'} insert {CHECK_COLLECTION}: writeConcern {command['write_concern']} "
+              f"(esperado {expected}) no servidor {command['server']}")
+        await client[db_name].drop_collection(CHECK_COLLECTION)
+
+        print(f"\n⚙️  Pool: {options}")
+    finally:
+        client.close()
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Confere read preference e write concern contra um replica set")
+    parser.add_argument("--db", help="banco usado (padrão: DB_NAME)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    ok = await check(os.environ['MONGO_URL'], args.db or os.environ['DB_NAME'])
+    print("\n✅ Roteamento conforme a configuração" if ok else "\n❌ Roteamento diferente do configurado")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Contadores do painel (/stats) mantidos num único documento.
+
+As rotas de escrita aplicam `$inc` atômico no documento `counters/stats`; o
+/stats vira uma leitura por _id. A reconciliação recalcula os contadores a
+partir das coleções e corrige qualquer desvio:
+
+    python counters.py reconcile
+
+ou periodicamente no servidor com STATS_RECONCILE_INTERVAL_SECONDS > 0.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from purchase_buckets import count_purchases
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "stats"
+STATS_FIELDS = ("total_raffles", "active_raffles", "total_users", "total_purchases")
+
+
+async def increment(db, **deltas: int):
+    """Soma os deltas nos contadores, ignorando os nulos"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        await db.counters.update_one({"_id": STATS_ID}, {"$inc": deltas}, upsert=True)
+
+
+async def record_raffle_status_change(db, old_status: str, new_status: str):
+    """Ajusta o contador de rifas ativas quando o status de uma rifa muda"""
+    if old_status != new_status:
+        await increment(db, active_raffles=(new_status == "active") - (old_status == "active"))
+
+
+async def reconcile_stats(db) -> dict:
+    """Recalcula os contadores a partir das coleções de origem"""
+    stats = {
+        "total_raffles": await db.raffles.count_documents({}),
+        "active_raffles": await db.raffles.count_documents({"status": "active"}),
+        "total_users": await db.users.count_documents({}),
+        "total_purchases": await db.purchases.count_documents({"payment_status": "paid"}) + await count_purchases(db),
+    }
+    previous = await db.counters.find_one_and_update(
+        {"_id": STATS_ID}, {"$set": stats}, upsert=True, projection={"_id": 0}
+    ) or {}
+    drift = {k: stats[k] - previous.get(k, 0) for k in STATS_FIELDS if stats[k] != previous.get(k, 0)}
+    if previous and drift:
+        logger.warning("Contadores do /stats corrigidos: %s", drift)
+    return stats
+
+
+async def read_stats(db) -> dict:
+    """Lê os contadores; na primeira vez, calcula-os a partir das coleções"""
+    doc = await db.counters.find_one({"_id": STATS_ID}, {"_id": 0})
+    if doc is None:
+        return await reconcile_stats(db)
+    return {k: doc.get(k, 0) for k in STATS_FIELDS}
+
+
+async def reconcile_periodically(db, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reconcile_stats(db)
+        except Exception:
+            logger.exception("Falha na reconciliação dos contadores")
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Contadores do /stats")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("reconcile", help="recalcula os contadores a partir das coleções")
+    parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        stats = await reconcile_stats(client[os.environ['DB_NAME']])
+        print(f"📈 Contadores reconciliados: {stats}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""Sorteio verificável do número vencedor de uma rifa.
+
+O índice sorteado é SHA-256("<semente>:<raffle_id>:<prize_id>") módulo a
+quantidade de números vendidos, e o número vencedor é o de posição `índice`
+na lista crescente dos vendidos (select sobre o bitmap, sem carregar
+compras). O sorteio guarda o bitmap usado (base64) junto com o digest, então
+com a semente publicada qualquer pessoa refaz a conta mesmo que a rifa tenha
+vendido mais números depois (verify_draw).
+"""
+import hashlib
+
+from ticket_index import SoldBitmap
+
+
+class NoTicketsSoldError(Exception):
+    """A rifa não tem números vendidos para sortear"""
+
+
+def winning_index(seed: str, raffle_id: str, prize_id: str, sold_count: int) -> int:
+    if sold_count < 1:
+        raise NoTicketsSoldError(raffle_id)
+    digest = hashlib.sha256(f"{seed}:{raffle_id}:{prize_id}".encode()).digest()
+    return int.from_bytes(digest, "big") % sold_count
+
+
+def draw_number(sold: SoldBitmap, seed: str, raffle_id: str, prize_id: str) -> dict:
+    """Sorteia o número vencedor e devolve os dados para verificação"""
+    sold_count = sold.count()
+    index = winning_index(seed, raffle_id, prize_id, sold_count)
+    return {
+        "seed": seed,
+        "sold_count": sold_count,
+        "winning_index": index,
+        "winning_number": sold.select(index),
+        "sold_version": sold.version,
+        "sold_digest": sold.digest(),
+        "sold_bitmap": sold.to_base64(),
+    }
+
+
+def verify_draw(draw: dict) -> bool:
+    """Refaz o sorteio a partir da semente e do bitmap guardados"""
+    sold = SoldBitmap.from_base64(draw["sold_bitmap"])
+    if sold.digest() != draw["sold_digest"] or sold.count() != draw["sold_count"]:
+        return False
+    index = winning_index(draw["seed"], draw["raffle_id"], draw["prize_id"], draw["sold_count"])
+    return index == draw["winning_index"] and sold.select(index) == draw["winning_number"]
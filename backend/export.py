@@ -0,0 +1,245 @@
+"""Exportação em streaming de compras, ganhadores e usuários para auditoria e pagamentos.
+
+Formatos:
+
+- csv: CSV com cabeçalho, comprimido em gzip enquanto sai (compression=none
+  para texto puro);
+- parquet: colunar, um row group por lote, compressão zstd, gzip ou none;
+- arrow: Arrow IPC em stream, um record batch por lote, zstd ou none.
+
+Sem `compression` vale a primeira de EXPORT_COMPRESSIONS do formato.
+
+Os documentos vêm de um cursor no servidor em lotes de EXPORT_BATCH_SIZE
+(5000), e cada lote é convertido e comprimido numa thread (asyncio.to_thread)
+antes de sair na resposta. A memória fica limitada a um lote,
+seja a exportação de mil ou de dez milhões de linhas, e o event loop continua
+atendendo as outras requisições.
+
+Compras incluem as guardadas em buckets (purchase_buckets.py). Usuários
+filtrados por rifa são os que compraram nela, pelas linhas por hora dos
+rankings.
+"""
+import asyncio
+import csv
+import io
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from purchase_buckets import BUCKET_MAX, paid_purchases
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EXPORT_BATCH = int(os.environ.get('EXPORT_BATCH_SIZE', '5000'))
+
+# Colunas de cada exportação: (campo, tipo)
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "purchases": [
+        ("id", "str"), ("user_id", "str"), ("raffle_id", "str"), ("quantity", "int"), ("tickets", "ints"),
+        ("total_amount", "float"), ("payment_status", "str"), ("bonus_boxes", "int"),
+        ("created_at", "datetime"), ("expires_at", "datetime"),
+    ],
+    "winners": [
+        ("id", "str"), ("user_id", "str"), ("user_phone", "str"), ("raffle_id", "str"), ("raffle_title", "str"),
+        ("prize_name", "str"), ("winning_number", "int"), ("date", "datetime"),
+    ],
+    "users": [
+        ("id", "str"), ("phone", "str"), ("name", "str"), ("created_at", "datetime"), ("total_spent", "float"),
+    ],
+}
+# Formato: (media type, extensão)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+GZIP_MEDIA_TYPE = "application/gzip"
+# Compressões aceitas por formato; a primeira é a padrão
+EXPORT_COMPRESSIONS = {
+    "csv": ("gzip", "none"),
+    "parquet": ("zstd", "gzip", "none"),
+    "arrow": ("zstd", "none"),  # Arrow IPC só comprime com lz4 ou zstd
+}
+
+
+def export_file(dataset: str, fmt: str, compression: str, raffle_id: Optional[str] = None) -> Tuple[str, str]:
+    """Media type e nome do arquivo da exportação"""
+    media_type, extension = EXPORT_FORMATS[fmt]
+    name = f"{dataset}-{raffle_id}" if raffle_id else dataset
+    if fmt == "csv" and compression == "gzip":
+        return GZIP_MEDIA_TYPE, f"{name}.csv.gz"
+    return media_type, f"{name}.{extension}"
+
+
+# ---------- leitura ----------
+
+def _range(field: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    bounds = {}
+    if start:
+        bounds["$gte"] = start
+    if end:
+        bounds["$lt"] = end
+    return {field: bounds} if bounds else {}
+
+
+def _projection(dataset: str) -> dict:
+    return {"_id": 0, **{name: 1 for name, _ in EXPORT_COLUMNS[dataset]}}
+
+
+async def purchase_rows(db, raffle_id: str, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None) -> AsyncIterator[dict]:
+    cursor = db.purchases.find({"raffle_id": raffle_id, **_range("created_at", start, end)}, _projection("purchases"))
+    async for doc in cursor.batch_size(EXPORT_BATCH):
+        yield doc
+    fields = [name for name, _ in EXPORT_COLUMNS["purchases"]]
+    async for element in paid_purchases(db, raffle_id, fields, start, end, max(1, EXPORT_BATCH // BUCKET_MAX)):
+        yield {**element, "raffle_id": raffle_id}
+
+
+async def winner_rows(db, raffle_id: Optional[str] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> AsyncIterator[dict]:
+    query = {**({"raffle_id": raffle_id} if raffle_id else {}), **_range("date", start, end)}
+    async for doc in db.winners.find(query, _projection("winners")).batch_size(EXPORT_BATCH):
+        yield doc
+
+
+async def user_rows(db, raffle_id: Optional[str] = None, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> AsyncIterator[dict]:
+    """Usuários por data de cadastro; com raffle_id, só os que compraram na rifa"""
+    created = _range("created_at", start, end)
+    if not raffle_id:
+        async for doc in db.users.find(created, _projection("users")).batch_size(EXPORT_BATCH):
+            yield doc
+        return
+
+    async def load(user_ids: List[str]):
+        return await db.users.find({"id": {"$in": user_ids}, **created}, _projection("users")).to_list(None)
+
+    buyers = db.purchase_rollups.aggregate([
+        {"$match": {"raffle_id": raffle_id}},
+        {"$group": {"_id": "$user_id"}},
+    ], allowDiskUse=True, batchSize=EXPORT_BATCH)
+    user_ids: List[str] = []
+    async for row in buyers:
+        user_ids.append(row["_id"])
+        if len(user_ids) >= EXPORT_BATCH:
+            for doc in await load(user_ids):
+                yield doc
+            user_ids = []
+    if user_ids:
+        for doc in await load(user_ids):
+            yield doc
+
+
+EXPORT_ROWS = {"purchases": purchase_rows, "winners": winner_rows, "users": user_rows}
+
+
+# ---------- codificação ----------
+
+class CsvEncoder:
+    def __init__(self, columns: List[Tuple[str, str]], compression: str = "gzip"):
+        self.columns = columns
+        # wbits=31: saída no formato gzip
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compression == "gzip" else None
+        self._header = True
+
+    def _cell(self, value, kind: str):
+        if value is None:
+            return ""
+        if kind == "datetime":
+            return value.isoformat()
+        if kind == "ints":
+            return " ".join(map(str, value))
+        return value
+
+    def encode(self, rows: List[dict]) -> bytes:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if self._header:
+            writer.writerow([name for name, _ in self.columns])
+            self._header = False
+        for row in rows:
+            writer.writerow([self._cell(row.get(name), kind) for name, kind in self.columns])
+        data = out.getvalue().encode("utf-8")
+        return self._compressor.compress(data) if self._compressor else data
+
+    def finish(self) -> bytes:
+        # Exportação vazia ainda leva o cabeçalho
+        data = self.encode([]) if self._header else b""
+        return data + self._compressor.flush() if self._compressor else data
+
+
+class _Sink(io.RawIOBase):
+    """Destino do escritor do pyarrow: guarda os bytes até a próxima retirada"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ArrowEncoder:
+    """Parquet (um row group por lote) ou Arrow IPC em stream (um record batch por lote)"""
+
+    def __init__(self, columns: List[Tuple[str, str]], fmt: str, compression: str = "zstd"):
+        self.columns = columns
+        types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(),
+                 "datetime": pa.timestamp("ms"), "ints": pa.list_(pa.int64())}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self._sink = _Sink()
+        stream = pa.PythonFile(self._sink, mode="w")
+        codec = None if compression == "none" else compression
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(stream, self.schema, compression=codec or "none")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=codec)
+            self._writer = pa.ipc.new_stream(stream, self.schema, options=options)
+
+    def encode(self, rows: List[dict]) -> bytes:
+        table = pa.Table.from_pydict({name: [row.get(name) for row in rows] for name, _ in self.columns},
+                                     schema=self.schema)
+        self._writer.write_table(table)
+        return self._sink.take()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.take()
+
+
+async def _batches(rows: AsyncIterator[dict], size: int) -> AsyncIterator[List[dict]]:
+    batch: List[dict] = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_export(db, dataset: str, fmt: str = "csv", compression: str = "gzip",
+                        raffle_id: Optional[str] = None, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None) -> AsyncIterator[bytes]:
+    """Corpo da resposta da exportação, lote a lote"""
+    columns = EXPORT_COLUMNS[dataset]
+    encoder = CsvEncoder(columns, compression) if fmt == "csv" else ArrowEncoder(columns, fmt, compression)
+    rows = EXPORT_ROWS[dataset](db, raffle_id, start, end)
+    async for batch in _batches(rows, EXPORT_BATCH):
+        # Conversão e compressão fora do event loop
+        chunk = await asyncio.to_thread(encoder.encode, batch)
+        if chunk:
+            yield chunk
+    chunk = await asyncio.to_thread(encoder.finish)
+    if chunk:
+        yield chunk
@@ -0,0 +1,74 @@
+"""Índices declarados de todas as coleções, aplicados no startup.
+
+`ensure_indexes` é idempotente: um índice que já existe com a mesma
+especificação não é recriado. Toda consulta nova da API precisa de um índice
+aqui e de uma entrada em check_query_plans.py.
+"""
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("phone", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Exportação por data de cadastro
+        IndexModel([("created_at", ASCENDING)]),
+    ],
+    "raffles": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "purchases": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("raffle_id", ASCENDING), ("payment_status", ASCENDING),
+                    ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("payment_status", ASCENDING), ("created_at", ASCENDING)]),
+        # Varredura das reservas pendentes vencidas
+        IndexModel([("payment_status", ASCENDING), ("expires_at", ASCENDING)]),
+    ],
+    # Compras pagas agrupadas por rifa e janela (purchase_buckets.py)
+    "purchase_buckets": [
+        IndexModel([("raffle_id", ASCENDING), ("window_start", DESCENDING)]),
+        # Listagem do usuário em ordem de janela
+        IndexModel([("purchases.user_id", ASCENDING), ("window_start", DESCENDING)]),
+    ],
+    "winners": [
+        IndexModel([("date", DESCENDING)]),
+        IndexModel([("raffle_id", ASCENDING), ("date", DESCENDING)]),
+    ],
+    # Um sorteio por prêmio
+    "draws": [
+        IndexModel([("raffle_id", ASCENDING), ("prize_id", ASCENDING)], unique=True),
+    ],
+    # Um número só pode ser reservado uma vez por rifa
+    "tickets": [
+        IndexModel([("raffle_id", ASCENDING), ("number", ASCENDING)], unique=True),
+    ],
+    "ticket_index": [
+        IndexModel([("raffle_id", ASCENDING)], unique=True),
+    ],
+    "leaderboards": [
+        IndexModel([("board", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("board", ASCENDING), ("total_tickets", DESCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # Compras pagas por hora, rifa e usuário (rankings por período e por rifa)
+    "purchase_rollups": [
+        IndexModel([("hour", ASCENDING), ("raffle_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+        IndexModel([("raffle_id", ASCENDING), ("hour", ASCENDING)]),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Aplica INDEX_SPECS; uma coleção com erro (ex.: telefones duplicados) não impede as demais"""
+    for collection, models in INDEX_SPECS.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure:
+            logger.exception("Falha ao criar índices de %s", collection)
@@ -0,0 +1,275 @@
+"""Rankings de compradores mantidos incrementalmente.
+
+Cada compra paga soma quantidade e valor nas linhas do usuário em `leaderboards`:
+no ranking geral (`board: "all"`) e no do dia (`board: "daily:AAAA-MM-DD"`, UTC).
+A data que conta é a do pagamento (`paid_at`; `created_at` quando a compra
+já nasceu paga). O ranking do dia vira à meia-noite simplesmente porque a chave muda, e as
+linhas antigas expiram pelo índice TTL em `expires_at`. Ler um ranking é uma
+consulta no índice (board, total_tickets) mais um único `find` de usuários.
+
+Para os demais períodos (semana, mês, intervalo qualquer) e rankings por rifa,
+cada compra paga também soma numa linha de `purchase_rollups` por hora UTC,
+rifa e usuário. Um ranking de período junta só as linhas das horas do período
+(em horas UTC inteiras), então o custo acompanha o tamanho da janela e não o
+total de vendas.
+
+Backfill / recuperação:
+
+    python leaderboards.py rebuild
+    python leaderboards.py rebuild-rollups [--since AAAA-MM-DD]
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+ALL_TIME = "all"
+DAILY_RETENTION = timedelta(days=2)
+# Data do pagamento nas agregações (compras pagas na criação não têm paid_at)
+PAID_TIME = {"$ifNull": ["$paid_at", "$created_at"]}
+
+
+def daily_board(day: Optional[datetime] = None) -> str:
+    return "daily:" + (day or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def hour_of(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def week_start(now: Optional[datetime] = None) -> datetime:
+    """Segunda-feira 00:00 UTC da semana corrente"""
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=today.weekday())
+
+
+def month_start(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def paid_time(purchase: dict) -> datetime:
+    return purchase.get("paid_at") or purchase["created_at"]
+
+
+def paid_since(since: datetime) -> dict:
+    """Filtro das compras pagas a partir de `since`"""
+    return {"$or": [{"paid_at": {"$gte": since}}, {"paid_at": None, "created_at": {"$gte": since}}]}
+
+
+def _buckets_since(since: Optional[datetime]) -> dict:
+    """Buckets que podem ter compras pagas a partir de `since`"""
+    if not since:
+        return {}
+    return {"$or": [{"max_created_at": {"$gte": since}}, {"max_paid_at": {"$gte": since}}]}
+
+
+def _increment(board: str, user_id: str, quantity: int, amount: float,
+               expires_at: Optional[datetime] = None) -> UpdateOne:
+    update = {"$inc": {"total_tickets": quantity, "total_spent": amount}}
+    if expires_at:
+        update["$setOnInsert"] = {"expires_at": expires_at}
+    return UpdateOne({"board": board, "user_id": user_id}, update, upsert=True)
+
+
+def _rollup(hour: datetime, raffle_id: str, user_id: str, quantity: int, amount: float, purchases: int) -> UpdateOne:
+    return UpdateOne(
+        {"hour": hour, "raffle_id": raffle_id, "user_id": user_id},
+        {"$inc": {"total_tickets": quantity, "total_spent": amount, "purchases": purchases}},
+        upsert=True,
+    )
+
+
+async def record_purchases(db, purchases: Iterable[dict]):
+    """Soma compras pagas nos rankings geral e do dia e nas linhas por hora, um bulk_write por coleção"""
+    totals: Dict[Tuple[str, str], list] = {}
+    expires: Dict[str, datetime] = {}
+    rollups: Dict[Tuple[datetime, str, str], list] = {}
+    for p in purchases:
+        day = paid_time(p).replace(hour=0, minute=0, second=0, microsecond=0)
+        expires[daily_board(day)] = day + DAILY_RETENTION
+        for board in (ALL_TIME, daily_board(day)):
+            row = totals.setdefault((board, p["user_id"]), [0, 0.0])
+            row[0] += p["quantity"]
+            row[1] += p["total_amount"]
+        row = rollups.setdefault((hour_of(paid_time(p)), p["raffle_id"], p["user_id"]), [0, 0.0, 0])
+        row[0] += p["quantity"]
+        row[1] += p["total_amount"]
+        row[2] += 1
+    if totals:
+        await db.leaderboards.bulk_write([
+            _increment(board, user_id, quantity, amount, expires.get(board))
+            for (board, user_id), (quantity, amount) in totals.items()
+        ], ordered=False)
+    if rollups:
+        await db.purchase_rollups.bulk_write([
+            _rollup(hour, raffle_id, user_id, quantity, amount, count)
+            for (hour, raffle_id, user_id), (quantity, amount, count) in rollups.items()
+        ], ordered=False)
+
+
+async def top_buyers(db, board: str, limit: int = 10) -> List[dict]:
+    """Top compradores de um ranking, com telefone e nome buscados num único lote"""
+    rows = await db.leaderboards.find(
+        {"board": board},
+        {"_id": 0, "user_id": 1, "total_tickets": 1, "total_spent": 1},
+    ).sort("total_tickets", -1).limit(limit).to_list(limit)
+    return await _with_users(db, rows)
+
+
+async def window_top_buyers(db, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            raffle_id: Optional[str] = None, limit: int = 10) -> List[dict]:
+    """Top compradores juntando as linhas por hora de [start, end) e/ou de uma rifa.
+
+    As bordas caem em horas inteiras: entra a hora de `start` e toda hora que
+    começa antes de `end`.
+    """
+    match: dict = {}
+    if raffle_id:
+        match["raffle_id"] = raffle_id
+    if start or end:
+        match["hour"] = {}
+        if start:
+            match["hour"]["$gte"] = hour_of(start)
+        if end:
+            match["hour"]["$lt"] = end
+    rows = await db.purchase_rollups.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$user_id", "total_tickets": {"$sum": "$total_tickets"},
+                    "total_spent": {"$sum": "$total_spent"}}},
+        {"$sort": {"total_tickets": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "user_id": "$_id", "total_tickets": 1, "total_spent": 1}},
+    ]).to_list(limit)
+    return await _with_users(db, rows)
+
+
+async def _with_users(db, rows: List[dict]) -> List[dict]:
+    """Linhas de ranking com telefone e nome, buscados num único lote"""
+    user_ids = [row["user_id"] for row in rows]
+    users = {
+        u["id"]: u
+        async for u in db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "phone": 1, "name": 1})
+    }
+
+    result = []
+    for row in rows:
+        item = {"_id": row["user_id"], "total_tickets": row["total_tickets"], "total_spent": row["total_spent"]}
+        user = users.get(row["user_id"])
+        if user:
+            item["user_phone"] = user["phone"]
+            item["user_name"] = user.get("name", user["phone"])
+        result.append(item)
+    return result
+
+
+async def rebuild_leaderboards(db) -> int:
+    """Recalcula os rankings geral e do dia a partir das compras pagas"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    await db.leaderboards.delete_many({"board": {"$in": [ALL_TIME, daily_board(today)]}})
+
+    ops = []
+    for since, board, expires_at in (
+        (None, ALL_TIME, None),
+        (today, daily_board(today), today + DAILY_RETENTION),
+    ):
+        pipeline = [
+            {"$match": {"payment_status": "paid", **(paid_since(since) if since else {})}},
+            {"$group": {
+                "_id": "$user_id",
+                "total_tickets": {"$sum": "$quantity"},
+                "total_spent": {"$sum": "$total_amount"}
+            }},
+        ]
+        async for row in db.purchases.aggregate(pipeline):
+            ops.append(_increment(board, row["_id"], row["total_tickets"], row["total_spent"], expires_at))
+        # Compras guardadas em buckets (purchase_buckets.py); os $inc somam com as de cima
+        bucket_pipeline = [
+            {"$match": _buckets_since(since)},
+            {"$unwind": "$purchases"},
+            {"$replaceRoot": {"newRoot": "$purchases"}},
+            *pipeline,
+        ]
+        async for row in db.purchase_buckets.aggregate(bucket_pipeline):
+            ops.append(_increment(board, row["_id"], row["total_tickets"], row["total_spent"], expires_at))
+    if ops:
+        await db.leaderboards.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def rebuild_rollups(db, since: Optional[datetime] = None, batch_size: int = 10000) -> int:
+    """Recalcula as linhas por hora a partir das compras pagas (documentos e buckets)"""
+    since = hour_of(since) if since else None
+    await db.purchase_rollups.delete_many({"hour": {"$gte": since}} if since else {})
+
+    group = [
+        {"$group": {
+            "_id": {"hour": {"$dateFromParts": {
+                        "year": {"$year": PAID_TIME}, "month": {"$month": PAID_TIME},
+                        "day": {"$dayOfMonth": PAID_TIME}, "hour": {"$hour": PAID_TIME}}},
+                    "raffle_id": "$raffle_id", "user_id": "$user_id"},
+            "total_tickets": {"$sum": "$quantity"},
+            "total_spent": {"$sum": "$total_amount"},
+            "purchases": {"$sum": 1},
+        }},
+    ]
+    match = {"payment_status": "paid", **(paid_since(since) if since else {})}
+    sources = [
+        (db.purchases, [{"$match": match}, *group]),
+        # Nos buckets o raffle_id fica no bucket; devolve-o a cada compra antes de agrupar
+        (db.purchase_buckets, [
+            {"$match": _buckets_since(since)},
+            {"$unwind": "$purchases"},
+            {"$addFields": {"purchases.raffle_id": "$raffle_id"}},
+            {"$replaceRoot": {"newRoot": "$purchases"}},
+            *([{"$match": paid_since(since)}] if since else []),
+            *group,
+        ]),
+    ]
+    rows = 0
+    for collection, pipeline in sources:
+        ops = []
+        async for row in collection.aggregate(pipeline, allowDiskUse=True):
+            key = row["_id"]
+            ops.append(_rollup(key["hour"], key["raffle_id"], key["user_id"],
+                               row["total_tickets"], row["total_spent"], row["purchases"]))
+            if len(ops) >= batch_size:
+                await db.purchase_rollups.bulk_write(ops, ordered=False)
+                rows += len(ops)
+                ops = []
+        if ops:
+            await db.purchase_rollups.bulk_write(ops, ordered=False)
+            rows += len(ops)
+    return rows
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Rankings de compradores")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="recalcula os rankings a partir das compras pagas")
+    rollups = sub.add_parser("rebuild-rollups", help="recalcula as linhas por hora a partir das compras pagas")
+    rollups.add_argument("--since", type=datetime.fromisoformat, help="só a partir desta data (UTC)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.command == "rebuild-rollups":
+            rows = await rebuild_rollups(db, args.since)
+            print(f"🕐 {rows} linhas por hora recalculadas")
+        else:
+            rows = await rebuild_leaderboards(db)
+            print(f"🏆 {rows} linhas de ranking recalculadas")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
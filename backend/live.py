@@ -0,0 +1,269 @@
+"""Feed ao vivo do progresso das rifas por Server-Sent Events.
+
+Uma única tarefa por processo lê, a cada LIVE_FRAME_INTERVAL_SECONDS, o que
+mudou nas rifas acompanhadas (`sold_tickets`, status, versão do índice de
+vendidos e ganhadores novos) e monta um quadro por rifa com tudo o que
+aconteceu no intervalo. Uma rifa vista pela primeira vez (por exemplo, uma
+rifa ativa recém-criada) recebe um quadro com o estado inteiro
+(`previous_version` nulo e todos os números vendidos em `new_ranges`). Cada quadro é codificado uma vez e os mesmos bytes vão
+para a fila de todos os assinantes: o custo por intervalo é um punhado de
+leituras mais uma inserção em fila por assinante, não importa quantas compras
+houve nem quantos clientes estão conectados.
+
+Como lê do MongoDB, o feed vê as vendas de todos os workers. Um assinante
+lento cuja fila enche é desconectado com um evento `reset`; o cliente recarrega
+o estado pelas rotas normais e reconecta.
+
+Configuração: LIVE_FRAME_INTERVAL_SECONDS, LIVE_MAX_QUEUED_FRAMES e
+LIVE_HEARTBEAT_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from ticket_index import SoldBitmap, load_sold_bitmap
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE = "text/event-stream"
+KEEP_ALIVE = b": keep-alive\n\n"
+RESET = b"event: reset\ndata: {}\n\n"
+ALL_RAFFLES: Tuple[str, ...] = ()  # chave de quem acompanha todas as rifas ativas
+# Ganhadores gravados com data até este tanto anterior à maior já vista ainda
+# são entregues (relógios dos workers e inserções lentas)
+WINNER_LOOKBACK = timedelta(seconds=60)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(type(value))
+
+
+def encode_event(event_id: int, event: str, payload: dict) -> bytes:
+    data = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+class Subscriber:
+    __slots__ = ("key", "queue", "lagged")
+
+    def __init__(self, key: Tuple[str, ...], max_queued: int):
+        self.key = key
+        self.queue: asyncio.Queue = asyncio.Queue(max_queued)
+        self.lagged = False
+
+
+class _RaffleState:
+    __slots__ = ("sold_tickets", "status", "bitmap")
+
+    def __init__(self, sold_tickets: int, status: str, bitmap: Optional[SoldBitmap]):
+        self.sold_tickets, self.status, self.bitmap = sold_tickets, status, bitmap
+
+
+class LiveFeed:
+    """Assinaturas por rifa (ou de todas as ativas) e o laço que publica os quadros"""
+
+    def __init__(self, db, interval: float = 0.5, max_queued: int = 64, heartbeat: float = 15.0):
+        self.db = db
+        self.interval = interval
+        self.max_queued = max_queued
+        self.heartbeat = heartbeat
+        # Assinantes agrupados pelo conjunto de rifas: cada grupo recebe os mesmos bytes
+        self._groups: Dict[Tuple[str, ...], Set[Subscriber]] = {}
+        self._last_sent: Dict[Tuple[str, ...], float] = {}
+        self._raffles: Dict[str, _RaffleState] = {}
+        self._last_winner_date: Optional[datetime] = None
+        self._seen_winners: Dict[str, datetime] = {}
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+        self.frames = 0
+        self.dropped = 0
+
+    # ---------- assinaturas ----------
+
+    def subscribe(self, raffle_ids: Iterable[str] = ALL_RAFFLES) -> Subscriber:
+        key = tuple(sorted(set(raffle_ids)))
+        subscriber = Subscriber(key, self.max_queued)
+        self._groups.setdefault(key, set()).add(subscriber)
+        self._last_sent.setdefault(key, time.monotonic())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        group = self._groups.get(subscriber.key)
+        if group is not None:
+            group.discard(subscriber)
+            if not group:
+                del self._groups[subscriber.key]
+                del self._last_sent[subscriber.key]
+
+    async def stream(self, raffle_ids: Iterable[str] = ALL_RAFFLES) -> AsyncIterator[bytes]:
+        """Corpo da resposta SSE de um assinante"""
+        subscriber = self.subscribe(raffle_ids)
+        try:
+            yield f"retry: {int(self.interval * 1000) + 1000}\n\n".encode()
+            while True:
+                yield await subscriber.queue.get()
+                if subscriber.lagged and subscriber.queue.empty():
+                    yield RESET
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(group) for group in self._groups.values())
+
+    # ---------- leitura das mudanças ----------
+
+    async def poll(self) -> Dict[str, dict]:
+        """Lê as rifas acompanhadas e devolve o quadro de cada uma que mudou"""
+        explicit = {raffle_id for key in self._groups for raffle_id in key}
+        known = list(explicit | set(self._raffles))
+        query = {"id": {"$in": known}}
+        if ALL_RAFFLES in self._groups:
+            query = {"$or": [query, {"status": "active"}]}
+        raffles = {
+            r["id"]: r
+            async for r in self.db.raffles.find(query, {"_id": 0, "id": 1, "sold_tickets": 1, "status": 1})
+        }
+        versions = {
+            doc["raffle_id"]: doc.get("version", 0)
+            async for doc in self.db.ticket_index.find(
+                {"raffle_id": {"$in": list(raffles)}}, {"_id": 0, "raffle_id": 1, "version": 1})
+        }
+        winners = await self._new_winners(raffles)
+
+        frames: Dict[str, dict] = {}
+        for raffle_id, raffle in raffles.items():
+            state = self._raffles.get(raffle_id)
+            bitmap = state.bitmap if state else None
+            version = versions.get(raffle_id)
+            previous_version = bitmap.version if bitmap else None
+            if version is not None and version != previous_version:
+                bitmap = await load_sold_bitmap(self.db, raffle_id)
+            self._raffles[raffle_id] = _RaffleState(raffle.get("sold_tickets", 0), raffle.get("status"), bitmap)
+            if state is None:
+                # Primeira leitura: o quadro leva o estado inteiro
+                state = _RaffleState(None, None, None)
+
+            new_ranges = []
+            if bitmap is not None and bitmap is not state.bitmap:
+                new_ranges = bitmap.added_since(state.bitmap or SoldBitmap(bytearray())).ranges()
+            changed = (bitmap is not state.bitmap or raffle_id in winners
+                       or raffle.get("sold_tickets", 0) != state.sold_tickets or raffle.get("status") != state.status)
+            if changed:
+                frames[raffle_id] = {
+                    "raffle_id": raffle_id,
+                    "sold_tickets": raffle.get("sold_tickets", 0),
+                    "status": raffle.get("status"),
+                    "version": bitmap.version if bitmap else None,
+                    "previous_version": previous_version,
+                    "new_ranges": new_ranges,
+                    "winners": winners.get(raffle_id, []),
+                }
+
+        # Esquece as rifas que ninguém mais acompanha
+        for raffle_id in list(self._raffles):
+            raffle = raffles.get(raffle_id)
+            wanted = raffle_id in explicit or (
+                ALL_RAFFLES in self._groups and raffle is not None and raffle.get("status") == "active")
+            if not wanted:
+                del self._raffles[raffle_id]
+        return frames
+
+    async def _new_winners(self, raffles: Dict[str, dict]) -> Dict[str, List[dict]]:
+        """Ganhadores ainda não entregues, pelo id, lidos pelo índice de data"""
+        if self._last_winner_date is None:
+            # Primeira leitura: os que já existem não são novidade
+            self._last_winner_date = datetime.utcnow()
+            async for winner in self.db.winners.find(
+                    {"date": {"$gte": self._last_winner_date - WINNER_LOOKBACK}}, {"_id": 0, "id": 1, "date": 1}):
+                self._seen_winners[winner["id"]] = winner["date"]
+            return {}
+        since = self._last_winner_date - WINNER_LOOKBACK
+        found: Dict[str, List[dict]] = {}
+        cursor = self.db.winners.find({"date": {"$gte": since}}, {"_id": 0}).sort("date", 1)
+        async for winner in cursor:
+            if winner["id"] in self._seen_winners:
+                continue
+            self._seen_winners[winner["id"]] = winner["date"]
+            self._last_winner_date = max(self._last_winner_date, winner["date"])
+            if winner.get("raffle_id") in raffles:
+                found.setdefault(winner["raffle_id"], []).append(winner)
+        # Só precisa lembrar os que a próxima leitura ainda alcança
+        since = self._last_winner_date - WINNER_LOOKBACK
+        self._seen_winners = {winner_id: date for winner_id, date in self._seen_winners.items() if date >= since}
+        return found
+
+    # ---------- publicação ----------
+
+    def broadcast(self, frames: Dict[str, dict]) -> int:
+        """Codifica cada quadro uma vez e entrega a cada grupo os das suas rifas"""
+        encoded: Dict[str, bytes] = {}
+        for raffle_id, payload in frames.items():
+            self._seq += 1
+            encoded[raffle_id] = encode_event(self._seq, "progress", payload)
+        self.frames += len(encoded)
+
+        now = time.monotonic()
+        delivered = 0
+        for key, group in list(self._groups.items()):
+            if key == ALL_RAFFLES:
+                chunk = b"".join(encoded.values())
+            else:
+                chunk = b"".join(encoded[raffle_id] for raffle_id in key if raffle_id in encoded)
+            if not chunk:
+                if now - self._last_sent[key] < self.heartbeat:
+                    continue
+                chunk = KEEP_ALIVE
+            self._last_sent[key] = now
+            for subscriber in list(group):
+                try:
+                    subscriber.queue.put_nowait(chunk)
+                    delivered += 1
+                except asyncio.QueueFull:
+                    # Assinante lento: sai do grupo e recebe reset ao esvaziar a fila
+                    subscriber.lagged = True
+                    self.dropped += 1
+                    self.unsubscribe(subscriber)
+        return delivered
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._groups:
+                continue
+            try:
+                self.broadcast(await self.poll())
+            except Exception:
+                logger.exception("Falha ao publicar o feed ao vivo")
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "groups": len(self._groups),
+            "raffles": len(self._raffles),
+            "frames": self.frames,
+            "dropped": self.dropped,
+        }
+
+
+def live_feed_from_env(db) -> LiveFeed:
+    return LiveFeed(
+        db,
+        interval=float(os.environ.get('LIVE_FRAME_INTERVAL_SECONDS', '0.5')),
+        max_queued=int(os.environ.get('LIVE_MAX_QUEUED_FRAMES', '64')),
+        heartbeat=float(os.environ.get('LIVE_HEARTBEAT_SECONDS', '15')),
+    )
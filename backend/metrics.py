@@ -0,0 +1,196 @@
+"""Métricas no formato texto do Prometheus, sem dependências externas.
+
+- MetricsMiddleware (ASGI puro): latência por rota, requisições em andamento e
+  contagem de status;
+- MongoCommandListener (command monitoring do pymongo): duração de cada comando
+  por coleção e operação.
+
+O Motor executa o pymongo em threads, então as métricas usam um lock próprio.
+Desligue tudo com METRICS_ENABLED=0.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets)
+        # Por série: contagem de cada faixa (não cumulativa), +Inf, soma
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+def stats_collector(prefix: str, read_stats: Callable[[], dict]) -> Callable[[], List[str]]:
+    """Expõe os valores numéricos de um dict de estatísticas como gauges `<prefix>_<chave>`"""
+    def collect() -> List[str]:
+        lines = []
+        for key, value in read_stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+        return lines
+    return collect
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Registra uma função que gera linhas prontas (ex.: contadores do cache)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento"))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições por rota", ("method", "route")))
+HTTP_RESPONSES = REGISTRY.register(Counter(
+    "http_responses_total", "Respostas por rota e status", ("method", "route", "status")))
+MONGO_DURATION = REGISTRY.register(Histogram(
+    "mongodb_command_duration_seconds", "Duração dos comandos do MongoDB", ("collection", "command")))
+MONGO_FAILURES = REGISTRY.register(Counter(
+    "mongodb_command_failures_total", "Comandos do MongoDB que falharam", ("collection", "command")))
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mede cada requisição pela rota (template) que a atendeu"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            # O FastAPI grava a rota encontrada no scope
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            HTTP_DURATION.observe(labels, elapsed)
+            HTTP_RESPONSES.inc(labels + (str(status),))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Mede cada comando do driver por coleção e operação"""
+
+    def __init__(self):
+        self._pending: Dict[tuple, tuple] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            # getMore traz o id do cursor; o nome vem em "collection"
+            collection = event.command.get("collection", "")
+        self._pending[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event):
+        return self._pending.pop((event.connection_id, event.request_id), ("", event.command_name))
+
+    def succeeded(self, event):
+        MONGO_DURATION.observe(self._finish(event), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        MONGO_DURATION.observe(labels, event.duration_micros / 1e6)
+        MONGO_FAILURES.inc(labels)
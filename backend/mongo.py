@@ -0,0 +1,138 @@
+"""Cliente do MongoDB: pool, timeouts, roteamento de leitura e write concern.
+
+O cliente é criado no startup do app (dentro do event loop do servidor), com
+o pool e os timeouts vindos do ambiente:
+
+    MONGO_MAX_POOL_SIZE (100), MONGO_MIN_POOL_SIZE (0), MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS (10000),
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS (5000)
+
+Além do banco padrão há duas visões do mesmo banco:
+
+- leituras pesadas (rankings, /stats, ganhadores) com MONGO_ANALYTICS_READ_PREFERENCE
+  (primary, primaryPreferred, secondary, secondaryPreferred ou nearest) e
+  MONGO_ANALYTICS_MAX_STALENESS_SECONDS opcional;
+- o caminho das compras com MONGO_PURCHASE_WRITE_CONCERN ("majority" ou um
+  número) e MONGO_PURCHASE_WRITE_JOURNAL (1).
+
+PoolMonitor acompanha as conexões de cada servidor para o /health/ready.
+"""
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from pymongo.write_concern import WriteConcern
+
+# Opção do cliente: variável de ambiente
+CLIENT_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+}
+DEFAULT_OPTIONS = {"maxPoolSize": 100, "minPoolSize": 0, "connectTimeoutMS": 10000, "serverSelectionTimeoutMS": 5000}
+
+
+def client_options_from_env() -> dict:
+    options = dict(DEFAULT_OPTIONS)
+    for option, variable in CLIENT_OPTIONS.items():
+        value = os.environ.get(variable)
+        if value:
+            options[option] = int(value)
+    return options
+
+
+def analytics_read_preference():
+    """Read preference das leituras pesadas (padrão: primary)"""
+    mode = read_pref_mode_from_name(os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'primary'))
+    staleness = int(os.environ.get('MONGO_ANALYTICS_MAX_STALENESS_SECONDS', '-1'))
+    return make_read_preference(mode, None, max_staleness=staleness)
+
+
+def purchase_write_concern() -> WriteConcern:
+    """Write concern do caminho das compras (padrão: majority com journal)"""
+    w = os.environ.get('MONGO_PURCHASE_WRITE_CONCERN', 'majority')
+    journal = os.environ.get('MONGO_PURCHASE_WRITE_JOURNAL', '1') != '0'
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=journal)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Conexões abertas, em uso e esperando no pool de cada servidor"""
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._servers: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, event, **deltas: int):
+        address = "%s:%s" % event.address
+        with self._lock:
+            counts = self._servers.setdefault(address, {"open": 0, "in_use": 0, "waiting": 0, "checkout_failures": 0})
+            for key, delta in deltas.items():
+                counts[key] += delta
+
+    def pool_created(self, event):
+        self._add(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop("%s:%s" % event.address, None)
+
+    def connection_created(self, event):
+        self._add(event, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(event, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(event, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(event, waiting=-1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._add(event, in_use=-1)
+
+    def servers(self) -> Dict[str, dict]:
+        with self._lock:
+            servers = {address: dict(counts) for address, counts in self._servers.items()}
+        for counts in servers.values():
+            counts["saturation"] = counts["in_use"] / self.max_pool_size if self.max_pool_size else 0.0
+        return servers
+
+    def saturated(self) -> bool:
+        """Algum pool com todas as conexões em uso e requisições na fila"""
+        return any(s["in_use"] >= self.max_pool_size and s["waiting"] > 0 for s in self.servers().values())
+
+    def stats(self) -> dict:
+        """Totais de todos os servidores, para as métricas"""
+        servers = self.servers().values()
+        return {
+            "open": sum(s["open"] for s in servers),
+            "in_use": sum(s["in_use"] for s in servers),
+            "waiting": sum(s["waiting"] for s in servers),
+            "checkout_failures": sum(s["checkout_failures"] for s in servers),
+            "max_saturation": max((s["saturation"] for s in servers), default=0.0),
+        }
+
+
+def create_client(url: str, listeners: Iterable = (), options: Optional[dict] = None) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(url, event_listeners=list(listeners), **(options or client_options_from_env()))
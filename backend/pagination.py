@@ -0,0 +1,55 @@
+"""Paginação por keyset em (created_at, id) e streaming NDJSON de cursores.
+
+O token `next` é o par (created_at, id) do último item da página, em base64
+url-safe. Como a ordenação é total (id desempata), o token continua válido
+mesmo com inserções novas entre uma página e outra.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class InvalidCursorError(ValueError):
+    """Token de paginação malformado"""
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"t": doc["created_at"].isoformat(), "id": doc["id"]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return {"created_at": datetime.fromisoformat(data["t"]), "id": str(data["id"])}
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(str(e))
+
+
+def keyset_filter(query: dict, token: Optional[str]) -> dict:
+    """Restringe `query` aos itens depois do token, na ordem (created_at, id) decrescente"""
+    if not token:
+        return query
+    after = decode_cursor(token)
+    return {**query, "$or": [
+        {"created_at": {"$lt": after["created_at"]}},
+        {"created_at": after["created_at"], "id": {"$lt": after["id"]}},
+    ]}
+
+
+async def ndjson_lines(docs: AsyncIterable[dict], batch_size: int = 500) -> AsyncIterator[bytes]:
+    """Serializa documentos (cursor do Motor já com batch_size, por exemplo) como NDJSON, um bloco por lote"""
+    lines = []
+    async for doc in docs:
+        lines.append(dumps(doc))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
@@ -0,0 +1,88 @@
+"""Ciclo de vida das reservas com pagamento assíncrono (PIX).
+
+Com PAYMENT_CONFIRMATION=async a compra nasce `pending`, segurando seus
+números em `tickets` até `expires_at`. A confirmação marca muitas compras como
+`paid` numa única escrita; a varredura passa as vencidas para `expired` em
+lotes e apaga as reservas, devolvendo os números ao pool.
+
+As transições são condicionais (`payment_status: "pending"`), então confirmação
+e varredura concorrentes nunca pegam a mesma compra; cada lote grava um
+`status_batch` próprio para saber exatamente quais compras mudou.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# instant: pagamento aprovado na hora (simulação); async: aguarda confirmação
+PAYMENT_CONFIRMATION = os.environ.get('PAYMENT_CONFIRMATION', 'instant')
+RESERVATION_TTL = timedelta(seconds=float(os.environ.get('RESERVATION_TTL_SECONDS', '900')))
+EXPIRE_BATCH = 1000
+
+
+def hold_expiry(now: Optional[datetime] = None) -> datetime:
+    """Até quando uma compra pendente segura seus números"""
+    return (now or datetime.utcnow()) + RESERVATION_TTL
+
+
+async def _transition(db, purchase_ids: List[str], update: dict) -> List[dict]:
+    """Tira as compras de `pending` e devolve só as alteradas por esta chamada"""
+    batch = str(uuid.uuid4())
+    result = await db.purchases.update_many(
+        {"id": {"$in": purchase_ids}, "payment_status": "pending"},
+        {"$set": {**update, "status_batch": batch}},
+    )
+    if result.modified_count == 0:
+        return []
+    return await db.purchases.find({"id": {"$in": purchase_ids}, "status_batch": batch}, {"_id": 0}).to_list(None)
+
+
+async def confirm_payments(db, purchase_ids: List[str], now: Optional[datetime] = None) -> List[dict]:
+    """Marca as compras pendentes como pagas numa única escrita.
+
+    Uma compra vencida que a varredura ainda não liberou continua confirmável:
+    seus números seguem reservados.
+    """
+    if not purchase_ids:
+        return []
+    return await _transition(db, purchase_ids, {"payment_status": "paid", "paid_at": now or datetime.utcnow()})
+
+
+async def expire_pending(db, now: Optional[datetime] = None, batch_size: int = EXPIRE_BATCH) -> List[dict]:
+    """Expira um lote de compras pendentes vencidas e apaga suas reservas"""
+    now = now or datetime.utcnow()
+    due = await db.purchases.find(
+        {"payment_status": "pending", "expires_at": {"$lte": now}}, {"_id": 0, "id": 1}
+    ).sort("expires_at", 1).limit(batch_size).to_list(batch_size)
+    if not due:
+        return []
+    expired = await _transition(db, [p["id"] for p in due], {"payment_status": "expired", "expired_at": now})
+
+    # Apaga só as reservas destas compras: o número pode já ter outro dono
+    by_raffle: Dict[str, Tuple[List[str], List[int]]] = {}
+    for p in expired:
+        ids, numbers = by_raffle.setdefault(p["raffle_id"], ([], []))
+        ids.append(p["id"])
+        numbers.extend(p["tickets"])
+    for raffle_id, (ids, numbers) in by_raffle.items():
+        await db.tickets.delete_many({"raffle_id": raffle_id, "number": {"$in": numbers}, "purchase_id": {"$in": ids}})
+    return expired
+
+
+async def expire_periodically(db, interval: float, on_expired: Callable[[List[dict]], None]):
+    """Varre as reservas vencidas a cada `interval` segundos, lote a lote"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            while True:
+                expired = await expire_pending(db)
+                if not expired:
+                    break
+                on_expired(expired)
+                logger.info("%d reservas vencidas liberadas", len(expired))
+        except Exception:
+            logger.exception("Falha na liberação das reservas vencidas")
@@ -0,0 +1,283 @@
+"""Armazenamento opcional das compras pagas em buckets por rifa.
+
+Com PURCHASE_STORAGE=buckets cada compra paga vira um elemento de um documento
+de `purchase_buckets` que agrupa as compras da mesma rifa numa janela de
+PURCHASE_BUCKET_SECONDS (3600), com até PURCHASE_BUCKET_MAX (1000) compras e
+PURCHASE_BUCKET_MAX_TICKETS (200000) números por bucket, o que mantém o
+documento em poucos MB, longe do limite de 16 MB do MongoDB:
+
+    {raffle_id, window_start, count, tickets, min_created_at, max_created_at,
+     max_paid_at, purchases: [{id, user_id, tickets, quantity, ...}, ...]}
+
+Uma rifa de 1M de números comprada aos poucos passa de centenas de milhares de
+documentos (e entradas em cada índice) para algumas centenas de buckets. As
+janelas não se sobrepõem, então a listagem da rifa lê os buckets em ordem de
+janela e ordena só os elementos de cada janela.
+
+Compras pendentes continuam em `purchases` e vão para os buckets ao serem
+confirmadas. As leituras juntam as duas coleções, então os dados antigos
+continuam visíveis e as respostas não mudam. Migração das compras já pagas:
+
+    python purchase_buckets.py migrate --raffle RAFFLE_ID
+    python purchase_buckets.py migrate --min-purchases 10000
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+PURCHASE_STORAGE = os.environ.get('PURCHASE_STORAGE', 'documents')
+BUCKET_SECONDS = int(os.environ.get('PURCHASE_BUCKET_SECONDS', '3600'))
+BUCKET_MAX = int(os.environ.get('PURCHASE_BUCKET_MAX', '1000'))
+# Cada número ocupa ~12 bytes no array `tickets` do elemento
+BUCKET_MAX_TICKETS = int(os.environ.get('PURCHASE_BUCKET_MAX_TICKETS', '200000'))
+MIGRATE_BATCH = 5000
+EPOCH = datetime(1970, 1, 1)
+
+
+class BucketWriteError(Exception):
+    """Falha ao gravar compras nos buckets; `stored` traz as que foram gravadas"""
+
+    def __init__(self, stored: Set[str]):
+        super().__init__(f"{len(stored)} compras gravadas antes da falha")
+        self.stored = stored
+
+
+def window_start(created_at: datetime) -> datetime:
+    seconds = int((created_at - EPOCH).total_seconds()) // BUCKET_SECONDS * BUCKET_SECONDS
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def _element(purchase: dict) -> dict:
+    return {k: v for k, v in purchase.items() if k not in ("_id", "raffle_id")}
+
+
+def _purchase(raffle_id: str, element: dict) -> dict:
+    """Elemento do bucket de volta ao formato do documento de compra"""
+    return {"id": element["id"], "user_id": element["user_id"], "raffle_id": raffle_id, **element}
+
+
+def _chunks(items: List[dict]) -> Iterator[List[dict]]:
+    """Divide as compras em pedaços que cabem num bucket vazio (uma compra maior que o teto vai sozinha)"""
+    chunk: List[dict] = []
+    tickets = 0
+    for p in items:
+        if chunk and (len(chunk) >= BUCKET_MAX or tickets + p["quantity"] > BUCKET_MAX_TICKETS):
+            yield chunk
+            chunk, tickets = [], 0
+        chunk.append(p)
+        tickets += p["quantity"]
+    if chunk:
+        yield chunk
+
+
+def _key(purchase: dict):
+    return purchase["created_at"], purchase["id"]
+
+
+async def append_purchases(db, purchases: Iterable[dict]):
+    """Acrescenta compras pagas aos buckets das suas janelas, num único bulk_write ordenado"""
+    groups: Dict[tuple, List[dict]] = {}
+    for p in purchases:
+        groups.setdefault((p["raffle_id"], window_start(p["created_at"])), []).append(p)
+
+    ops, op_ids = [], []
+    for (raffle_id, window), items in groups.items():
+        for chunk in _chunks(items):
+            tickets = sum(p["quantity"] for p in chunk)
+            paid_at = [p["paid_at"] for p in chunk if p.get("paid_at")]
+            # Só casa um bucket onde o pedaço inteiro cabe; senão o upsert abre outro na mesma janela
+            ops.append(UpdateOne(
+                {"raffle_id": raffle_id, "window_start": window, "count": {"$lte": BUCKET_MAX - len(chunk)},
+                 "tickets": {"$lte": BUCKET_MAX_TICKETS - tickets}},
+                {
+                    "$push": {"purchases": {"$each": [_element(p) for p in chunk]}},
+                    "$inc": {"count": len(chunk), "tickets": tickets},
+                    "$min": {"min_created_at": min(p["created_at"] for p in chunk)},
+                    "$max": {"max_created_at": max(p["created_at"] for p in chunk),
+                             **({"max_paid_at": max(paid_at)} if paid_at else {})},
+                },
+                upsert=True,
+            ))
+            op_ids.append([p["id"] for p in chunk])
+    if not ops:
+        return
+    try:
+        await db.purchase_buckets.bulk_write(ops, ordered=True)
+    except BulkWriteError as e:
+        failed_at = min(err["index"] for err in e.details.get("writeErrors", [])) if e.details.get("writeErrors") else 0
+        raise BucketWriteError({i for ids in op_ids[:failed_at] for i in ids}) from e
+
+
+def _newest_first(purchases: List[dict], after: Optional[dict]) -> List[dict]:
+    """Compras em ordem (created_at, id) decrescente, depois do cursor"""
+    if after:
+        limit = (after["created_at"], after["id"])
+        purchases = [p for p in purchases if _key(p) < limit]
+    purchases.sort(key=_key, reverse=True)
+    return purchases
+
+
+def _sorted_after(raffle_id: str, elements: List[dict], after: Optional[dict]) -> List[dict]:
+    """Elementos de uma janela em ordem (created_at, id) decrescente, depois do cursor"""
+    return _newest_first([_purchase(raffle_id, e) for e in elements], after)
+
+
+def _element_projection(fields: Iterable[str]) -> dict:
+    return {f"purchases.{f}": 1 for f in fields if f != "raffle_id"}
+
+
+async def raffle_purchases(db, raffle_id: str, fields: Iterable[str],
+                           after: Optional[dict] = None) -> AsyncIterator[dict]:
+    """Compras da rifa nos buckets, da mais nova para a mais antiga, depois do cursor"""
+    query = {"raffle_id": raffle_id}
+    if after:
+        query["window_start"] = {"$lte": after["created_at"]}
+    projection = {"_id": 0, "window_start": 1, **_element_projection(fields)}
+    cursor = db.purchase_buckets.find(query, projection).sort("window_start", -1)
+    window, elements = None, []
+    async for bucket in cursor:
+        if bucket["window_start"] != window:
+            for p in _sorted_after(raffle_id, elements, after):
+                yield p
+            window, elements = bucket["window_start"], []
+        elements.extend(bucket["purchases"])
+    for p in _sorted_after(raffle_id, elements, after):
+        yield p
+
+
+async def user_purchases(db, user_id: str, fields: Iterable[str],
+                         after: Optional[dict] = None) -> AsyncIterator[dict]:
+    """Compras do usuário nos buckets de todas as rifas, da mais nova para a mais antiga.
+
+    As janelas são as mesmas em todas as rifas, então, como em raffle_purchases,
+    os buckets vêm em ordem de janela pelo índice (purchases.user_id,
+    window_start) e só as compras do usuário em cada janela são ordenadas. O
+    cursor corta as janelas mais novas; nada é ordenado no servidor.
+    """
+    match: dict = {"purchases.user_id": user_id}
+    if after:
+        match["window_start"] = {"$lte": after["created_at"]}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"window_start": -1}},
+        {"$project": {"_id": 0, "raffle_id": 1, "window_start": 1, "purchases": {
+            "$filter": {"input": "$purchases", "cond": {"$eq": ["$$this.user_id", user_id]}}}}},
+    ]
+    fields = set(fields)
+    window, purchases = None, []
+    async for bucket in db.purchase_buckets.aggregate(pipeline):
+        if bucket["window_start"] != window:
+            for p in _newest_first(purchases, after):
+                yield p
+            window, purchases = bucket["window_start"], []
+        purchases.extend(_purchase(bucket["raffle_id"], {k: v for k, v in e.items() if k in fields})
+                         for e in bucket["purchases"])
+    for p in _newest_first(purchases, after):
+        yield p
+
+
+async def paid_purchases(db, raffle_id: str, fields: Iterable[str], start: Optional[datetime] = None,
+                         end: Optional[datetime] = None, batch_size: int = 100) -> AsyncIterator[dict]:
+    """Compras da rifa nos buckets, sem ordem, só com os campos pedidos (e created_at em [start, end))"""
+    query: dict = {"raffle_id": raffle_id}
+    if start or end:
+        # A janela do bucket é o piso de created_at, então o intervalo também vale para window_start
+        query["window_start"] = {}
+        if start:
+            query["window_start"]["$gte"] = window_start(start)
+        if end:
+            query["window_start"]["$lt"] = end
+    fields = list(fields)
+    projection = {"_id": 0, **_element_projection(fields if not (start or end) else {*fields, "created_at"})}
+    cursor = db.purchase_buckets.find(query, projection).batch_size(batch_size)
+    async for bucket in cursor:
+        for element in bucket["purchases"]:
+            if (start and element["created_at"] < start) or (end and element["created_at"] >= end):
+                continue
+            yield element
+
+
+async def count_purchases(db) -> int:
+    rows = await db.purchase_buckets.aggregate([{"$group": {"_id": None, "n": {"$sum": "$count"}}}]).to_list(1)
+    return rows[0]["n"] if rows else 0
+
+
+async def merge_newest_first(*sources: AsyncIterable[dict]) -> AsyncIterator[dict]:
+    """Junta fontes já ordenadas por (created_at, id) decrescente; ids repetidos saem uma vez"""
+    iterators = [s.__aiter__() for s in sources]
+    heads: List[Optional[dict]] = [await _next(it) for it in iterators]
+    last_id = None
+    while any(h is not None for h in heads):
+        i = max((i for i, h in enumerate(heads) if h is not None), key=lambda i: _key(heads[i]))
+        item = heads[i]
+        heads[i] = await _next(iterators[i])
+        if item["id"] != last_id:
+            last_id = item["id"]
+            yield item
+
+
+async def _next(iterator) -> Optional[dict]:
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def migrate_raffle(db, raffle_id: str, batch_size: int = MIGRATE_BATCH) -> int:
+    """Move as compras pagas da rifa de `purchases` para os buckets.
+
+    Pode ser repetida: compras que já estão nos buckets (migração interrompida)
+    só são apagadas de `purchases`.
+    """
+    stored = {e["id"] async for e in paid_purchases(db, raffle_id, ["id"])}
+    moved = 0
+    while True:
+        batch = await db.purchases.find(
+            {"raffle_id": raffle_id, "payment_status": "paid"}, {"_id": 0}
+        ).sort([("created_at", 1), ("id", 1)]).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return moved
+        await append_purchases(db, [p for p in batch if p["id"] not in stored])
+        await db.purchases.delete_many({"id": {"$in": [p["id"] for p in batch]}, "payment_status": "paid"})
+        moved += len(batch)
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Compras em buckets por rifa")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="move as compras pagas para os buckets")
+    target = migrate.add_mutually_exclusive_group(required=True)
+    target.add_argument("--raffle", help="id da rifa")
+    target.add_argument("--min-purchases", type=int, help="todas as rifas com pelo menos N compras pagas")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.raffle:
+            raffle_ids = [args.raffle]
+        else:
+            raffle_ids = [row["_id"] async for row in db.purchases.aggregate([
+                {"$match": {"payment_status": "paid"}},
+                {"$group": {"_id": "$raffle_id", "n": {"$sum": 1}}},
+                {"$match": {"n": {"$gte": args.min_purchases}}},
+            ])]
+        for raffle_id in raffle_ids:
+            moved = await migrate_raffle(db, raffle_id)
+            print(f"📦 Rifa {raffle_id}: {moved} compras movidas para os buckets")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
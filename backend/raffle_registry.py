@@ -0,0 +1,209 @@
+"""Registro em memória das rifas ativas para o caminho das compras.
+
+Cada entrada guarda só o que a compra precisa (preço, `total_tickets`, status)
+e a tabela de caixas bônus já ordenada, consultada por bisect. Assim a compra
+não lê o documento da rifa nem reconstrói o modelo `Raffle` com os prêmios.
+
+O registro se mantém atualizado por change stream da coleção `raffles` quando
+o MongoDB oferece (replica set) e, caso contrário, recarregando as rifas
+ativas a cada RAFFLE_REGISTRY_POLL_SECONDS (5). RAFFLE_REGISTRY_MODE escolhe
+"auto" (padrão), "change_stream" ou "polling". As rotas deste processo que
+criam ou concluem rifas também atualizam o registro na hora.
+
+Rifa fora do registro (inativa ou ainda não vista) é lida do banco e entra no
+registro se estiver ativa. Rifas inativas são devolvidas com o status, para
+quem consulta recusar a compra, mas não ficam no registro.
+"""
+import asyncio
+import logging
+import os
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("id", "price_per_ticket", "total_tickets", "status", "bonus_boxes")
+PROJECTION = {name: 1 for name in FIELDS}
+# Mudanças que não alteram a entrada (a cada compra o $inc de sold_tickets) são ignoradas
+WATCHED_FIELDS = frozenset(FIELDS)
+
+
+class RaffleEntry:
+    __slots__ = ("id", "price_per_ticket", "total_tickets", "status", "_tier_quantities", "_tier_boxes")
+
+    def __init__(self, raffle_id: str, price_per_ticket: float, total_tickets: int, status: str,
+                 bonus_rules: Iterable[dict] = ()):
+        self.id = raffle_id
+        self.price_per_ticket = price_per_ticket
+        self.total_tickets = total_tickets
+        self.status = status
+        # Uma faixa por quantidade; com quantidades repetidas vale a primeira regra, como em calculate_bonus_boxes
+        tiers: Dict[int, int] = {}
+        for rule in bonus_rules:
+            tiers.setdefault(rule["quantity"], rule["boxes"])
+        self._tier_quantities = sorted(tiers)
+        self._tier_boxes = [tiers[q] for q in self._tier_quantities]
+
+    @property
+    def active(self) -> bool:
+        return self.status == "active"
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "RaffleEntry":
+        return cls(doc["id"], doc["price_per_ticket"], doc["total_tickets"], doc.get("status", "active"),
+                   doc.get("bonus_boxes") or ())
+
+    def bonus_boxes(self, quantity: int) -> int:
+        """Caixas da maior faixa alcançada pela quantidade"""
+        i = bisect_right(self._tier_quantities, quantity)
+        return self._tier_boxes[i - 1] if i else 0
+
+
+class RaffleRegistry:
+    def __init__(self, db, mode: str = "auto", poll_interval: float = 5.0):
+        if mode not in ("auto", "change_stream", "polling"):
+            raise ValueError(f"Modo do registro de rifas desconhecido: {mode}")
+        self.db = db
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self._entries: Dict[str, RaffleEntry] = {}
+        self._ids: Dict[object, str] = {}  # _id -> id, para os eventos de remoção
+        self._task: Optional[asyncio.Task] = None
+        self.source: Optional[str] = None  # "change_stream" ou "polling", depois do start
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.changes = 0
+
+    # ---------- consulta ----------
+
+    async def get(self, raffle_id: str) -> Optional[RaffleEntry]:
+        """Entrada da rifa (inativa inclusive, ver `status`); None se não existir"""
+        entry = self._entries.get(raffle_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        doc = await self.db.raffles.find_one({"id": raffle_id}, PROJECTION)
+        return self.put(doc) if doc else None
+
+    async def get_many(self, raffle_ids: Iterable[str]) -> Dict[str, RaffleEntry]:
+        """Entradas das rifas existentes, como em `get`"""
+        found: Dict[str, RaffleEntry] = {}
+        missing: List[str] = []
+        for raffle_id in raffle_ids:
+            entry = self._entries.get(raffle_id)
+            if entry is not None:
+                found[raffle_id] = entry
+            else:
+                missing.append(raffle_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            async for doc in self.db.raffles.find({"id": {"$in": missing}}, PROJECTION):
+                found[doc["id"]] = self.put(doc)
+        return found
+
+    # ---------- atualização ----------
+
+    def put(self, doc: dict) -> RaffleEntry:
+        """Atualiza a entrada a partir do documento; rifas inativas saem do registro"""
+        entry = RaffleEntry.from_document(doc)
+        if entry.active:
+            self._entries[entry.id] = entry
+            if "_id" in doc:
+                self._ids[doc["_id"]] = entry.id
+        else:
+            self.remove(entry.id)
+        return entry
+
+    def remove(self, raffle_id: str):
+        self._entries.pop(raffle_id, None)
+
+    async def load(self):
+        """Recarrega todas as rifas ativas de uma vez"""
+        entries: Dict[str, RaffleEntry] = {}
+        ids: Dict[object, str] = {}
+        async for doc in self.db.raffles.find({"status": "active"}, PROJECTION):
+            entries[doc["id"]] = RaffleEntry.from_document(doc)
+            ids[doc["_id"]] = doc["id"]
+        self._entries, self._ids = entries, ids
+        self.refreshes += 1
+
+    async def _apply_change(self, change: dict):
+        operation = change["operationType"]
+        if operation in ("insert", "replace"):
+            self.put(change["fullDocument"])
+        elif operation == "update":
+            description = change.get("updateDescription", {})
+            touched = {path.split(".")[0] for path in description.get("updatedFields", {})}
+            touched.update(path.split(".")[0] for path in description.get("removedFields", []))
+            if touched & WATCHED_FIELDS:
+                doc = await self.db.raffles.find_one({"_id": change["documentKey"]["_id"]}, PROJECTION)
+                if doc:
+                    self.put(doc)
+        elif operation == "delete":
+            raffle_id = self._ids.pop(change["documentKey"]["_id"], None)
+            if raffle_id:
+                self.remove(raffle_id)
+        else:
+            # drop, rename, invalidate: recomeça do zero
+            await self.load()
+        self.changes += 1
+
+    async def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with self.db.raffles.watch(resume_after=resume_token) as stream:
+                    self.source = "change_stream"
+                    if resume_token is None:
+                        await self.load()  # depois de abrir o stream, para não perder mudanças
+                    async for change in stream:
+                        await self._apply_change(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if self.source is None and self.mode == "auto":
+                    logger.info("Change streams indisponíveis (%s); registro de rifas por polling", e)
+                    return await self._poll()
+                logger.exception("Change stream de rifas interrompido; recarregando")
+                resume_token = None
+            except PyMongoError:
+                logger.exception("Change stream de rifas interrompido; retomando")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self):
+        self.source = "polling"
+        while True:
+            try:
+                await self.load()
+            except PyMongoError:
+                logger.exception("Falha ao recarregar o registro de rifas")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._poll() if self.mode == "polling" else self._watch())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+            "change_stream": int(self.source == "change_stream"),
+        }
+
+
+def raffle_registry_from_env(db) -> RaffleRegistry:
+    return RaffleRegistry(
+        db,
+        mode=os.environ.get('RAFFLE_REGISTRY_MODE', 'auto'),
+        poll_interval=float(os.environ.get('RAFFLE_REGISTRY_POLL_SECONDS', '5')),
+    )
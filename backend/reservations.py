@@ -0,0 +1,114 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from ticket_allocator import TicketAllocator, InsufficientTicketsError
+
+DUPLICATE_KEY = 11000
+
+
+class ReservationConflictError(Exception):
+    """Não foi possível reservar os números após várias tentativas"""
+
+
+async def reserve_many(db, allocator: TicketAllocator, raffle_id: str, orders: List[Tuple[str, str, int]],
+                       max_attempts: int = 8) -> Tuple[Dict[str, List[int]], Dict[str, Exception]]:
+    """Reserva números para várias compras da mesma rifa de forma atômica.
+
+    `orders` traz (purchase_id, user_id, quantity). Cada número vira um
+    documento em `tickets` com índice único em (raffle_id, number), gravados
+    com um único insert_many por tentativa. Se outro processo já tiver o
+    número, o insert falha com chave duplicada, o número fica marcado como
+    vendido no pool local e um novo número é sorteado. Nenhum lock é necessário.
+
+    Retorna os números reservados de cada compra e o erro das compras que não
+    puderam ser atendidas por inteiro; destas nada fica reservado.
+    """
+    users = {purchase_id: user_id for purchase_id, user_id, _ in orders}
+    reserved: Dict[str, List[int]] = {purchase_id: [] for purchase_id, _, _ in orders}
+    missing: Dict[str, int] = {purchase_id: quantity for purchase_id, _, quantity in orders}
+    failed: Dict[str, Exception] = {}
+    try:
+        for _ in range(max_attempts):
+            docs = []
+            now = datetime.utcnow()
+            for purchase_id, quantity in missing.items():
+                try:
+                    numbers = allocator.draw(quantity)
+                except InsufficientTicketsError as e:
+                    failed[purchase_id] = e
+                    continue
+                docs.extend(
+                    {"raffle_id": raffle_id, "number": n, "purchase_id": purchase_id,
+                     "user_id": users[purchase_id], "created_at": now}
+                    for n in numbers
+                )
+            taken = set()
+            if docs:
+                try:
+                    await db.tickets.insert_many(docs, ordered=False)
+                except BulkWriteError as e:
+                    errors = e.details.get("writeErrors", [])
+                    # Números já vendidos por outro processo continuam marcados no pool
+                    taken = {err["index"] for err in errors if err["code"] == DUPLICATE_KEY}
+                    if len(taken) < len(errors):
+                        # Outro erro: desfaz os gravados e devolve ao pool também os que falharam
+                        for i in set(range(len(docs))) - taken:
+                            reserved[docs[i]["purchase_id"]].append(docs[i]["number"])
+                        raise
+            missing = {}
+            for i, doc in enumerate(docs):
+                if i in taken:
+                    missing[doc["purchase_id"]] = missing.get(doc["purchase_id"], 0) + 1
+                else:
+                    reserved[doc["purchase_id"]].append(doc["number"])
+            if not missing:
+                break
+        for purchase_id, quantity in missing.items():
+            failed[purchase_id] = ReservationConflictError(
+                f"{quantity} números sem reserva após {max_attempts} tentativas"
+            )
+    except Exception:
+        await release_tickets(db, allocator, raffle_id, [n for numbers in reserved.values() for n in numbers])
+        raise
+
+    released = [n for purchase_id in failed for n in reserved.pop(purchase_id)]
+    await release_tickets(db, allocator, raffle_id, released)
+    return reserved, failed
+
+
+async def release_tickets(db, allocator: TicketAllocator, raffle_id: str, numbers: List[int]):
+    """Desfaz a reserva dos números e os devolve ao pool"""
+    if numbers:
+        await db.tickets.delete_many({"raffle_id": raffle_id, "number": {"$in": numbers}})
+    for n in numbers:
+        allocator.release(n)
+
+
+async def count_claims(db, raffle_id: str) -> int:
+    """Quantos números da rifa têm reserva (vendidos e pendentes), contados no índice"""
+    return await db.tickets.count_documents({"raffle_id": raffle_id})
+
+
+async def load_claimed_numbers(db, raffle_id: str) -> List[int]:
+    """Números da rifa com reserva, lidos só do índice (raffle_id, number)"""
+    cursor = db.tickets.find({"raffle_id": raffle_id}, {"_id": 0, "number": 1})
+    return [doc["number"] async for doc in cursor.batch_size(10000)]
+
+
+async def find_ticket_owner(db, raffle_id: str, number: int) -> Optional[dict]:
+    """Reserva (purchase_id, user_id) de um número, pelo índice único (raffle_id, number)"""
+    return await db.tickets.find_one(
+        {"raffle_id": raffle_id, "number": number},
+        {"_id": 0, "number": 1, "purchase_id": 1, "user_id": 1},
+    )
+
+
+async def find_ticket_owners(db, raffle_id: str, numbers: List[int]) -> Dict[int, dict]:
+    """Reservas de vários números numa única consulta"""
+    cursor = db.tickets.find(
+        {"raffle_id": raffle_id, "number": {"$in": numbers}},
+        {"_id": 0, "number": 1, "purchase_id": 1, "user_id": 1},
+    )
+    return {doc["number"]: doc async for doc in cursor}
@@ -0,0 +1,52 @@
+"""Caminho rápido de serialização para leituras confiáveis do banco.
+
+Os documentos lidos das coleções foram gravados a partir dos próprios modelos
+(`model.dict()`), então não precisam ser reconstruídos como modelos Pydantic e
+validados de novo pelo `response_model` só para virar JSON. As rotas de leitura
+buscam com `projection(Modelo)`, que traz só os campos do modelo e deixa o
+`_id` de fora, e devolvem `FastJSONResponse` com os dicts como vieram do driver.
+Quando o FastAPI recebe uma Response pronta ele pula a validação; o
+`response_model` continua valendo para a documentação.
+
+Usa orjson quando instalado e o json da biblioteca padrão caso contrário, com a
+mesma saída (datas naive em ISO 8601, sem fuso).
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Type
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"{type(value).__name__} não é serializável em JSON")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def projection(model: Type[BaseModel]) -> dict:
+    """Projeção do MongoDB com exatamente os campos do modelo"""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse com orjson; aceita também o corpo já codificado (bytes)"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -1,27 +1,83 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 import uuid
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, timedelta, timezone
+
+from ticket_allocator import TicketAllocator, InsufficientTicketsError
+from ticket_index import get_sold_bitmap, mark_sold
+from cache import ResponseCache, cache_from_env
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MongoCommandListener, stats_collector
+from indexes import ensure_indexes
+from mongo import PoolMonitor, analytics_read_preference, client_options_from_env, create_client, purchase_write_concern
+from counters import increment as increment_stats, read_stats, reconcile_periodically, record_raffle_status_change
+from draw import NoTicketsSoldError, draw_number
+from pagination import NDJSON_MEDIA_TYPE, InvalidCursorError, decode_cursor, encode_cursor, keyset_filter, ndjson_lines
+from live import MEDIA_TYPE as SSE_MEDIA_TYPE, live_feed_from_env
+from raffle_registry import RaffleEntry, raffle_registry_from_env
+from sold_tickets import sold_tickets_buffer_from_env
+from export import EXPORT_COLUMNS, EXPORT_COMPRESSIONS, EXPORT_FORMATS, export_file, stream_export
+from serialization import FastJSONResponse, dumps as dump_json, projection
+from leaderboards import ALL_TIME, daily_board, month_start, top_buyers, record_purchases, week_start, window_top_buyers
+from payments import PAYMENT_CONFIRMATION, confirm_payments, expire_periodically, hold_expiry
+from purchase_buckets import (PURCHASE_STORAGE, BucketWriteError, append_purchases, merge_newest_first,
+                              raffle_purchases, user_purchases)
+from reservations import (reserve_many, release_tickets, count_claims, load_claimed_numbers, find_ticket_owner,
+                          find_ticket_owners)
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Métricas de rotas e de comandos do MongoDB (desligadas com METRICS_ENABLED=0)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# MongoDB connection (o cliente é criado no startup, ver mongo.py)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+mongo_options = client_options_from_env()
+pool_monitor = PoolMonitor(mongo_options["maxPoolSize"])
+REGISTRY.add_collector(stats_collector("mongo_pool", pool_monitor.stats))
+client: Optional[AsyncIOMotorClient] = None
+db = None
+analytics_db = None  # rankings, /stats e ganhadores, com a read preference configurada
+purchase_db = None  # caminho das compras, com o write concern configurado
+
+# Cache das leituras mais acessadas, invalidado pelas rotas de escrita
+response_cache = cache_from_env()
+REGISTRY.add_collector(stats_collector("response_cache", response_cache.stats))
+
+# Telefone -> usuário (JSON codificado): logins repetidos numa campanha não vão ao banco
+user_cache = ResponseCache(
+    max_entries=int(os.environ.get('USER_CACHE_MAX_ENTRIES', '100000')),
+    ttl=float(os.environ.get('USER_CACHE_TTL_SECONDS', '300')),
+)
+REGISTRY.add_collector(stats_collector("user_cache", user_cache.stats))
+
+# Feed ao vivo do progresso das rifas (SSE), em quadros de intervalo fixo
+live_feed = live_feed_from_env(None)
+REGISTRY.add_collector(stats_collector("live_feed", live_feed.stats))
+
+# Rifas ativas em memória (preço, total, status e faixas de bônus) para o caminho das compras
+raffle_registry = raffle_registry_from_env(None)
+REGISTRY.add_collector(stats_collector("raffle_registry", raffle_registry.stats))
+
+# Incrementos de sold_tickets, gravados na hora ou acumulados (SOLD_TICKETS_WRITE_BEHIND=1);
+# cada gravação acumulada invalida o cache das rifas
+sold_tickets_buffer = sold_tickets_buffer_from_env(None, on_flush=lambda: response_cache.invalidate("raffles"))
+REGISTRY.add_collector(stats_collector("sold_tickets", sold_tickets_buffer.stats))
 
 # Create the main app without a prefix
-app = FastAPI(title="Mega12 - Sistema de Rifas", version="1.0")
+app = FastAPI(title="Mega12 - Sistema de Rifas", version="1.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -79,15 +135,33 @@ class Purchase(BaseModel):
     tickets: List[int]  # números comprados
     quantity: int
     total_amount: float
-    payment_status: str = "pending"  # pending, paid, failed
+    payment_status: str = "pending"  # pending, paid, failed, expired
     bonus_boxes: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None  # compra pendente segura os números até aqui
+    paid_at: Optional[datetime] = None  # confirmação assíncrona; conta nos rankings por esta data
 
 class PurchaseCreate(BaseModel):
     user_id: str
     raffle_id: str
     quantity: int
 
+class BulkPurchaseResult(BaseModel):
+    index: int  # posição do item no lote
+    status_code: int
+    purchase: Optional[Purchase] = None
+    detail: Optional[str] = None
+
+class BulkPurchaseResponse(BaseModel):
+    results: List[BulkPurchaseResult]
+
+class PaymentConfirmation(BaseModel):
+    purchase_ids: List[str]
+
+class PaymentConfirmationResult(BaseModel):
+    confirmed: List[str]
+    not_confirmed: List[str]  # inexistentes, já pagas ou expiradas
+
 class Winner(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -98,14 +172,180 @@ class Winner(BaseModel):
     winning_number: int
     date: datetime = Field(default_factory=datetime.utcnow)
 
+class TicketOwner(BaseModel):
+    number: int
+    purchase_id: Optional[str] = None
+    user_id: str
+    user_phone: Optional[str] = None
+    user_name: Optional[str] = None
+
+class TicketOwnersRequest(BaseModel):
+    numbers: List[int]
+
+class DrawRequest(BaseModel):
+    seed: str  # semente publicada antes do sorteio (ex.: resultado da Loteria Federal)
+    prize_id: Optional[str] = None  # padrão: primeiro prêmio disponível
+
+class Draw(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    raffle_id: str
+    prize_id: str
+    seed: str
+    sold_count: int
+    winning_index: int
+    winning_number: int
+    sold_version: int
+    sold_digest: str
+    sold_bitmap: Optional[str] = None  # vendidos usados no sorteio, em base64 (ver draw.verify_draw)
+    purchase_id: Optional[str] = None
+    winner: Winner
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 # ==================== UTILITY FUNCTIONS ====================
 
-def generate_ticket_numbers(raffle_id: str, quantity: int, existing_tickets: List[int]) -> List[int]:
-    """Gera números aleatórios disponíveis para a rifa"""
-    available = [i for i in range(1, 100001) if i not in existing_tickets]
-    if len(available) < quantity:
-        raise HTTPException(status_code=400, detail="Não há números suficientes disponíveis")
-    return random.sample(available, quantity)
+def connect_mongo():
+    """Cria o cliente do MongoDB e as visões do banco; chamadas seguintes não fazem nada"""
+    global client, db, analytics_db, purchase_db
+    if client is not None:
+        return
+    listeners = [pool_monitor] + ([MongoCommandListener()] if METRICS_ENABLED else [])
+    client = create_client(mongo_url, listeners, mongo_options)
+    db_name = os.environ['DB_NAME']
+    db = client[db_name]
+    analytics_db = client.get_database(db_name, read_preference=analytics_read_preference())
+    purchase_db = client.get_database(db_name, write_concern=purchase_write_concern())
+    live_feed.db = db
+    raffle_registry.db = db
+    sold_tickets_buffer.db = purchase_db
+
+# Pools de números livres por rifa, mantidos em memória entre as compras
+ticket_allocators: Dict[str, TicketAllocator] = {}
+# Montagens e ressincronizações de pool em andamento por rifa
+allocator_builds: Dict[str, asyncio.Task] = {}
+allocator_resyncs: Dict[str, asyncio.Task] = {}
+
+def single_flight(tasks: Dict[str, asyncio.Task], key: str, factory: Callable[[], Awaitable]) -> Awaitable:
+    """Uma execução por chave: chamadas simultâneas esperam a mesma tarefa.
+
+    A tarefa é protegida com shield, então quem desistir (cliente desconectado)
+    não a cancela para os demais.
+    """
+    task = tasks.get(key)
+    if task is None:
+        task = tasks[key] = asyncio.create_task(factory())
+        task.add_done_callback(lambda t: tasks.pop(key) if tasks.get(key) is t else None)
+    return asyncio.shield(task)
+
+async def build_ticket_allocator(raffle: RaffleEntry) -> TicketAllocator:
+    sold = await get_sold_bitmap(db, raffle.id)
+    # Montar o pool custa O(total_tickets + vendidos): fora do event loop
+    allocator = await asyncio.to_thread(TicketAllocator, raffle.total_tickets, sold)
+    ticket_allocators[raffle.id] = allocator
+    return allocator
+
+async def get_ticket_allocator(raffle: RaffleEntry) -> TicketAllocator:
+    """Retorna o pool de números livres da rifa, montando-o uma única vez na primeira compra"""
+    allocator = ticket_allocators.get(raffle.id)
+    if allocator is not None:
+        return allocator
+    return await single_flight(allocator_builds, raffle.id, lambda: build_ticket_allocator(raffle))
+
+def reservation_http_error(error: Exception) -> HTTPException:
+    """Traduz uma falha de reserva de números para a resposta HTTP"""
+    if isinstance(error, InsufficientTicketsError):
+        return HTTPException(status_code=400, detail="Não há números suficientes disponíveis")
+    return HTTPException(status_code=409, detail="Números disputados por outras compras, tente novamente")
+
+async def resync_ticket_allocator(raffle: RaffleEntry) -> bool:
+    """Remonta o pool da rifa a partir das reservas em `tickets` se ele divergiu do banco.
+
+    Cada worker tem seu pool: números liberados em outro worker (reservas
+    vencidas, compras desfeitas) não voltam a ele, e perto de esgotar os pools
+    se afastam. A contagem de reservas é coberta pelo índice (raffle_id, number);
+    só quando ela difere do pool as reservas são lidas. Retorna True se o pool mudou.
+    """
+    async def resync() -> bool:
+        allocator = await get_ticket_allocator(raffle)
+        claimed = await count_claims(purchase_db, raffle.id)
+        if claimed >= raffle.total_tickets or claimed == allocator.sold_count:
+            return False
+        numbers = await load_claimed_numbers(purchase_db, raffle.id)
+        ticket_allocators[raffle.id] = await asyncio.to_thread(TicketAllocator, raffle.total_tickets, numbers)
+        return True
+    return await single_flight(allocator_resyncs, raffle.id, resync)
+
+async def reserve_numbers(raffle: RaffleEntry, orders: List[Tuple[str, str, int]]
+                          ) -> Tuple[Dict[str, List[int]], Dict[str, Exception]]:
+    """Reserva os números das compras (ver reserve_many).
+
+    As compras sem números (400) ou em disputa (409) tentam de novo uma vez
+    se o pool for ressincronizado com o banco.
+    """
+    allocator = await get_ticket_allocator(raffle)
+    reserved, failed = await reserve_many(purchase_db, allocator, raffle.id, orders)
+    if failed and await resync_ticket_allocator(raffle):
+        retry = [order for order in orders if order[0] in failed]
+        more, failed = await reserve_many(purchase_db, ticket_allocators[raffle.id], raffle.id, retry)
+        reserved.update(more)
+    return reserved, failed
+
+async def generate_ticket_numbers(raffle: RaffleEntry, purchase: Purchase) -> List[int]:
+    """Gera e reserva números aleatórios disponíveis para a rifa"""
+    reserved, failed = await reserve_numbers(raffle, [(purchase.id, purchase.user_id, purchase.quantity)])
+    if failed:
+        raise reservation_http_error(failed[purchase.id])
+    return reserved[purchase.id]
+
+def initial_payment_fields() -> dict:
+    """Status inicial da compra conforme PAYMENT_CONFIRMATION"""
+    if PAYMENT_CONFIRMATION == "async":
+        return {"payment_status": "pending", "expires_at": hold_expiry()}
+    return {"payment_status": "paid"}  # Simulando pagamento aprovado
+
+def release_expired_holds(purchases: List[dict]):
+    """Devolve ao pool local os números das reservas vencidas"""
+    for p in purchases:
+        allocator = ticket_allocators.get(p["raffle_id"])
+        if allocator is not None:
+            for n in p["tickets"]:
+                allocator.release(n)
+
+async def store_purchases(purchases: List[Purchase]) -> Set[str]:
+    """Grava compras novas e devolve os ids das que falharam.
+    
+    Com PURCHASE_STORAGE=buckets as pagas vão para os buckets da rifa.
+    """
+    docs = [p.dict() for p in purchases]
+    try:
+        if PURCHASE_STORAGE == "buckets" and all(p.payment_status == "paid" for p in purchases):
+            await append_purchases(purchase_db, docs)
+        else:
+            await purchase_db.purchases.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        return {docs[err["index"]]["id"] for err in e.details.get("writeErrors", [])}
+    except BucketWriteError as e:
+        return {d["id"] for d in docs} - e.stored
+    return set()
+
+async def register_paid_purchases(raffle_id: str, purchases: List[Purchase]):
+    """Propaga compras pagas de uma rifa: índice de vendidos, rankings e contador"""
+    # Atualiza o índice de números vendidos
+    await mark_sold(purchase_db, raffle_id, [n for p in purchases for n in p.tickets])
+    
+    # Atualiza os rankings
+    await record_purchases(purchase_db, [p.dict() for p in purchases])
+    
+    # Atualiza tickets vendidos da rifa
+    await sold_tickets_buffer.increment(raffle_id, sum(p.quantity for p in purchases), len(purchases))
+    
+    # Atualiza os contadores do painel
+    await increment_stats(purchase_db, total_purchases=len(purchases))
+
+def utc_naive(moment: Optional[datetime]) -> Optional[datetime]:
+    """Datas com fuso vão para UTC sem fuso, como são gravadas no banco"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
 
 def calculate_bonus_boxes(quantity: int, bonus_rules: List[dict]) -> int:
     """Calcula quantas caixas bônus o usuário ganha"""
@@ -127,203 +367,587 @@ async def root():
 
 @api_router.post("/users", response_model=User)
 async def create_user(user: UserCreate):
-    # Verifica se usuário já existe
-    existing = await db.users.find_one({"phone": user.phone})
-    if existing:
-        return User(**existing)
-    
+    return FastJSONResponse(await user_cache.get_or_load(user.phone, lambda: upsert_user(user)))
+
+async def upsert_user(user: UserCreate) -> bytes:
+    """Busca ou cria o usuário do telefone numa única operação atômica (índice único em phone)"""
     user_obj = User(**user.dict())
-    await db.users.insert_one(user_obj.dict())
-    return user_obj
+    try:
+        # Devolve o documento de antes: None quando este login criou o usuário
+        existing = await db.users.find_one_and_update(
+            {"phone": user.phone}, {"$setOnInsert": user_obj.dict()}, upsert=True,
+            projection=projection(User), return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        # Outro login do mesmo telefone inseriu primeiro
+        existing = await db.users.find_one({"phone": user.phone}, projection(User))
+    if existing:
+        return dump_json(existing)
+
+    await increment_stats(db, total_users=1)
+    await response_cache.invalidate("stats")
+    return dump_json(user_obj.dict())
 
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id})
+    user = await db.users.find_one({"id": user_id}, projection(User))
     if not user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    return User(**user)
+    return FastJSONResponse(user)
 
 # ==================== RAFFLES ====================
 
 @api_router.get("/raffles", response_model=List[Raffle])
 async def get_active_raffles():
-    raffles = await db.raffles.find({"status": "active"}).to_list(100)
-    return [Raffle(**raffle) for raffle in raffles]
+    # O cache guarda o JSON já codificado
+    async def load():
+        return dump_json(await db.raffles.find({"status": "active"}, projection(Raffle)).to_list(100))
+    return FastJSONResponse(await response_cache.get_or_load("raffles:active", load, tags=("raffles",)))
 
 @api_router.get("/raffles/{raffle_id}", response_model=Raffle)
 async def get_raffle(raffle_id: str):
-    raffle = await db.raffles.find_one({"id": raffle_id})
-    if not raffle:
-        raise HTTPException(status_code=404, detail="Rifa não encontrada")
-    return Raffle(**raffle)
+    async def load():
+        raffle = await db.raffles.find_one({"id": raffle_id}, projection(Raffle))
+        if not raffle:
+            raise HTTPException(status_code=404, detail="Rifa não encontrada")
+        return dump_json(raffle)
+    return FastJSONResponse(await response_cache.get_or_load(f"raffle:{raffle_id}", load, tags=("raffles",)))
 
 @api_router.post("/raffles", response_model=Raffle)
 async def create_raffle(raffle: RaffleCreate):
     raffle_obj = Raffle(**raffle.dict())
-    await db.raffles.insert_one(raffle_obj.dict())
+    doc = raffle_obj.dict()
+    await db.raffles.insert_one(doc)
+    raffle_registry.put(doc)
+    await increment_stats(db, total_raffles=1, active_raffles=int(raffle_obj.status == "active"))
+    await response_cache.invalidate("raffles", "stats")
     return raffle_obj
 
+# Formatos compactos da grade de números, escolhidos por ?format= ou Accept
+TICKET_MEDIA_TYPES = {
+    "application/vnd.mega12.ticket-ranges+json": "ranges",
+    "application/vnd.mega12.ticket-bitmap+json": "bitmap",
+}
+
 @api_router.get("/raffles/{raffle_id}/tickets")
-async def get_raffle_tickets(raffle_id: str):
+async def get_raffle_tickets(raffle_id: str, request: Request, response: Response, format: Optional[str] = None):
     """Retorna todos os números vendidos de uma rifa"""
-    purchases = await db.purchases.find({"raffle_id": raffle_id, "payment_status": "paid"}).to_list(1000)
-    sold_tickets = []
-    for purchase in purchases:
-        sold_tickets.extend(purchase["tickets"])
-    return {"sold_tickets": sold_tickets}
+    if format is None:
+        accept = request.headers.get("accept", "")
+        format = next((f for media, f in TICKET_MEDIA_TYPES.items() if media in accept), "list")
+    if format not in ("list", "ranges", "bitmap"):
+        raise HTTPException(status_code=400, detail="Formato inválido")
+    
+    sold = await get_sold_bitmap(db, raffle_id)
+    
+    # A versão do índice muda a cada venda; clientes revalidam com If-None-Match.
+    # Cada formato tem seu ETag, e o formato pode vir do Accept
+    headers = {"ETag": f'"{sold.version}-{format}"', "Vary": "Accept"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    if format == "ranges":
+        return {"version": sold.version, "count": sold.count(), "ranges": sold.ranges()}
+    if format == "bitmap":
+        return {"version": sold.version, "count": sold.count(), "bitmap": sold.to_base64()}
+    return {"sold_tickets": list(sold)}
+
+MAX_OWNER_LOOKUP = 1000
+
+async def resolve_ticket_owners(raffle_id: str, numbers: List[int]) -> List[TicketOwner]:
+    """Donos dos números: uma consulta em `tickets` e uma em `users`"""
+    claims = await find_ticket_owners(db, raffle_id, numbers)
+    user_ids = list({c["user_id"] for c in claims.values()})
+    users = {
+        u["id"]: u
+        async for u in db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "phone": 1, "name": 1})
+    }
+    owners = []
+    for number in numbers:
+        claim = claims.get(number)
+        if claim:
+            user = users.get(claim["user_id"], {})
+            owners.append(TicketOwner(**claim, user_phone=user.get("phone"), user_name=user.get("name")))
+    return owners
+
+@api_router.get("/raffles/{raffle_id}/tickets/{number}/owner", response_model=TicketOwner)
+async def get_ticket_owner(raffle_id: str, number: int):
+    """Quem tem o número na rifa"""
+    claim = await find_ticket_owner(db, raffle_id, number)
+    if not claim:
+        raise HTTPException(status_code=404, detail="Número não vendido")
+    user = await db.users.find_one({"id": claim["user_id"]}, {"_id": 0, "phone": 1, "name": 1}) or {}
+    return TicketOwner(**claim, user_phone=user.get("phone"), user_name=user.get("name"))
+
+@api_router.post("/raffles/{raffle_id}/tickets/owners", response_model=List[TicketOwner])
+async def get_ticket_owners(raffle_id: str, request: TicketOwnersRequest):
+    """Donos de vários números numa única ida ao banco; números não vendidos ficam de fora"""
+    if len(request.numbers) > MAX_OWNER_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_OWNER_LOOKUP} números por consulta")
+    return await resolve_ticket_owners(raffle_id, list(dict.fromkeys(request.numbers)))
+
+# ==================== LIVE ====================
+
+# Cabeçalhos para proxies não segurarem os quadros
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@api_router.get("/live")
+async def live_all_raffles(raffle_id: List[str] = Query([])):
+    """Progresso ao vivo (vendidos, faixas novas e ganhadores) das rifas pedidas ou de todas as ativas"""
+    return StreamingResponse(live_feed.stream(raffle_id), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
+
+@api_router.get("/raffles/{raffle_id}/live")
+async def live_raffle(raffle_id: str):
+    """Progresso ao vivo de uma rifa"""
+    return StreamingResponse(live_feed.stream([raffle_id]), media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
 
 # ==================== PURCHASES ====================
 
 @api_router.post("/purchases", response_model=Purchase)
 async def create_purchase(purchase: PurchaseCreate):
-    # Busca a rifa
-    raffle = await db.raffles.find_one({"id": purchase.raffle_id})
+    if purchase.quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantidade inválida")
+    
+    # Preço e faixas de bônus vêm do registro em memória
+    raffle = await raffle_registry.get(purchase.raffle_id)
     if not raffle:
         raise HTTPException(status_code=404, detail="Rifa não encontrada")
-    
-    raffle_obj = Raffle(**raffle)
-    
-    # Busca números já vendidos
-    existing_purchases = await db.purchases.find({"raffle_id": purchase.raffle_id, "payment_status": "paid"}).to_list(1000)
-    existing_tickets = []
-    for p in existing_purchases:
-        existing_tickets.extend(p["tickets"])
-    
-    # Gera números
-    try:
-        tickets = generate_ticket_numbers(purchase.raffle_id, purchase.quantity, existing_tickets)
-    except HTTPException as e:
-        raise e
-    
-    # Calcula bônus
-    bonus_boxes = calculate_bonus_boxes(purchase.quantity, raffle_obj.bonus_boxes)
+    if not raffle.active:
+        raise HTTPException(status_code=400, detail="Rifa não está ativa")
     
     # Cria compra
     purchase_obj = Purchase(
         user_id=purchase.user_id,
         raffle_id=purchase.raffle_id,
-        tickets=tickets,
+        tickets=[],
         quantity=purchase.quantity,
-        total_amount=purchase.quantity * raffle_obj.price_per_ticket,
-        bonus_boxes=bonus_boxes,
-        payment_status="paid"  # Simulando pagamento aprovado
+        total_amount=purchase.quantity * raffle.price_per_ticket,
+        bonus_boxes=raffle.bonus_boxes(purchase.quantity),
+        **initial_payment_fields()
     )
     
-    await db.purchases.insert_one(purchase_obj.dict())
+    # Reserva os números (único por rifa, sem lock global)
+    purchase_obj.tickets = await generate_ticket_numbers(raffle, purchase_obj)
+    allocator = ticket_allocators[raffle.id]
     
-    # Atualiza tickets vendidos da rifa
-    await db.raffles.update_one(
-        {"id": purchase.raffle_id},
-        {"$inc": {"sold_tickets": purchase.quantity}}
-    )
+    try:
+        failed = await store_purchases([purchase_obj])
+    except Exception:
+        await release_tickets(purchase_db, allocator, purchase_obj.raffle_id, purchase_obj.tickets)
+        raise
+    if failed:
+        await release_tickets(purchase_db, allocator, purchase_obj.raffle_id, purchase_obj.tickets)
+        raise HTTPException(status_code=500, detail="Falha ao gravar a compra")
+    
+    if purchase_obj.payment_status == "paid":
+        await register_paid_purchases(purchase_obj.raffle_id, [purchase_obj])
+        await response_cache.invalidate("raffles", "stats")
     
     return purchase_obj
 
+MAX_BULK_PURCHASES = 1000
+
+@api_router.post("/purchases/bulk", response_model=BulkPurchaseResponse)
+async def create_purchases_bulk(items: List[PurchaseCreate]):
+    """Cria várias compras de uma vez (revendedores, campanhas), agrupadas por rifa"""
+    if len(items) > MAX_BULK_PURCHASES:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_PURCHASES} compras por lote")
+    
+    results: List[Optional[BulkPurchaseResult]] = [None] * len(items)
+    
+    def fail(index: int, error: HTTPException):
+        results[index] = BulkPurchaseResult(index=index, status_code=error.status_code, detail=error.detail)
+    
+    # Agrupa os itens por rifa
+    by_raffle: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        if item.quantity < 1:
+            fail(i, HTTPException(status_code=400, detail="Quantidade inválida"))
+        else:
+            by_raffle.setdefault(item.raffle_id, []).append(i)
+    
+    # Rifas do lote pelo registro; as que faltarem numa única leitura
+    raffles = await raffle_registry.get_many(by_raffle)
+    
+    for raffle_id, indexes in by_raffle.items():
+        raffle = raffles.get(raffle_id)
+        if raffle is None:
+            for i in indexes:
+                fail(i, HTTPException(status_code=404, detail="Rifa não encontrada"))
+            continue
+        if not raffle.active:
+            for i in indexes:
+                fail(i, HTTPException(status_code=400, detail="Rifa não está ativa"))
+            continue
+        
+        purchases = {
+            i: Purchase(
+                user_id=items[i].user_id,
+                raffle_id=raffle_id,
+                tickets=[],
+                quantity=items[i].quantity,
+                total_amount=items[i].quantity * raffle.price_per_ticket,
+                bonus_boxes=raffle.bonus_boxes(items[i].quantity),
+                **initial_payment_fields()
+            )
+            for i in indexes
+        }
+        
+        # Reserva os números do lote inteiro da rifa numa passada (em caso de erro nada fica reservado)
+        try:
+            reserved, failed = await reserve_numbers(raffle, [(p.id, p.user_id, p.quantity) for p in purchases.values()])
+        except Exception:
+            logger.exception("Falha ao reservar os números do lote na rifa %s", raffle_id)
+            for i in indexes:
+                fail(i, HTTPException(status_code=500, detail="Falha ao reservar os números"))
+            continue
+        allocator = ticket_allocators[raffle_id]
+        accepted = []
+        for i, p in purchases.items():
+            if p.id in failed:
+                fail(i, reservation_http_error(failed[p.id]))
+            else:
+                p.tickets = reserved[p.id]
+                accepted.append(i)
+        if not accepted:
+            continue
+        
+        try:
+            failed_ids = await store_purchases([purchases[i] for i in accepted])
+        except Exception:
+            # Timeout ou rede: como na compra avulsa, os números voltam a ficar livres
+            logger.exception("Falha ao gravar as compras do lote na rifa %s", raffle_id)
+            failed_ids = {purchases[i].id for i in accepted}
+        if failed_ids:
+            rejected = [i for i in accepted if purchases[i].id in failed_ids]
+            try:
+                await release_tickets(purchase_db, allocator, raffle_id, [n for i in rejected for n in purchases[i].tickets])
+            except Exception:
+                logger.exception("Números das compras não gravadas na rifa %s continuam reservados", raffle_id)
+            for i in rejected:
+                fail(i, HTTPException(status_code=500, detail="Falha ao gravar a compra"))
+            accepted = [i for i in accepted if i not in set(rejected)]
+        
+        # As compras já estão gravadas: uma falha daqui em diante não as desfaz, o item sai com 200
+        paid = [purchases[i] for i in accepted if purchases[i].payment_status == "paid"]
+        if paid:
+            try:
+                await register_paid_purchases(raffle_id, paid)
+            except Exception:
+                logger.exception("Compras do lote gravadas na rifa %s sem atualizar índice, rankings e contadores "
+                                 "(recalcule com os comandos rebuild/reconcile)", raffle_id)
+        for i in accepted:
+            results[i] = BulkPurchaseResult(index=i, status_code=200, purchase=purchases[i])
+    
+    await response_cache.invalidate("raffles", "stats")
+    return BulkPurchaseResponse(results=results)
+
+MAX_PAYMENT_CONFIRMATIONS = 1000
+
+@api_router.post("/purchases/confirm", response_model=PaymentConfirmationResult)
+async def confirm_purchases(request: PaymentConfirmation):
+    """Confirma o pagamento de várias compras pendentes numa única escrita"""
+    if len(request.purchase_ids) > MAX_PAYMENT_CONFIRMATIONS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_PAYMENT_CONFIRMATIONS} compras por confirmação")
+    
+    purchase_ids = list(dict.fromkeys(request.purchase_ids))
+    confirmed = await confirm_payments(purchase_db, purchase_ids)
+    
+    # Propaga as compras pagas agrupadas por rifa
+    by_raffle: Dict[str, List[Purchase]] = {}
+    for doc in confirmed:
+        by_raffle.setdefault(doc["raffle_id"], []).append(Purchase(**doc))
+    for raffle_id, purchases in by_raffle.items():
+        await register_paid_purchases(raffle_id, purchases)
+    
+    # Com buckets, as compras confirmadas saem de `purchases`; se falhar ficam lá, ainda visíveis
+    if PURCHASE_STORAGE == "buckets" and confirmed:
+        try:
+            # Os documentos como gravados, com paid_at e status_batch
+            await append_purchases(purchase_db, confirmed)
+            await purchase_db.purchases.delete_many({"id": {"$in": [d["id"] for d in confirmed]}, "payment_status": "paid"})
+        except Exception:
+            logger.exception("Falha ao mover compras confirmadas para os buckets")
+    if confirmed:
+        await response_cache.invalidate("raffles", "stats")
+    
+    confirmed_ids = {doc["id"] for doc in confirmed}
+    return PaymentConfirmationResult(
+        confirmed=[i for i in purchase_ids if i in confirmed_ids],
+        not_confirmed=[i for i in purchase_ids if i not in confirmed_ids],
+    )
+
+async def list_purchases(query: dict, bucketed, request: Request,
+                         limit: int, cursor: Optional[str], format: Optional[str]):
+    """Lista compras em ordem (created_at, id) decrescente, paginada por keyset ou em NDJSON.
+    
+    Junta os documentos de `purchases` com os de `purchase_buckets` (`bucketed(after)`).
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    
+    find = db.purchases.find(keyset_filter(query, cursor), projection(Purchase)).sort([("created_at", -1), ("id", -1)])
+    
+    if format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        docs = merge_newest_first(find.batch_size(500), bucketed(after))
+        return StreamingResponse(ndjson_lines(docs), media_type=NDJSON_MEDIA_TYPE)
+    
+    purchases = []
+    docs = merge_newest_first(find.limit(limit), bucketed(after))
+    async for purchase in docs:
+        purchases.append(purchase)
+        if len(purchases) == limit:
+            break
+    await docs.aclose()
+    headers = {"X-Next-Cursor": encode_cursor(purchases[-1])} if len(purchases) == limit else None
+    return FastJSONResponse(purchases, headers=headers)
+
 @api_router.get("/purchases/user/{user_id}")
-async def get_user_purchases(user_id: str):
-    purchases = await db.purchases.find({"user_id": user_id}).sort("created_at", -1).to_list(100)
-    return purchases
+async def get_user_purchases(user_id: str, request: Request,
+                             limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None,
+                             format: Optional[str] = None):
+    return await list_purchases({"user_id": user_id},
+                                lambda after: user_purchases(db, user_id, Purchase.model_fields, after),
+                                request, limit, cursor, format)
 
 @api_router.get("/purchases/raffle/{raffle_id}")
-async def get_raffle_purchases(raffle_id: str):
-    purchases = await db.purchases.find({"raffle_id": raffle_id, "payment_status": "paid"}).to_list(1000)
-    return purchases
+async def get_raffle_purchases(raffle_id: str, request: Request,
+                               limit: int = Query(1000, ge=1, le=1000), cursor: Optional[str] = None,
+                               format: Optional[str] = None):
+    return await list_purchases({"raffle_id": raffle_id, "payment_status": "paid"},
+                                lambda after: raffle_purchases(db, raffle_id, Purchase.model_fields, after),
+                                request, limit, cursor, format)
 
 # ==================== RANKINGS ====================
 
 @api_router.get("/rankings/top-buyers")
 async def get_top_buyers():
     """Top compradores geral"""
-    pipeline = [
-        {"$match": {"payment_status": "paid"}},
-        {"$group": {
-            "_id": "$user_id",
-            "total_tickets": {"$sum": "$quantity"},
-            "total_spent": {"$sum": "$total_amount"}
-        }},
-        {"$sort": {"total_tickets": -1}},
-        {"$limit": 10}
-    ]
-    
-    result = await db.purchases.aggregate(pipeline).to_list(10)
-    
-    # Busca dados dos usuários
-    for item in result:
-        user = await db.users.find_one({"id": item["_id"]})
-        if user:
-            item["user_phone"] = user["phone"]
-            item["user_name"] = user.get("name", user["phone"])
-    
-    return result
+    return FastJSONResponse(await top_buyers(analytics_db, ALL_TIME))
 
 @api_router.get("/rankings/daily-buyers")
 async def get_daily_top_buyers():
     """Top compradores do dia"""
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    pipeline = [
-        {"$match": {
-            "payment_status": "paid",
-            "created_at": {"$gte": today}
-        }},
-        {"$group": {
-            "_id": "$user_id",
-            "total_tickets": {"$sum": "$quantity"},
-            "total_spent": {"$sum": "$total_amount"}
-        }},
-        {"$sort": {"total_tickets": -1}},
-        {"$limit": 10}
-    ]
-    
-    result = await db.purchases.aggregate(pipeline).to_list(10)
-    
-    # Busca dados dos usuários
-    for item in result:
-        user = await db.users.find_one({"id": item["_id"]})
-        if user:
-            item["user_phone"] = user["phone"]
-            item["user_name"] = user.get("name", user["phone"])
-    
-    return result
+    return FastJSONResponse(await top_buyers(analytics_db, daily_board()))
+
+@api_router.get("/rankings/weekly-buyers")
+async def get_weekly_top_buyers():
+    """Top compradores da semana (desde segunda-feira 00:00 UTC)"""
+    return FastJSONResponse(await window_top_buyers(analytics_db, week_start()))
+
+@api_router.get("/rankings/monthly-buyers")
+async def get_monthly_top_buyers():
+    """Top compradores do mês (desde o dia 1 00:00 UTC)"""
+    return FastJSONResponse(await window_top_buyers(analytics_db, month_start()))
+
+MAX_RANKING_LIMIT = 100
+
+@api_router.get("/rankings/buyers")
+async def get_top_buyers_in_range(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  raffle_id: Optional[str] = None,
+                                  limit: int = Query(10, ge=1, le=MAX_RANKING_LIMIT)):
+    """Top compradores de um período em horas UTC inteiras [start, end), opcionalmente de uma rifa"""
+    if start is None and raffle_id is None:
+        raise HTTPException(status_code=400, detail="Informe start ou raffle_id")
+    start, end = utc_naive(start), utc_naive(end)
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="Período inválido")
+    return FastJSONResponse(await window_top_buyers(analytics_db, start, end, raffle_id, limit))
+
+@api_router.get("/raffles/{raffle_id}/rankings")
+async def get_raffle_top_buyers(raffle_id: str, limit: int = Query(10, ge=1, le=MAX_RANKING_LIMIT)):
+    """Top compradores da rifa"""
+    return FastJSONResponse(await window_top_buyers(analytics_db, raffle_id=raffle_id, limit=limit))
 
 # ==================== WINNERS ====================
 
 @api_router.get("/winners", response_model=List[Winner])
 async def get_winners():
-    winners = await db.winners.find().sort("date", -1).to_list(50)
-    return [Winner(**winner) for winner in winners]
+    async def load():
+        return dump_json(await analytics_db.winners.find({}, projection(Winner)).sort("date", -1).to_list(50))
+    return FastJSONResponse(await response_cache.get_or_load("winners", load, tags=("winners",)))
 
 @api_router.post("/winners", response_model=Winner)
 async def create_winner(winner: Winner):
     await db.winners.insert_one(winner.dict())
+    await response_cache.invalidate("winners")
     return winner
 
+@api_router.post("/raffles/{raffle_id}/draw", response_model=Draw)
+async def draw_raffle(raffle_id: str, request: DrawRequest):
+    """Sorteia o vencedor de um prêmio da rifa de forma reproduzível a partir da semente"""
+    raffle = await db.raffles.find_one({"id": raffle_id})
+    if not raffle:
+        raise HTTPException(status_code=404, detail="Rifa não encontrada")
+    raffle_obj = Raffle(**raffle)
+    
+    available = [p for p in raffle_obj.prizes if p.is_available]
+    if request.prize_id:
+        prize = next((p for p in available if p.id == request.prize_id), None)
+        if prize is None:
+            raise HTTPException(status_code=404, detail="Prêmio não encontrado ou já sorteado")
+    else:
+        prize = available[0] if available else None
+    if prize is None and (raffle_obj.prizes or raffle_obj.status != "active"):
+        raise HTTPException(status_code=400, detail="Rifa sem prêmios a sortear")
+    # Rifas sem prêmios cadastrados sorteiam o próprio título
+    prize_id = prize.id if prize else raffle_id
+    prize_name = prize.name if prize else raffle_obj.title
+    
+    # Sorteia sobre o índice de vendidos e busca o dono pelo índice de reservas
+    sold = await get_sold_bitmap(db, raffle_id)
+    try:
+        result = draw_number(sold, request.seed, raffle_id, prize_id)
+    except NoTicketsSoldError:
+        raise HTTPException(status_code=400, detail="Nenhum número vendido nesta rifa")
+    owner = await find_ticket_owner(db, raffle_id, result["winning_number"])
+    if not owner:
+        raise HTTPException(status_code=409, detail="Número sorteado sem reserva registrada, recalcule o índice da rifa")
+    user = await db.users.find_one({"id": owner["user_id"]}, {"_id": 0, "phone": 1})
+    
+    winner = Winner(
+        user_id=owner["user_id"],
+        user_phone=user["phone"] if user else "",
+        raffle_id=raffle_id,
+        raffle_title=raffle_obj.title,
+        prize_name=prize_name,
+        winning_number=result["winning_number"]
+    )
+    draw_obj = Draw(raffle_id=raffle_id, prize_id=prize_id, purchase_id=owner.get("purchase_id"), winner=winner, **result)
+    
+    # O sorteio é gravado primeiro: o índice único (raffle_id, prize_id) barra o sorteio duplo
+    try:
+        await db.draws.insert_one(draw_obj.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Prêmio já sorteado")
+    
+    # Depois marca o prêmio como sorteado; se algo falhar, desfaz marca e sorteio
+    claimed = None
+    try:
+        if prize:
+            claimed = await db.raffles.update_one(
+                {"id": raffle_id, "prizes": {"$elemMatch": {"id": prize_id, "is_available": True}}},
+                {"$set": {"prizes.$.is_available": False}}
+            )
+        else:
+            claimed = await db.raffles.update_one({"id": raffle_id, "status": "active"}, {"$set": {"status": "completed"}})
+        if claimed.modified_count == 0:
+            raise HTTPException(status_code=409, detail="Prêmio já sorteado")
+        await db.winners.insert_one(winner.dict())
+    except Exception:
+        if claimed is not None and claimed.modified_count:
+            if prize:
+                await db.raffles.update_one(
+                    {"id": raffle_id, "prizes.id": prize_id}, {"$set": {"prizes.$.is_available": True}})
+            else:
+                await db.raffles.update_one({"id": raffle_id, "status": "completed"}, {"$set": {"status": "active"}})
+        await db.draws.delete_one({"raffle_id": raffle_id, "prize_id": prize_id, "id": draw_obj.id})
+        raise
+    
+    # Sem prêmios disponíveis a rifa é concluída
+    if not prize or len(available) == 1:
+        completed = await db.raffles.update_one({"id": raffle_id, "status": "active"}, {"$set": {"status": "completed"}})
+        raffle_registry.remove(raffle_id)
+        if completed.modified_count or not prize:
+            await record_raffle_status_change(db, "active", "completed")
+    
+    await response_cache.invalidate("raffles", "winners", "stats")
+    return draw_obj
+
+@api_router.get("/raffles/{raffle_id}/draws", response_model=List[Draw])
+async def get_raffle_draws(raffle_id: str):
+    """Sorteios da rifa com os dados para verificação (semente, índice, bitmap e digest)"""
+    return FastJSONResponse(await db.draws.find({"raffle_id": raffle_id}, projection(Draw)).to_list(100))
+
+# ==================== EXPORTS ====================
+
+@api_router.get("/exports/{dataset}")
+async def export_dataset(dataset: str, format: str = "csv", compression: Optional[str] = None,
+                         raffle_id: Optional[str] = None, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None):
+    """Exporta compras, ganhadores ou usuários em streaming (CSV, Parquet ou Arrow), por rifa e período"""
+    if dataset not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail="Exportação não encontrada")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Formato inválido")
+    compression = compression or EXPORT_COMPRESSIONS[format][0]
+    if compression not in EXPORT_COMPRESSIONS[format]:
+        allowed = ", ".join(EXPORT_COMPRESSIONS[format])
+        raise HTTPException(status_code=400, detail=f"Compressão inválida para {format}: use {allowed}")
+    if dataset == "purchases" and not raffle_id:
+        raise HTTPException(status_code=400, detail="Informe raffle_id")
+    start, end = utc_naive(start), utc_naive(end)
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="Período inválido")
+    
+    media_type, filename = export_file(dataset, format, compression, raffle_id)
+    return StreamingResponse(
+        stream_export(analytics_db, dataset, format, compression, raffle_id, start, end),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 # ==================== STATS ====================
 
 @api_router.get("/stats")
 async def get_stats():
-    total_raffles = await db.raffles.count_documents({})
-    active_raffles = await db.raffles.count_documents({"status": "active"})
-    total_users = await db.users.count_documents({})
-    total_purchases = await db.purchases.count_documents({"payment_status": "paid"})
-    
-    return {
-        "total_raffles": total_raffles,
-        "active_raffles": active_raffles,
-        "total_users": total_users,
-        "total_purchases": total_purchases
-    }
+    return await response_cache.get_or_load("stats", lambda: read_stats(analytics_db), tags=("stats",))
+
+# ==================== HEALTH ====================
+
+HEALTH_PING_TIMEOUT = float(os.environ.get('HEALTH_PING_TIMEOUT_SECONDS', '2'))
+
+@api_router.get("/health/live")
+async def liveness():
+    """O processo está de pé e o event loop responde"""
+    return {"status": "ok"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Pronto para tráfego: o MongoDB responde e o pool não está esgotado com fila"""
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), HEALTH_PING_TIMEOUT)
+        mongo_ok = True
+    except Exception:
+        mongo_ok = False
+    saturated = pool_monitor.saturated()
+    ready = mongo_ok and not saturated
+    return FastJSONResponse({
+        "status": "ready" if ready else "unavailable",
+        "mongo": mongo_ok,
+        "pool_saturated": saturated,
+        "max_pool_size": pool_monitor.max_pool_size,
+        "pool": pool_monitor.servers(),
+    }, status_code=200 if ready else 503)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Contadores do cache de respostas, para dimensionamento"""
+    return response_cache.stats()
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Métricas no formato texto do Prometheus"""
+    return Response(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor da próxima página das listagens de compras, lido pelo frontend
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -333,6 +957,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def connect_mongo_client():
+    connect_mongo()
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_response_cache():
+    await response_cache.start()
+
+@app.on_event("startup")
+async def start_live_feed():
+    await live_feed.start()
+
+@app.on_event("startup")
+async def start_raffle_registry():
+    await raffle_registry.start()
+
+@app.on_event("startup")
+async def start_sold_tickets_buffer():
+    await sold_tickets_buffer.start()
+
+@app.on_event("startup")
+async def start_stats_reconciliation():
+    # Corrige periodicamente desvios dos contadores do /stats (desligado com 0)
+    interval = float(os.environ.get('STATS_RECONCILE_INTERVAL_SECONDS', '0'))
+    if interval > 0:
+        asyncio.create_task(reconcile_periodically(db, interval))
+
+@app.on_event("startup")
+async def start_reservation_sweeper():
+    # Libera em lotes as reservas pendentes vencidas (desligado com 0)
+    interval = float(os.environ.get('RESERVATION_SWEEP_INTERVAL_SECONDS', '30'))
+    if interval > 0:
+        asyncio.create_task(expire_periodically(purchase_db, interval, release_expired_holds))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    # Os incrementos pendentes vão antes do cache fechar (a gravação invalida as rifas)
+    await sold_tickets_buffer.close()
+    await response_cache.close()
+    await live_feed.close()
+    await raffle_registry.close()
+    if client is not None:
+        client.close()
\ No newline at end of file
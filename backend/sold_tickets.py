@@ -0,0 +1,191 @@
+"""Write-behind opcional dos incrementos de `sold_tickets` das rifas.
+
+Cada compra paga faz `$inc` em `sold_tickets` no documento da rifa; num flash
+sale todas as compras disputam o mesmo documento. Com
+SOLD_TICKETS_WRITE_BEHIND=1 os incrementos se acumulam em memória por rifa e
+vão num único bulk_write (um UpdateOne por rifa) a cada
+SOLD_TICKETS_FLUSH_MS (5) ou assim que SOLD_TICKETS_FLUSH_PURCHASES (200)
+compras se acumularem, o que vier primeiro. Depois de cada gravação o
+callback `on_flush` invalida o cache das rifas, que senão guardaria o
+contador anterior até o TTL.
+
+Nunca vende além do total: quem garante isso são as reservas únicas em
+`tickets` e o pool de números, gravados antes da resposta como sempre.
+`sold_tickets` é só o contador exibido, que fica até uma janela atrasado. Se o
+processo cair, perde-se no máximo a janela ainda não gravada; o contador
+volta a bater com o índice de vendidos com:
+
+    python sold_tickets.py reconcile [--raffle RAFFLE_ID]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from ticket_index import load_sold_bitmap
+
+logger = logging.getLogger(__name__)
+
+
+class SoldTicketsBuffer:
+    """Incrementos pendentes por rifa e o laço que os grava"""
+
+    def __init__(self, db, enabled: bool = False, flush_interval: float = 0.005, max_purchases: int = 200,
+                 on_flush: Optional[Callable[[], Awaitable]] = None):
+        self.db = db
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_purchases = max_purchases
+        self.on_flush = on_flush
+        # Por rifa: [números, compras] ainda não gravados
+        self._pending: Dict[str, list] = {}
+        self._pending_purchases = 0
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushes = 0
+        self.flushed_purchases = 0
+        self.failures = 0
+
+    async def increment(self, raffle_id: str, tickets: int, purchases: int = 1):
+        """Soma os números vendidos da rifa, na hora ou na próxima gravação"""
+        if not self.enabled:
+            await self.db.raffles.update_one({"id": raffle_id}, {"$inc": {"sold_tickets": tickets}})
+            return
+        row = self._pending.setdefault(raffle_id, [0, 0])
+        row[0] += tickets
+        row[1] += purchases
+        self._pending_purchases += purchases
+        if self._pending_purchases >= self.max_purchases:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Grava os incrementos acumulados; devolve quantas rifas foram atualizadas"""
+        if not self._pending:
+            return 0
+        pending, purchases = self._pending, self._pending_purchases
+        self._pending, self._pending_purchases = {}, 0
+        raffle_ids = list(pending)
+        try:
+            await self.db.raffles.bulk_write(
+                [UpdateOne({"id": r}, {"$inc": {"sold_tickets": pending[r][0]}}) for r in raffle_ids], ordered=False
+            )
+        except BulkWriteError as e:
+            # Só as operações com erro voltam para a fila, com as compras de cada rifa
+            failed = {raffle_ids[err["index"]]: pending[raffle_ids[err["index"]]]
+                      for err in e.details.get("writeErrors", [])}
+            self._requeue(failed)
+            self.flushed_purchases += purchases - sum(row[1] for row in failed.values())
+            raise
+        except PyMongoError:
+            self._requeue(pending)
+            raise
+        self.flushes += 1
+        self.flushed_purchases += purchases
+        if self.on_flush:
+            try:
+                await self.on_flush()
+            except Exception:
+                logger.exception("Falha no callback após gravar sold_tickets")
+        return len(raffle_ids)
+
+    def _requeue(self, pending: Dict[str, list]):
+        self.failures += 1
+        for raffle_id, (tickets, purchases) in pending.items():
+            row = self._pending.setdefault(raffle_id, [0, 0])
+            row[0] += tickets
+            row[1] += purchases
+            self._pending_purchases += purchases
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except PyMongoError:
+                logger.exception("Falha ao gravar sold_tickets acumulados; nova tentativa na próxima janela")
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Para o laço, esperando a gravação em andamento, e grava o que ainda estiver pendente"""
+        self._closing = True
+        if self._task:
+            # Cancelar no meio do bulk_write perderia os incrementos já retirados de _pending
+            self._full.set()
+            await self._task
+            self._task = None
+        if self.enabled and self.db is not None:
+            try:
+                await self.flush()
+            except PyMongoError:
+                logger.exception("sold_tickets pendentes não gravados no desligamento; rode python sold_tickets.py reconcile")
+
+    def stats(self) -> dict:
+        return {
+            "pending_raffles": len(self._pending),
+            "pending_purchases": self._pending_purchases,
+            "flushes": self.flushes,
+            "flushed_purchases": self.flushed_purchases,
+            "failures": self.failures,
+        }
+
+
+def sold_tickets_buffer_from_env(db, on_flush: Optional[Callable[[], Awaitable]] = None) -> SoldTicketsBuffer:
+    return SoldTicketsBuffer(
+        db,
+        enabled=os.environ.get('SOLD_TICKETS_WRITE_BEHIND', '0') == '1',
+        flush_interval=float(os.environ.get('SOLD_TICKETS_FLUSH_MS', '5')) / 1000,
+        max_purchases=int(os.environ.get('SOLD_TICKETS_FLUSH_PURCHASES', '200')),
+        on_flush=on_flush,
+    )
+
+
+async def reconcile_sold_tickets(db, raffle_id: str) -> Optional[int]:
+    """Acerta `sold_tickets` pela contagem do índice de vendidos; None se a rifa não tem índice"""
+    bitmap = await load_sold_bitmap(db, raffle_id)
+    if bitmap is None:
+        return None
+    sold = bitmap.count()
+    await db.raffles.update_one({"id": raffle_id}, {"$set": {"sold_tickets": sold}})
+    return sold
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Contador sold_tickets das rifas")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reconcile = sub.add_parser("reconcile", help="recalcula sold_tickets a partir do índice de vendidos")
+    reconcile.add_argument("--raffle", help="id da rifa (padrão: todas)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        raffle_ids = [args.raffle] if args.raffle else await db.raffles.distinct("id")
+        for raffle_id in raffle_ids:
+            sold = await reconcile_sold_tickets(db, raffle_id)
+            if sold is None:
+                print(f"⚠️  {raffle_id}: sem índice de vendidos (rode python ticket_index.py rebuild)")
+            else:
+                print(f"🔁 {raffle_id}: {sold} números vendidos")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+from array import array
+from typing import Iterable, List, Optional
+import random
+
+
+class InsufficientTicketsError(Exception):
+    """Não há números livres suficientes na rifa"""
+
+
+class TicketAllocator:
+    """Pool de números livres de uma rifa (1..total_tickets).
+
+    Os números ficam numa permutação compacta: os livres ocupam as posições
+    [0, free_count) e os vendidos o restante. `_pos` guarda a posição de cada
+    número, então sortear, marcar e liberar custam O(1) por número.
+    """
+
+    def __init__(self, total_tickets: int, sold: Iterable[int] = ()):
+        self.total_tickets = total_tickets
+        self._numbers = array('I', range(1, total_tickets + 1))
+        # _pos[n] = posição de n em _numbers (índice 0 não é usado)
+        self._pos = array('I', [0]) + array('I', range(total_tickets))
+        self.free_count = total_tickets
+        for number in sold:
+            self.mark_sold(number)
+
+    @property
+    def sold_count(self) -> int:
+        return self.total_tickets - self.free_count
+
+    def _swap(self, i: int, j: int):
+        a, b = self._numbers[i], self._numbers[j]
+        self._numbers[i], self._numbers[j] = b, a
+        self._pos[a], self._pos[b] = j, i
+
+    def is_sold(self, number: int) -> bool:
+        if number < 1 or number > self.total_tickets:
+            return False
+        return self._pos[number] >= self.free_count
+
+    def mark_sold(self, number: int) -> bool:
+        """Marca um número como vendido; retorna False se já estava vendido ou fora da faixa"""
+        if number < 1 or number > self.total_tickets or self.is_sold(number):
+            return False
+        self.free_count -= 1
+        self._swap(self._pos[number], self.free_count)
+        return True
+
+    def release(self, number: int) -> bool:
+        """Devolve um número vendido ao pool de livres"""
+        if not self.is_sold(number):
+            return False
+        self._swap(self._pos[number], self.free_count)
+        self.free_count += 1
+        return True
+
+    def draw(self, quantity: int, rng: Optional[random.Random] = None) -> List[int]:
+        """Sorteia `quantity` números livres e os marca como vendidos, em O(quantity)"""
+        if quantity > self.free_count:
+            raise InsufficientTicketsError(f"{self.free_count} números livres, {quantity} pedidos")
+        randrange = (rng or random).randrange
+        tickets = []
+        for _ in range(quantity):
+            i = randrange(self.free_count)
+            tickets.append(self._numbers[i])
+            self.free_count -= 1
+            self._swap(i, self.free_count)
+        return tickets
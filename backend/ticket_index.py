@@ -0,0 +1,272 @@
+"""Índice de números vendidos por rifa.
+
+Cada rifa tem um documento em `ticket_index` com o bitmap dos números vendidos,
+guardado de forma esparsa em palavras de 64 bits (`words.<k>` cobre os números
+64k..64k+63). Só as palavras com algum número vendido existem, no estilo dos
+chunks do roaring bitmap. As compras atualizam as palavras com `$bit`, que é
+atômico, então não há disputa de leitura-e-escrita entre workers, e a leitura
+do índice inteiro é um único `find_one`.
+
+Ao montar ou recalcular o índice a partir de `purchases`, as reservas em
+`tickets` que faltarem (compras antigas) também são gravadas.
+
+Recuperação: python ticket_index.py rebuild [--raffle RAFFLE_ID]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from bson.int64 import Int64
+from pymongo.errors import BulkWriteError
+
+from purchase_buckets import paid_purchases
+
+WORD_BITS = 64
+SELECT_BLOCK_BYTES = 8192
+BACKFILL_BATCH = 10000
+DUPLICATE_KEY = 11000
+_MASK64 = (1 << 64) - 1
+# Posições dos bits ligados em cada valor de byte
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def _to_int64(value: int) -> Int64:
+    """Converte uma palavra sem sinal para o Int64 com sinal que o BSON guarda"""
+    value &= _MASK64
+    return Int64(value - (1 << 64) if value >> 63 else value)
+
+
+def _bit_update(words: Dict[int, int], op: str) -> dict:
+    """Monta o update `$bit` das palavras, incrementando a versão do índice"""
+    update = {"$inc": {"version": 1}}
+    if words:
+        update["$bit"] = {f"words.{k}": {op: _to_int64(mask)} for k, mask in words.items()}
+    return update
+
+
+def pack_words(numbers: Iterable[int]) -> Dict[int, int]:
+    """Agrupa números em palavras de 64 bits: {índice da palavra: máscara}"""
+    words: Dict[int, int] = {}
+    for n in numbers:
+        k, bit = divmod(n, WORD_BITS)
+        words[k] = words.get(k, 0) | (1 << bit)
+    return words
+
+
+class SoldBitmap:
+    """Bitmap dos números vendidos de uma rifa (bit n = número n vendido)"""
+
+    def __init__(self, bits: bytearray, version: int = 0):
+        self.bits = bits
+        self.version = version
+        self._blocks: Optional[List[int]] = None
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "SoldBitmap":
+        words = {int(k): w for k, w in doc.get("words", {}).items()}
+        bits = bytearray((max(words) + 1) * 8 if words else 0)
+        for k, w in words.items():
+            bits[k * 8:(k + 1) * 8] = (w & _MASK64).to_bytes(8, "little")
+        return cls(bits, doc.get("version", 0))
+
+    @classmethod
+    def from_base64(cls, data: str, version: int = 0) -> "SoldBitmap":
+        """Inverso de `to_base64`"""
+        return cls(bytearray(base64.b64decode(data)), version)
+
+    def __contains__(self, number: int) -> bool:
+        i = number >> 3
+        return 0 <= i < len(self.bits) and bool(self.bits[i] >> (number & 7) & 1)
+
+    def __iter__(self) -> Iterator[int]:
+        """Números vendidos em ordem crescente"""
+        for i, byte in enumerate(self.bits):
+            if byte:
+                base = i << 3
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+    def count(self) -> int:
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def _block_counts(self) -> List[int]:
+        if self._blocks is None:
+            self._blocks = [
+                int.from_bytes(self.bits[i:i + SELECT_BLOCK_BYTES], "little").bit_count()
+                for i in range(0, len(self.bits), SELECT_BLOCK_BYTES)
+            ]
+        return self._blocks
+
+    def select(self, k: int) -> int:
+        """O k-ésimo número vendido (base 0) em ordem crescente.
+
+        Conta os bits por blocos de 8 KB e depois por palavras de 64 bits, então
+        o custo não depende de listar os números vendidos.
+        """
+        if k < 0:
+            raise IndexError(k)
+        for block, count in enumerate(self._block_counts()):
+            if k >= count:
+                k -= count
+                continue
+            start = block * SELECT_BLOCK_BYTES
+            for offset in range(start, min(start + SELECT_BLOCK_BYTES, len(self.bits)), 8):
+                word = int.from_bytes(self.bits[offset:offset + 8], "little")
+                ones = word.bit_count()
+                if k >= ones:
+                    k -= ones
+                    continue
+                for _ in range(k):
+                    word &= word - 1  # desliga o bit mais baixo
+                return offset * 8 + (word & -word).bit_length() - 1
+        raise IndexError("k maior que a quantidade de números vendidos")
+
+    def digest(self) -> str:
+        """SHA-256 do bitmap, para publicar junto com o resultado do sorteio"""
+        return hashlib.sha256(bytes(self.bits.rstrip(b"\0"))).hexdigest()
+
+    def ranges(self) -> List[List[int]]:
+        """Números vendidos como faixas fechadas [início, fim]"""
+        ranges: List[List[int]] = []
+        for n in self:
+            if ranges and ranges[-1][1] == n - 1:
+                ranges[-1][1] = n
+            else:
+                ranges.append([n, n])
+        return ranges
+
+    def added_since(self, previous: "SoldBitmap") -> "SoldBitmap":
+        """Números vendidos aqui que não estavam em `previous`"""
+        size = len(self.bits)
+        bits = int.from_bytes(self.bits, "little") & ~int.from_bytes(previous.bits[:size], "little")
+        return SoldBitmap(bytearray(bits.to_bytes(size, "little")), self.version)
+
+    def to_base64(self) -> str:
+        """Bitmap bruto em base64 (byte i, bit j = número 8i + j)"""
+        return base64.b64encode(bytes(self.bits.rstrip(b"\0"))).decode("ascii")
+
+
+async def mark_sold(db, raffle_id: str, numbers: Iterable[int]):
+    """Liga os bits dos números no índice da rifa"""
+    words = pack_words(numbers)
+    if not words:
+        return
+    await db.ticket_index.update_one({"raffle_id": raffle_id}, _bit_update(words, "or"), upsert=True)
+
+
+async def mark_released(db, raffle_id: str, numbers: Iterable[int]):
+    """Desliga os bits dos números no índice da rifa"""
+    words = pack_words(numbers)
+    if not words:
+        return
+    inverted = {k: ~mask for k, mask in words.items()}
+    await db.ticket_index.update_one({"raffle_id": raffle_id}, _bit_update(inverted, "and"))
+
+
+async def _backfill_claims(db, claims: List[dict]):
+    """Grava reservas em `tickets` para compras antigas; as que já existem são ignoradas"""
+    try:
+        await db.tickets.insert_many(claims, ordered=False)
+    except BulkWriteError as e:
+        if any(err["code"] != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+
+
+async def _chain(*sources: AsyncIterable[dict]) -> AsyncIterator[dict]:
+    for source in sources:
+        async for item in source:
+            yield item
+
+
+async def _scan_sold_words(db, raffle_id: str) -> Dict[int, int]:
+    """Monta as palavras do índice a partir das compras pagas (documentos e buckets).
+
+    Também garante que cada número vendido tenha sua reserva em `tickets`
+    (compras anteriores às reservas não têm), que é onde se busca o dono.
+    """
+    words: Dict[int, int] = {}
+    claims: List[dict] = []
+    cursor = db.purchases.find({"raffle_id": raffle_id, "payment_status": "paid"},
+                               {"id": 1, "user_id": 1, "tickets": 1, "created_at": 1})
+    bucketed = paid_purchases(db, raffle_id, ["id", "user_id", "tickets", "created_at"])
+    async for p in _chain(cursor, bucketed):
+        for k, mask in pack_words(p["tickets"]).items():
+            words[k] = words.get(k, 0) | mask
+        claims.extend(
+            {"raffle_id": raffle_id, "number": n, "purchase_id": p.get("id"),
+             "user_id": p.get("user_id"), "created_at": p.get("created_at")}
+            for n in p["tickets"]
+        )
+        if len(claims) >= BACKFILL_BATCH:
+            await _backfill_claims(db, claims)
+            claims = []
+    if claims:
+        await _backfill_claims(db, claims)
+    return words
+
+
+async def load_sold_bitmap(db, raffle_id: str) -> Optional[SoldBitmap]:
+    """Carrega o índice da rifa numa única leitura; None se ainda não existir"""
+    doc = await db.ticket_index.find_one({"raffle_id": raffle_id}, {"_id": 0, "words": 1, "version": 1})
+    return SoldBitmap.from_document(doc) if doc else None
+
+
+async def get_sold_bitmap(db, raffle_id: str) -> SoldBitmap:
+    """Carrega o índice da rifa, montando-o a partir das compras se ainda não existir.
+
+    A montagem usa `$bit or`, então se uma compra atualizar o índice ao mesmo
+    tempo nenhum número é perdido. Sem compras pagas nada é gravado (a primeira
+    venda cria o índice), para que ids quaisquer na URL não criem documentos.
+    """
+    bitmap = await load_sold_bitmap(db, raffle_id)
+    if bitmap is not None:
+        return bitmap
+    words = await _scan_sold_words(db, raffle_id)
+    if not words:
+        return SoldBitmap(bytearray())
+    await db.ticket_index.update_one({"raffle_id": raffle_id}, _bit_update(words, "or"), upsert=True)
+    return await load_sold_bitmap(db, raffle_id)
+
+
+async def rebuild_ticket_index(db, raffle_id: str) -> int:
+    """Recalcula o índice da rifa a partir de `purchases`, descartando o atual"""
+    words = await _scan_sold_words(db, raffle_id)
+    await db.ticket_index.update_one(
+        {"raffle_id": raffle_id},
+        {
+            "$set": {"words": {str(k): _to_int64(mask) for k, mask in words.items()}},
+            "$inc": {"version": 1},
+        },
+        upsert=True,
+    )
+    return sum(mask.bit_count() for mask in words.values())
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Índice de números vendidos por rifa")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recalcula o índice a partir das compras pagas")
+    rebuild.add_argument("--raffle", help="id da rifa (padrão: todas)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        raffle_ids = [args.raffle] if args.raffle else await db.raffles.distinct("id")
+        for raffle_id in raffle_ids:
+            sold = await rebuild_ticket_index(db, raffle_id)
+            print(f"🔁 {raffle_id}: {sold} números vendidos")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
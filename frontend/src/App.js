@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import "./App.css";
 import { BrowserRouter, Routes, Route, Link } from "react-router-dom";
 import axios from "axios";
@@ -353,10 +353,42 @@ const Home = ({ user, setUser }) => {
   const [selectedRaffle, setSelectedRaffle] = useState(null);
   const [successPurchase, setSuccessPurchase] = useState(null);
   const [loading, setLoading] = useState(true);
+  const knownRaffles = useRef(new Set());
+
+  useEffect(() => {
+    knownRaffles.current = new Set(raffles.map((r) => r.id));
+  }, [raffles]);
 
   useEffect(() => {
     loadRaffles();
     loadWinners();
+
+    // Progresso ao vivo das rifas em vez de recarregar as listas
+    const source = new EventSource(`${API}/live`);
+    source.addEventListener("progress", (event) => {
+      const frame = JSON.parse(event.data);
+      if (frame.status === "active" && !knownRaffles.current.has(frame.raffle_id)) {
+        // Rifa nova: o quadro não traz título, preço etc.
+        knownRaffles.current.add(frame.raffle_id);
+        addRaffle(frame.raffle_id);
+      }
+      setRaffles((current) =>
+        frame.status === "active"
+          ? current.map((r) => (r.id === frame.raffle_id ? { ...r, sold_tickets: frame.sold_tickets } : r))
+          : current.filter((r) => r.id !== frame.raffle_id)
+      );
+      if (frame.winners.length > 0) {
+        setWinners((current) => {
+          const seen = new Set(current.map((w) => w.id));
+          return [...frame.winners.filter((w) => !seen.has(w.id)).reverse(), ...current];
+        });
+      }
+    });
+    source.addEventListener("reset", () => {
+      loadRaffles();
+      loadWinners();
+    });
+    return () => source.close();
   }, []);
 
   const loadRaffles = async () => {
@@ -368,6 +400,17 @@ const Home = ({ user, setUser }) => {
     }
   };
 
+  const addRaffle = async (raffleId) => {
+    try {
+      const response = await axios.get(`${API}/raffles/${raffleId}`);
+      setRaffles((current) =>
+        current.some((r) => r.id === raffleId) ? current : [...current, response.data]
+      );
+    } catch (error) {
+      console.error("Erro ao carregar rifa:", error);
+    }
+  };
+
   const loadWinners = async () => {
     try {
       const response = await axios.get(`${API}/winners`);
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Os módulos do backend são importados pelo nome, como no servidor
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+@pytest.fixture
+def db():
+    """Banco em memória (mongomock) para os testes que gravam"""
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["test"]
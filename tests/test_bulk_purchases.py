@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+
+import pytest
+from pymongo.errors import NetworkTimeout
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+import server  # noqa: E402
+from raffle_registry import RaffleRegistry  # noqa: E402
+
+
+@pytest.fixture
+def app(db, monkeypatch):
+    """Servidor apontando para o banco em memória, com pools e registro novos"""
+    for name in ("db", "analytics_db", "purchase_db"):
+        monkeypatch.setattr(server, name, db)
+    monkeypatch.setattr(server, "raffle_registry", RaffleRegistry(db))
+    monkeypatch.setattr(server.sold_tickets_buffer, "db", db)
+    monkeypatch.setattr(server, "ticket_allocators", {})
+    monkeypatch.setattr(server, "allocator_builds", {})
+    monkeypatch.setattr(server, "allocator_resyncs", {})
+
+    # O mongomock não tem $bit: o índice de vendidos fica de fora destes testes
+    async def mark_sold(db, raffle_id, numbers):
+        pass
+
+    monkeypatch.setattr(server, "mark_sold", mark_sold)
+    logging.disable(logging.CRITICAL)
+    yield server
+    logging.disable(logging.NOTSET)
+
+
+def create_raffles(app, count, total_tickets=50):
+    async def run():
+        return [await app.create_raffle(app.RaffleCreate(title=f"Rifa {i}", description="", image_url="",
+                                                         price_per_ticket=2, total_tickets=total_tickets))
+                for i in range(count)]
+
+    return asyncio.run(run())
+
+
+def bulk(app, items):
+    return asyncio.run(app.create_purchases_bulk([app.PurchaseCreate(**item) for item in items])).results
+
+
+def test_each_item_gets_its_own_result(app):
+    raffle, small = create_raffles(app, 1) + create_raffles(app, 1, total_tickets=3)
+    results = bulk(app, [
+        {"user_id": "u", "raffle_id": raffle.id, "quantity": 2},
+        {"user_id": "u", "raffle_id": "inexistente", "quantity": 1},
+        {"user_id": "u", "raffle_id": raffle.id, "quantity": 0},
+        {"user_id": "u", "raffle_id": small.id, "quantity": 5},
+        {"user_id": "u", "raffle_id": raffle.id, "quantity": 3},
+    ])
+    assert [r.index for r in results] == [0, 1, 2, 3, 4]
+    assert [r.status_code for r in results] == [200, 404, 400, 400, 200]
+    assert results[0].purchase.total_amount == 4.0 and len(results[4].purchase.tickets) == 3
+    assert not set(results[0].purchase.tickets) & set(results[4].purchase.tickets)
+
+
+def test_failures_stay_inside_their_raffle(app, monkeypatch):
+    ok, broken_store, broken_register = create_raffles(app, 3)
+    store, register = app.store_purchases, app.register_paid_purchases
+
+    async def failing_store(purchases):
+        if purchases[0].raffle_id == broken_store.id:
+            raise NetworkTimeout("timeout")
+        return await store(purchases)
+
+    async def failing_register(raffle_id, purchases):
+        if raffle_id == broken_register.id:
+            raise NetworkTimeout("timeout")
+        return await register(raffle_id, purchases)
+
+    monkeypatch.setattr(app, "store_purchases", failing_store)
+    monkeypatch.setattr(app, "register_paid_purchases", failing_register)
+    results = bulk(app, [{"user_id": "u", "raffle_id": r.id, "quantity": 2}
+                         for r in (ok, broken_store, broken_register) for _ in range(2)])
+
+    # Gravação falha: 500 e números livres de novo; índice/rankings falham depois de gravar: 200
+    assert [r.status_code for r in results] == [200, 200, 500, 500, 200, 200]
+
+    async def claims(raffle_id):
+        return await app.db.tickets.count_documents({"raffle_id": raffle_id})
+
+    assert asyncio.run(claims(broken_store.id)) == 0
+    assert app.ticket_allocators[broken_store.id].free_count == 50
+    assert asyncio.run(claims(broken_register.id)) == 4
@@ -0,0 +1,105 @@
+import asyncio
+import os
+
+from cache import MISSING, FileChannel, ResponseCache
+
+
+def test_invalidate_removes_only_tagged_entries():
+    async def run():
+        cache = ResponseCache()
+        await cache.start()
+        cache.set("a", 1, tags=["raffles"])
+        cache.set("b", 2, tags=["stats"])
+        await cache.invalidate("raffles")
+        return cache.get("a"), cache.get("b")
+
+    assert asyncio.run(run()) == (MISSING, 2)
+
+
+def test_load_started_before_invalidation_is_not_stored():
+    async def run():
+        cache = ResponseCache()
+
+        async def loader():
+            await cache.invalidate("raffles")
+            return "velho"
+
+        value = await cache.get_or_load("a", loader, tags=["raffles"])
+        return value, cache.get("a")
+
+    assert asyncio.run(run()) == ("velho", MISSING)
+
+
+def workers(path, **kwargs):
+    return [ResponseCache(channel=FileChannel(str(path), poll_interval=0.01, **kwargs)) for _ in range(2)]
+
+
+def test_file_channel_invalidates_other_worker(tmp_path):
+    async def run():
+        a, b = workers(tmp_path / "channel")
+        await a.start()
+        await b.start()
+        b.set("x", 1, tags=["raffles"])
+        b.set("y", 2, tags=["stats"])
+        await a.invalidate("raffles")
+        await asyncio.sleep(0.05)
+        await a.close()
+        await b.close()
+        return b.get("x"), b.get("y")
+
+    assert asyncio.run(run()) == (MISSING, 2)
+
+
+def test_file_channel_rotation_clears_other_worker(tmp_path):
+    async def run():
+        a, b = workers(tmp_path / "channel", max_bytes=200)
+        await a.start()
+        await b.start()
+        for _ in range(10):
+            await a.invalidate("stats")
+        await asyncio.sleep(0.05)
+        b.set("x", 1, tags=["raffles"])
+        inode = os.stat(tmp_path / "channel").st_ino
+        while os.stat(tmp_path / "channel").st_ino == inode:
+            await a.invalidate("stats")
+        await asyncio.sleep(0.05)
+        cleared = b.get("x")
+        b.set("x", 1, tags=["raffles"])
+        await a.invalidate("raffles")
+        await asyncio.sleep(0.05)
+        await a.close()
+        await b.close()
+        return cleared, b.get("x")
+
+    # A troca do arquivo limpa tudo e as linhas seguintes continuam chegando
+    assert asyncio.run(run()) == (MISSING, MISSING)
+
+
+def test_file_channel_survives_truncation_and_garbage(tmp_path):
+    path = tmp_path / "channel"
+
+    async def run():
+        a, b = workers(path)
+        await a.start()
+        await b.start()
+        for _ in range(5):
+            await a.invalidate("stats")
+        await asyncio.sleep(0.05)
+        b.set("x", 1, tags=["raffles"])
+        with open(path, "w") as f:
+            f.write('{"tags": ["stats"]}\n')
+        await asyncio.sleep(0.05)
+        truncated = b.get("x")
+        b.set("x", 1, tags=["raffles"])
+        with open(path, "a") as f:
+            f.write("lixo\n")
+        await asyncio.sleep(0.05)
+        garbage = b.get("x")
+        b.set("x", 1, tags=["raffles"])
+        await a.invalidate("raffles")
+        await asyncio.sleep(0.05)
+        await a.close()
+        await b.close()
+        return truncated, garbage, b.get("x")
+
+    assert asyncio.run(run()) == (MISSING, MISSING, MISSING)
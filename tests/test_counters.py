@@ -0,0 +1,31 @@
+import asyncio
+
+from counters import increment, read_stats, reconcile_stats, record_raffle_status_change
+
+
+def test_first_read_computes_then_increments_apply(db):
+    async def run():
+        await db.raffles.insert_many([{"id": "a", "status": "active"}, {"id": "b", "status": "completed"}])
+        await db.users.insert_one({"id": "u"})
+        await db.purchases.insert_many([{"id": "p1", "payment_status": "paid"},
+                                        {"id": "p2", "payment_status": "pending"}])
+        first = await read_stats(db)
+        await increment(db, total_users=1, total_purchases=2, total_raffles=0)
+        await record_raffle_status_change(db, "active", "completed")
+        await record_raffle_status_change(db, "active", "active")
+        return first, await read_stats(db)
+
+    first, second = asyncio.run(run())
+    assert first == {"total_raffles": 2, "active_raffles": 1, "total_users": 1, "total_purchases": 1}
+    assert second == {"total_raffles": 2, "active_raffles": 0, "total_users": 2, "total_purchases": 3}
+
+
+def test_reconcile_fixes_drift(db):
+    async def run():
+        await db.users.insert_many([{"id": "u1"}, {"id": "u2"}])
+        await increment(db, total_users=5, active_raffles=1)
+        return await reconcile_stats(db), await read_stats(db)
+
+    reconciled, stats = asyncio.run(run())
+    assert reconciled == stats
+    assert stats["total_users"] == 2 and stats["active_raffles"] == 0
@@ -0,0 +1,59 @@
+import hashlib
+import random
+
+import pytest
+
+from draw import NoTicketsSoldError, draw_number, verify_draw, winning_index
+from ticket_index import SoldBitmap, pack_words
+
+
+def bitmap(numbers, version=0):
+    words = pack_words(numbers)
+    return SoldBitmap.from_document({"words": {str(k): w for k, w in words.items()}, "version": version})
+
+
+def test_winning_index_is_sha256_of_seed_modulo_sold_count():
+    digest = hashlib.sha256(b"12345:r1:p1").digest()
+    assert winning_index("12345", "r1", "p1", 997) == int.from_bytes(digest, "big") % 997
+
+
+def test_winning_index_depends_on_prize():
+    indexes = {winning_index("12345", "r1", f"p{i}", 1_000_000) for i in range(20)}
+    assert len(indexes) == 20
+
+
+def test_winning_index_without_sold_tickets():
+    with pytest.raises(NoTicketsSoldError):
+        winning_index("12345", "r1", "p1", 0)
+
+
+def test_select_matches_sorted_numbers():
+    rng = random.Random(7)
+    numbers = sorted(rng.sample(range(1, 300_000), 5000))
+    sold = bitmap(numbers)
+    assert sold.count() == len(numbers)
+    for k in list(range(0, len(numbers), 97)) + [len(numbers) - 1]:
+        assert sold.select(k) == numbers[k]
+    with pytest.raises(IndexError):
+        sold.select(len(numbers))
+
+
+def test_digest_ignores_trailing_empty_bytes():
+    sold = bitmap([1, 2, 70])
+    padded = SoldBitmap(sold.bits + bytearray(16))
+    assert padded.digest() == sold.digest()
+    assert bitmap([1, 2, 71]).digest() != sold.digest()
+
+
+def test_draw_is_reproducible_from_stored_bitmap():
+    sold = bitmap(range(1, 1000, 3), version=12)
+    draw = {"raffle_id": "r1", "prize_id": "p1", **draw_number(sold, "seed", "r1", "p1")}
+    assert verify_draw(draw)
+
+    # Vendas depois do sorteio não mudam o que foi guardado
+    later = bitmap(list(range(1, 1000, 3)) + [2, 5], version=14)
+    assert later.digest() != draw["sold_digest"]
+    assert verify_draw(draw)
+
+    assert not verify_draw({**draw, "winning_number": draw["winning_number"] + 1})
+    assert not verify_draw({**draw, "sold_bitmap": later.to_base64()})
@@ -0,0 +1,41 @@
+import asyncio
+import gzip
+import io
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from export import stream_export
+
+
+def export(db, fmt, compression):
+    async def run():
+        await db.winners.delete_many({})
+        await db.winners.insert_many([
+            {"id": f"w{i}", "user_id": "u", "user_phone": "11999999999", "raffle_id": "r", "raffle_title": "Rifa",
+             "prize_name": "Prêmio", "winning_number": i, "date": datetime(2024, 1, 1, 10, i)}
+            for i in range(3)
+        ])
+        return b"".join([chunk async for chunk in stream_export(db, "winners", fmt, compression, "r")])
+
+    return asyncio.run(run())
+
+
+def test_csv_compression(db):
+    plain = export(db, "csv", "none").decode()
+    assert gzip.decompress(export(db, "csv", "gzip")).decode() == plain
+    assert plain.splitlines()[0].startswith("id,user_id") and len(plain.splitlines()) == 4
+
+
+def test_parquet_honours_compression(db):
+    for compression, codec in (("zstd", "ZSTD"), ("gzip", "GZIP"), ("none", "UNCOMPRESSED")):
+        metadata = pq.ParquetFile(io.BytesIO(export(db, "parquet", compression))).metadata
+        assert metadata.num_rows == 3
+        assert metadata.row_group(0).column(0).compression == codec
+
+
+def test_arrow_honours_compression(db):
+    for compression in ("zstd", "none"):
+        table = pa.ipc.open_stream(export(db, "arrow", compression)).read_all()
+        assert table.column("winning_number").to_pylist() == [0, 1, 2]
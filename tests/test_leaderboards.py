@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+
+from leaderboards import ALL_TIME, daily_board, record_purchases, top_buyers, window_top_buyers
+
+
+def paid(user_id, quantity, created_at, raffle_id="r"):
+    return {"user_id": user_id, "raffle_id": raffle_id, "quantity": quantity, "total_amount": quantity * 2.0,
+            "created_at": created_at}
+
+
+async def seed_users(db):
+    await db.users.insert_many([{"id": u, "phone": f"1199999000{i}", "name": u.upper()}
+                                for i, u in enumerate(("ana", "bia", "caio"))])
+
+
+def test_boards_accumulate_across_calls(db):
+    day1, day2 = datetime(2024, 1, 1, 10), datetime(2024, 1, 2, 10)
+
+    async def run():
+        await seed_users(db)
+        await record_purchases(db, [paid("ana", 3, day1), paid("bia", 5, day1), paid("ana", 4, day1)])
+        await record_purchases(db, [paid("caio", 2, day2), paid("bia", 1, day2)])
+        return (await top_buyers(db, ALL_TIME), await top_buyers(db, daily_board(day1)),
+                await top_buyers(db, daily_board(day2), limit=1))
+
+    overall, first_day, second_day = asyncio.run(run())
+    assert [(r["_id"], r["total_tickets"]) for r in overall] == [("ana", 7), ("bia", 6), ("caio", 2)]
+    assert overall[0]["total_spent"] == 14.0 and overall[0]["user_phone"] == "11999990000"
+    assert [(r["_id"], r["total_tickets"]) for r in first_day] == [("ana", 7), ("bia", 5)]
+    assert [r["_id"] for r in second_day] == ["caio"]
+
+
+def test_daily_board_expires(db):
+    async def run():
+        await record_purchases(db, [paid("ana", 1, datetime(2024, 1, 1, 23, 59))])
+        return await db.leaderboards.find({}, {"_id": 0, "board": 1, "expires_at": 1}).to_list(None)
+
+    rows = {r["board"]: r.get("expires_at") for r in asyncio.run(run())}
+    assert rows[ALL_TIME] is None
+    assert rows[daily_board(datetime(2024, 1, 1))] == datetime(2024, 1, 3)
+
+
+def test_window_and_raffle_rankings_from_hourly_rollups(db):
+    async def run():
+        await seed_users(db)
+        await record_purchases(db, [
+            paid("ana", 5, datetime(2024, 1, 1, 9, 59)),
+            paid("bia", 3, datetime(2024, 1, 1, 10, 15), raffle_id="outra"),
+            paid("bia", 2, datetime(2024, 1, 1, 10, 45)),
+            paid("caio", 4, datetime(2024, 1, 1, 11, 0)),
+        ])
+        return (
+            await window_top_buyers(db, start=datetime(2024, 1, 1, 10, 30), end=datetime(2024, 1, 1, 11)),
+            await window_top_buyers(db, raffle_id="r"),
+            await window_top_buyers(db, start=datetime(2024, 1, 1), raffle_id="outra"),
+        )
+
+    window, raffle, other = asyncio.run(run())
+    # Bordas em horas inteiras: entra a hora das 10h inteira, não a das 11h
+    assert [(r["_id"], r["total_tickets"]) for r in window] == [("bia", 5)]
+    assert [(r["_id"], r["total_tickets"]) for r in raffle] == [("ana", 5), ("caio", 4), ("bia", 2)]
+    assert [(r["_id"], r["user_name"]) for r in other] == [("bia", "BIA")]
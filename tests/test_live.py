@@ -0,0 +1,48 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from live import LiveFeed
+
+
+def winner(winner_id, raffle_id, date):
+    return {"id": winner_id, "user_id": "u", "user_phone": "11999999999", "raffle_id": raffle_id,
+            "raffle_title": "Rifa", "prize_name": "Prêmio", "winning_number": 7, "date": date}
+
+
+def test_new_raffle_gets_a_full_frame(db):
+    async def run():
+        feed = LiveFeed(db)
+        feed.subscribe()
+        await db.raffles.insert_one({"id": "r1", "status": "active", "sold_tickets": 0})
+        first = await feed.poll()
+        await db.raffles.insert_one({"id": "r2", "status": "active", "sold_tickets": 5})
+        second = await feed.poll()
+        third = await feed.poll()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert list(first) == ["r1"]
+    assert list(second) == ["r2"]
+    assert second["r2"]["sold_tickets"] == 5 and second["r2"]["previous_version"] is None
+    assert third == {}
+
+
+def test_winners_tracked_by_id(db):
+    async def run():
+        feed = LiveFeed(db)
+        feed.subscribe()
+        await db.raffles.insert_one({"id": "r1", "status": "active", "sold_tickets": 0})
+        await feed.poll()
+        now = datetime.utcnow()
+        await db.winners.insert_one(winner("w1", "r1", now + timedelta(seconds=5)))
+        first = await feed.poll()
+        # Gravado por um worker com o relógio atrasado: data anterior à já vista
+        await db.winners.insert_one(winner("w2", "r1", now + timedelta(seconds=1)))
+        second = await feed.poll()
+        third = await feed.poll()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert [w["id"] for w in first["r1"]["winners"]] == ["w1"]
+    assert [w["id"] for w in second["r1"]["winners"]] == ["w2"]
+    assert third == {}
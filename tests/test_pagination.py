@@ -0,0 +1,57 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter, ndjson_lines
+from purchase_buckets import merge_newest_first
+
+
+async def aiter(items):
+    for item in items:
+        yield item
+
+
+async def collect(source):
+    return [item async for item in source]
+
+
+def test_cursor_roundtrip():
+    doc = {"created_at": datetime(2024, 5, 1, 12, 30, 0, 123000), "id": "abc"}
+    token = encode_cursor(doc)
+    assert "=" not in token
+    assert decode_cursor(token) == doc
+
+
+@pytest.mark.parametrize("token", ["", "!!!", "e30", encode_cursor({"created_at": datetime(2024, 1, 1), "id": "x"})[:-3]])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token)
+
+
+def test_keyset_filter():
+    query = {"user_id": "u"}
+    assert keyset_filter(query, None) is query
+    moment = datetime(2024, 1, 1)
+    token = encode_cursor({"created_at": moment, "id": "p9"})
+    assert keyset_filter(query, token) == {"user_id": "u", "$or": [
+        {"created_at": {"$lt": moment}},
+        {"created_at": moment, "id": {"$lt": "p9"}},
+    ]}
+
+
+def test_merge_newest_first_interleaves_and_deduplicates():
+    def p(minute, pid):
+        return {"created_at": datetime(2024, 1, 1, 0, minute), "id": pid}
+    documents = [p(9, "a"), p(5, "c"), p(5, "b"), p(1, "x")]
+    buckets = [p(7, "d"), p(5, "c"), p(2, "e")]
+    merged = asyncio.run(collect(merge_newest_first(aiter(documents), aiter(buckets))))
+    assert [m["id"] for m in merged] == ["a", "d", "c", "b", "e", "x"]
+
+
+def test_ndjson_lines_batches():
+    docs = [{"id": i} for i in range(5)]
+    chunks = asyncio.run(collect(ndjson_lines(aiter(docs), batch_size=2)))
+    assert len(chunks) == 3
+    assert [json.loads(line) for line in b"".join(chunks).splitlines()] == docs
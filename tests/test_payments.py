@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from leaderboards import daily_board, hour_of, record_purchases
+from payments import confirm_payments, expire_pending
+from purchase_buckets import append_purchases
+
+NOW = datetime(2024, 1, 2, 0, 5)
+
+
+def pending(purchase_id, numbers, created_at=NOW - timedelta(minutes=10), expires_at=NOW + timedelta(minutes=5)):
+    return {"id": purchase_id, "user_id": "u", "raffle_id": "r", "tickets": numbers, "quantity": len(numbers),
+            "total_amount": float(len(numbers)), "payment_status": "pending", "bonus_boxes": 0,
+            "created_at": created_at, "expires_at": expires_at}
+
+
+async def seed(db, *purchases):
+    await db.purchases.insert_many([dict(p) for p in purchases])
+    await db.tickets.insert_many([{"raffle_id": p["raffle_id"], "number": n, "purchase_id": p["id"]}
+                                  for p in purchases for n in p["tickets"]])
+
+
+def test_confirm_returns_only_purchases_it_changed(db):
+    async def run():
+        await seed(db, pending("a", [1]), pending("b", [2]))
+        first = await confirm_payments(db, ["a", "b", "inexistente"], now=NOW)
+        second = await confirm_payments(db, ["a", "b"], now=NOW)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert sorted(p["id"] for p in first) == ["a", "b"]
+    assert all(p["payment_status"] == "paid" and p["paid_at"] == NOW for p in first)
+    assert second == []
+
+
+def test_expire_releases_only_due_reservations(db):
+    async def run():
+        await seed(db, pending("a", [1, 2], expires_at=NOW - timedelta(seconds=1)), pending("b", [3]))
+        expired = await expire_pending(db, now=NOW)
+        late = await confirm_payments(db, ["a"], now=NOW)
+        tickets = sorted(t["number"] for t in await db.tickets.find({}).to_list(None))
+        return expired, late, tickets
+
+    expired, late, tickets = asyncio.run(run())
+    assert [p["id"] for p in expired] == ["a"]
+    assert late == []
+    assert tickets == [3]
+
+
+def test_confirmed_purchase_counts_at_payment_time(db):
+    async def run():
+        await seed(db, pending("a", [1, 2], created_at=datetime(2024, 1, 1, 23, 55)))
+        confirmed = await confirm_payments(db, ["a"], now=NOW)
+        await record_purchases(db, confirmed)
+        await append_purchases(db, confirmed)
+        boards = {d["board"] for d in await db.leaderboards.find({}).to_list(None)}
+        hours = [d["hour"] for d in await db.purchase_rollups.find({}).to_list(None)]
+        bucket = await db.purchase_buckets.find_one({})
+        return boards, hours, bucket
+
+    boards, hours, bucket = asyncio.run(run())
+    assert daily_board(NOW) in boards and daily_board(datetime(2024, 1, 1)) not in boards
+    assert hours == [hour_of(NOW)]
+    assert bucket["purchases"][0]["paid_at"] == NOW and bucket["max_paid_at"] == NOW
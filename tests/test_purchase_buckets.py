@@ -0,0 +1,42 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import purchase_buckets
+from purchase_buckets import append_purchases
+
+
+def purchase(quantity, minute=0):
+    return {"id": str(uuid.uuid4()), "user_id": "u", "raffle_id": "r", "tickets": list(range(quantity)),
+            "quantity": quantity, "total_amount": float(quantity), "payment_status": "paid",
+            "created_at": datetime(2024, 1, 1, 10, minute)}
+
+
+async def buckets(db):
+    return await db.purchase_buckets.find({}, {"_id": 0, "count": 1, "tickets": 1}).to_list(None)
+
+
+def test_bucket_capped_by_tickets(db, monkeypatch):
+    monkeypatch.setattr(purchase_buckets, "BUCKET_MAX_TICKETS", 100)
+    asyncio.run(append_purchases(db, [purchase(30, i) for i in range(7)]))
+    rows = asyncio.run(buckets(db))
+    assert sorted(b["tickets"] for b in rows) == [30, 90, 90]
+    assert sum(b["count"] for b in rows) == 7
+
+
+def test_chunk_never_overflows_a_nearly_full_bucket(db, monkeypatch):
+    monkeypatch.setattr(purchase_buckets, "BUCKET_MAX", 10)
+    asyncio.run(append_purchases(db, [purchase(1, i) for i in range(8)]))
+    asyncio.run(append_purchases(db, [purchase(1, i) for i in range(5)]))
+    assert sorted(b["count"] for b in asyncio.run(buckets(db))) == [5, 8]
+
+    # Um pedaço que ainda cabe vai para um bucket existente
+    asyncio.run(append_purchases(db, [purchase(1, i) for i in range(2)]))
+    counts = [b["count"] for b in asyncio.run(buckets(db))]
+    assert len(counts) == 2 and sum(counts) == 15 and max(counts) <= 10
+
+
+def test_purchase_larger_than_the_cap_gets_its_own_bucket(db, monkeypatch):
+    monkeypatch.setattr(purchase_buckets, "BUCKET_MAX_TICKETS", 100)
+    asyncio.run(append_purchases(db, [purchase(10), purchase(250), purchase(10)]))
+    assert sorted(b["tickets"] for b in asyncio.run(buckets(db))) == [20, 250]
@@ -0,0 +1,25 @@
+import os
+import random
+
+from raffle_registry import RaffleEntry
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+from server import calculate_bonus_boxes  # noqa: E402
+
+
+def test_bonus_boxes_matches_calculate_bonus_boxes():
+    rng = random.Random(11)
+    for _ in range(500):
+        rules = [{"quantity": rng.randint(1, 60), "boxes": rng.randint(1, 9)} for _ in range(rng.randint(0, 6))]
+        entry = RaffleEntry("r", 1.0, 1000, "active", rules)
+        for quantity in range(0, 70):
+            assert entry.bonus_boxes(quantity) == calculate_bonus_boxes(quantity, rules)
+
+
+def test_from_document():
+    entry = RaffleEntry.from_document({"id": "r", "price_per_ticket": 2.5, "total_tickets": 100, "status": "completed",
+                                       "bonus_boxes": [{"quantity": 10, "boxes": 1}]})
+    assert (entry.id, entry.price_per_ticket, entry.total_tickets) == ("r", 2.5, 100)
+    assert not entry.active
+    assert entry.bonus_boxes(9) == 0 and entry.bonus_boxes(10) == 1
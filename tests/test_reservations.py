@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from reservations import count_claims, load_claimed_numbers, release_tickets, reserve_many
+from ticket_allocator import InsufficientTicketsError, TicketAllocator
+
+
+async def claims(db, purchase_id=None):
+    query = {"purchase_id": purchase_id} if purchase_id else {}
+    return sorted(t["number"] for t in await db.tickets.find(query).to_list(None))
+
+
+def with_index(db):
+    return db.tickets.create_index([("raffle_id", 1), ("number", 1)], unique=True)
+
+
+def test_numbers_claimed_elsewhere_are_redrawn(db):
+    async def run():
+        await with_index(db)
+        # Outro worker já reservou 1..15; este pool ainda os vê livres
+        await db.tickets.insert_many([{"raffle_id": "r", "number": n, "purchase_id": "outra"} for n in range(1, 16)])
+        allocator = TicketAllocator(20)
+        # Cada tentativa frustrada marca ao menos um dos 15 números tomados: 16 sempre bastam
+        reserved, failed = await reserve_many(db, allocator, "r", [("p", "u", 5)], max_attempts=16)
+        return allocator, reserved, failed, await claims(db, "p")
+
+    allocator, reserved, failed, stored = asyncio.run(run())
+    assert failed == {}
+    assert sorted(reserved["p"]) == stored == [16, 17, 18, 19, 20]
+    assert all(allocator.is_sold(n) for n in stored)
+
+
+def test_failed_order_keeps_nothing_reserved(db):
+    async def run():
+        await with_index(db)
+        allocator = TicketAllocator(10)
+        reserved, failed = await reserve_many(db, allocator, "r", [("a", "u", 4), ("b", "u", 20)])
+        return allocator, reserved, failed, await claims(db, "a"), await claims(db, "b")
+
+    allocator, reserved, failed, stored_a, stored_b = asyncio.run(run())
+    assert list(reserved) == ["a"] and sorted(reserved["a"]) == stored_a
+    assert isinstance(failed["b"], InsufficientTicketsError)
+    assert stored_b == []
+    assert allocator.free_count == 6
+
+
+def test_unexpected_write_error_releases_everything(db, monkeypatch):
+    async def run():
+        allocator = TicketAllocator(10)
+
+        async def insert_many(self, docs, ordered):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 2, "errmsg": "falha"}]})
+
+        # A coleção é criada a cada acesso: troca o método na classe
+        monkeypatch.setattr(type(db.tickets), "insert_many", insert_many)
+        with pytest.raises(BulkWriteError):
+            await reserve_many(db, allocator, "r", [("a", "u", 3)])
+        return allocator
+
+    assert asyncio.run(run()).free_count == 10
+
+
+def test_release_returns_numbers_to_the_pool(db):
+    async def run():
+        allocator = TicketAllocator(10)
+        reserved, _ = await reserve_many(db, allocator, "r", [("a", "u", 3)])
+        await release_tickets(db, allocator, "r", reserved["a"][:2])
+        return allocator, await claims(db), reserved["a"]
+
+    allocator, stored, numbers = asyncio.run(run())
+    assert stored == [numbers[2]]
+    assert allocator.free_count == 9
+
+
+def test_resync_rebuilds_a_stale_pool(db):
+    async def run():
+        await db.tickets.insert_many([{"raffle_id": "r", "number": n, "purchase_id": "x"} for n in (2, 4, 6)])
+        await db.tickets.insert_one({"raffle_id": "outra", "number": 1, "purchase_id": "y"})
+        stale = TicketAllocator(10)
+        assert await count_claims(db, "r") != stale.sold_count
+        return TicketAllocator(10, sold=await load_claimed_numbers(db, "r"))
+
+    fresh = asyncio.run(run())
+    assert fresh.sold_count == 3 and all(fresh.is_sold(n) for n in (2, 4, 6))
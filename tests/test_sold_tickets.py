@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from sold_tickets import SoldTicketsBuffer
+
+
+def buffer_with_sales(db):
+    buffer = SoldTicketsBuffer(db, enabled=True)
+
+    async def sell():
+        await db.raffles.insert_many([{"id": r, "sold_tickets": 0} for r in ("a", "b")])
+        await buffer.increment("a", 3)
+        await buffer.increment("a", 2)
+        await buffer.increment("b", 10, purchases=4)
+
+    asyncio.run(sell())
+    return buffer
+
+
+async def sold(db):
+    return {r["id"]: r["sold_tickets"] for r in await db.raffles.find({}).to_list(None)}
+
+
+def test_flush_writes_accumulated_increments(db):
+    buffer = buffer_with_sales(db)
+    assert asyncio.run(buffer.flush()) == 2
+    assert asyncio.run(sold(db)) == {"a": 5, "b": 10}
+    assert buffer.stats()["flushed_purchases"] == 6 and buffer.stats()["pending_purchases"] == 0
+
+
+def test_partial_failure_requeues_only_failed_raffles(db, monkeypatch):
+    buffer = buffer_with_sales(db)
+    bulk_write = type(db.raffles).bulk_write
+
+    async def failing(self, ops, ordered):
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 2, "errmsg": "falha"}]})
+
+    monkeypatch.setattr(type(db.raffles), "bulk_write", failing)
+    with pytest.raises(BulkWriteError):
+        asyncio.run(buffer.flush())
+    stats = buffer.stats()
+    # Volta a rifa b com as 4 compras dela, não com uma por rifa falha
+    assert (stats["pending_raffles"], stats["pending_purchases"], stats["flushed_purchases"]) == (1, 4, 2)
+
+    # O bulk_write simulado não gravou a; a nova gravação leva só o incremento de b
+    monkeypatch.setattr(type(db.raffles), "bulk_write", bulk_write)
+    asyncio.run(buffer.flush())
+    assert asyncio.run(sold(db)) == {"a": 0, "b": 10}
+
+
+def test_connection_error_requeues_everything(db, monkeypatch):
+    buffer = buffer_with_sales(db)
+
+    async def failing(self, ops, ordered):
+        raise AutoReconnect("sem conexão")
+
+    monkeypatch.setattr(type(db.raffles), "bulk_write", failing)
+    with pytest.raises(AutoReconnect):
+        asyncio.run(buffer.flush())
+    assert buffer.stats()["pending_purchases"] == 6 and buffer.stats()["failures"] == 1
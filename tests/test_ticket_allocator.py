@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from ticket_allocator import InsufficientTicketsError, TicketAllocator
+
+
+def test_draw_returns_distinct_free_numbers_until_sold_out():
+    allocator = TicketAllocator(1000, sold=range(1, 101))
+    rng = random.Random(1)
+    drawn = []
+    while allocator.free_count:
+        drawn.extend(allocator.draw(min(7, allocator.free_count), rng))
+    assert sorted(drawn) == list(range(101, 1001))
+    assert allocator.sold_count == 1000
+    with pytest.raises(InsufficientTicketsError):
+        allocator.draw(1, rng)
+
+
+def test_draw_more_than_free_leaves_pool_untouched():
+    allocator = TicketAllocator(10, sold=range(1, 9))
+    with pytest.raises(InsufficientTicketsError):
+        allocator.draw(3)
+    assert allocator.free_count == 2
+    assert sorted(allocator.draw(2)) == [9, 10]
+
+
+def test_mark_sold_and_release():
+    allocator = TicketAllocator(10)
+    assert allocator.mark_sold(5)
+    assert not allocator.mark_sold(5)
+    assert not allocator.mark_sold(0) and not allocator.mark_sold(11)
+    assert allocator.is_sold(5) and allocator.sold_count == 1
+
+    assert allocator.release(5)
+    assert not allocator.release(5)
+    assert not allocator.is_sold(5) and allocator.free_count == 10
+
+
+def test_released_numbers_can_be_drawn_again():
+    allocator = TicketAllocator(50)
+    rng = random.Random(2)
+    first = allocator.draw(50, rng)
+    for n in first[:5]:
+        allocator.release(n)
+    assert sorted(allocator.draw(5, rng)) == sorted(first[:5])
+
+
+def test_positions_stay_consistent():
+    allocator = TicketAllocator(200, sold=range(1, 200, 3))
+    rng = random.Random(3)
+    for _ in range(300):
+        n = rng.randint(1, 200)
+        allocator.release(n) if rng.random() < 0.5 else allocator.mark_sold(n)
+    for i, n in enumerate(allocator._numbers):
+        assert allocator._pos[n] == i
+    assert sum(allocator.is_sold(n) for n in range(1, 201)) == allocator.sold_count
@@ -0,0 +1,60 @@
+import random
+
+from bson.int64 import Int64
+
+from ticket_index import SoldBitmap, _to_int64, pack_words
+
+
+def bitmap(numbers, version=0):
+    words = {str(k): _to_int64(w) for k, w in pack_words(numbers).items()}
+    return SoldBitmap.from_document({"words": words, "version": version})
+
+
+def test_pack_words():
+    assert pack_words([0, 1, 63, 64, 130]) == {0: 1 | 2 | 1 << 63, 1: 1, 2: 1 << 2}
+
+
+def test_to_int64_keeps_the_bits():
+    word = 1 << 63 | 5
+    assert isinstance(_to_int64(word), Int64)
+    assert _to_int64(word) & ((1 << 64) - 1) == word
+
+
+def test_from_document_iter_and_contains():
+    rng = random.Random(5)
+    numbers = sorted(rng.sample(range(1, 100_000), 3000))
+    sold = bitmap(numbers, version=9)
+    assert list(sold) == numbers
+    assert sold.count() == len(numbers)
+    assert sold.version == 9
+    assert numbers[10] in sold and 0 not in sold and 10**9 not in sold
+
+
+def test_empty_bitmap():
+    sold = SoldBitmap.from_document({})
+    assert list(sold) == [] and sold.count() == 0
+
+
+def test_ranges():
+    assert bitmap([1, 2, 3, 7, 9, 10, 64, 65]).ranges() == [[1, 3], [7, 7], [9, 10], [64, 65]]
+
+
+def test_base64_roundtrip():
+    sold = bitmap([3, 64, 1000])
+    assert list(SoldBitmap.from_base64(sold.to_base64())) == [3, 64, 1000]
+
+
+def test_select_across_blocks():
+    # Números espalhados por vários blocos de 8 KB
+    numbers = list(range(1, 400_000, 997))
+    sold = bitmap(numbers)
+    assert [sold.select(k) for k in range(len(numbers))] == numbers
+
+
+def test_added_since():
+    before = bitmap([1, 5, 70])
+    after = bitmap([1, 5, 70, 6, 200], version=3)
+    added = after.added_since(before)
+    assert list(added) == [6, 200]
+    assert added.version == 3
+    assert list(before.added_since(after)) == []